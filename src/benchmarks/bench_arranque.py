@@ -0,0 +1,96 @@
+"""
+Benchmark de arranque en frío: data.json frente al snapshot binario.
+
+Genera un data.json sintético por tamaño, lo convierte con el conversor por
+bloques y mide en un proceso aparte por formato cuánto tarda en construirse
+el DataHandler, la primera lectura por id y la primera consulta que arma los
+índices, con el RSS después de cada paso.
+
+Uso:
+    python src/benchmarks/bench_arranque.py --sizes 1000 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_endpoints import commit_actual, generar_dataset
+from bench_memoria import rss_bytes
+
+from data_handler import DataHandler
+from storage.snapshot import convert_json
+
+
+def mb(value):
+    return round(value / 2 ** 20, 1)
+
+
+def medir(backend, filename, size, lecturas):
+    rng = random.Random(1)
+    base = rss_bytes()
+    inicio = time.perf_counter()
+    handler = DataHandler(filename, backend=backend)
+    resultado = {'backend': backend, 'tasks': size,
+                 'carga_ms': round((time.perf_counter() - inicio) * 1e3, 2),
+                 'rss_carga_mb': mb(rss_bytes() - base)}
+
+    inicio = time.perf_counter()
+    for _ in range(lecturas):
+        handler.get_task('task-%d' % rng.randrange(size))
+    resultado['lecturas_por_id_ms'] = round((time.perf_counter() - inicio) * 1e3, 2)
+    resultado['rss_lecturas_mb'] = mb(rss_bytes() - base)
+
+    inicio = time.perf_counter()
+    handler.query_tasks(status='pending')
+    resultado['primera_consulta_ms'] = round((time.perf_counter() - inicio) * 1e3, 2)
+    resultado['rss_indices_mb'] = mb(rss_bytes() - base)
+    handler.close()
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--lecturas', type=int, default=1000,
+                        help='tareas leídas por id después de cargar')
+    parser.add_argument('--medir', nargs=2, metavar=('BACKEND', 'ARCHIVO'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(*args.medir, args.sizes[0], args.lecturas)))
+        return None
+
+    reporte = {'commit': commit_actual(), 'parametros': vars(args), 'resultados': []}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            source = os.path.join(directory, 'data_%d.json' % size)
+            target = os.path.join(directory, 'data_%d.snap' % size)
+            with open(source, 'w') as f:
+                json.dump(generar_dataset(size, random.Random(1)), f)
+            inicio = time.perf_counter()
+            convert_json(source, target)
+            conversion = round(time.perf_counter() - inicio, 3)
+            for backend, filename in (('json', source), ('snapshot', target)):
+                output = subprocess.check_output([
+                    sys.executable, os.path.abspath(__file__), '--medir', backend, filename,
+                    '--sizes', str(size), '--lecturas', str(args.lecturas)])
+                resultado = json.loads(output)
+                resultado['bytes_archivo'] = os.path.getsize(filename)
+                if backend == 'snapshot':
+                    resultado['conversion_s'] = conversion
+                reporte['resultados'].append(resultado)
+                print(json.dumps(resultado), file=sys.stderr)
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    return reporte
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark del índice de texto con títulos y descripciones sintéticos.
+
+Genera textos con un vocabulario de pseudo-palabras con acentos, de
+frecuencia Zipf (pocas palabras muy comunes y muchas raras), arma el índice
+en bloque y mide la latencia de consultas de una palabra rara, una común,
+dos palabras, un prefijo corto y uno largo, más el costo de indexar una
+tarea nueva y el RSS del índice.
+
+Uso:
+    python src/benchmarks/bench_busqueda.py --sizes 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_endpoints import commit_actual, percentil
+from bench_memoria import rss_bytes
+
+from data_handler import TEXT_WEIGHTS
+from utils.text_index import TextIndex, fold
+
+SILABAS = ['ta', 're', 'ción', 'des', 'cri', 'pro', 'yec', 'to', 'in', 'for', 'me', 'mí',
+           'gra', 'ba', 'se', 'da', 'tos', 'pú', 'bli', 'co', 'ser', 'vi', 'dor', 'ñu']
+
+
+def vocabulario(rng, cantidad):
+    palabras = set()
+    while len(palabras) < cantidad:
+        palabras.add(''.join(rng.choice(SILABAS) for _ in range(rng.randint(2, 4))))
+    return sorted(palabras)
+
+
+def texto(rng, palabras, pesos, minimo, maximo):
+    return ' '.join(rng.choices(palabras, cum_weights=pesos, k=rng.randint(minimo, maximo)))
+
+
+def medir_consultas(index, consultas, repeticiones):
+    resultado = {}
+    for nombre, consulta in consultas.items():
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            encontrados = index.search(consulta)
+            tiempos.append(time.perf_counter() - inicio)
+        resultado[nombre] = {'consulta': consulta, 'resultados': len(encontrados),
+                             'p50_ms': round(percentil(tiempos, 50) * 1e3, 3),
+                             'p99_ms': round(percentil(tiempos, 99) * 1e3, 3)}
+    return resultado
+
+
+def correr(size, args):
+    rng = random.Random(args.semilla)
+    palabras = vocabulario(rng, args.vocabulario)
+    acumulado, pesos = 0, []
+    for rango in range(1, len(palabras) + 1):
+        acumulado += 1 / rango
+        pesos.append(acumulado)
+    documentos = [('task-%d' % i, i, (texto(rng, palabras, pesos, 2, 6),
+                                      texto(rng, palabras, pesos, 5, 20)))
+                  for i in range(size)]
+
+    base = rss_bytes()
+    index = TextIndex(weights=TEXT_WEIGHTS)
+    inicio = time.perf_counter()
+    index.extend(documentos)
+    resultado = {'tasks': size, 'terminos': len(index),
+                 'construccion_s': round(time.perf_counter() - inicio, 2),
+                 'rss_indice_mb': round((rss_bytes() - base) / 2 ** 20, 1)}
+
+    comun, rara = palabras[0], palabras[-1]
+    consultas = {
+        'palabra_rara': fold(rara),
+        'palabra_comun': fold(comun),
+        'dos_palabras': '%s %s' % (fold(palabras[3]), fold(palabras[40])),
+        'prefijo_corto': fold(palabras[7])[:2],
+        'prefijo_largo': fold(palabras[200])[:-1],
+        'con_acentos': palabras[5].upper(),
+    }
+    resultado['consultas'] = medir_consultas(index, consultas, args.repeticiones)
+
+    tiempos = []
+    for i in range(args.repeticiones):
+        doc = ('nueva-%d' % i, size + i, (texto(rng, palabras, pesos, 2, 6),
+                                          texto(rng, palabras, pesos, 5, 20)))
+        inicio = time.perf_counter()
+        index.add(*doc)
+        tiempos.append(time.perf_counter() - inicio)
+    resultado['alta_p50_ms'] = round(percentil(tiempos, 50) * 1e3, 3)
+    resultado['alta_p99_ms'] = round(percentil(tiempos, 99) * 1e3, 3)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--vocabulario', type=int, default=50000)
+    parser.add_argument('--repeticiones', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    reporte = {'commit': commit_actual(), 'parametros': vars(args), 'resultados': []}
+    for size in args.sizes:
+        reporte['resultados'].append(correr(size, args))
+        print('%d tareas listas' % size, file=sys.stderr)
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    return reporte
+
+
+if __name__ == '__main__':
+    main()
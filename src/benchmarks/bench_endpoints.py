@@ -0,0 +1,302 @@
+"""
+Benchmark de carga de todos los endpoints con datos sintéticos.
+
+Genera un data.json con N tareas y N/10 usuarios, con asignaciones concentradas
+en pocos alias y dependencias hacia tareas cercanas, lo carga en un DataHandler
+real y recorre cada ruta con el cliente de prueba de Flask y con un servidor
+local multihilo. Reporta latencia p50/p95/p99, throughput, tiempo de
+save_data y RSS pico en JSON, para comparar corridas entre commits.
+
+Uso:
+    python src/benchmarks/bench_endpoints.py --sizes 1000 100000 1000000 \\
+        --salida resultados.json
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import make_server
+
+import controller
+from data_handler import DataHandler
+
+ROLES = ['programador', 'pruebas', 'infra']
+ESTADOS = ['pending'] * 5 + ['en_progreso'] * 3 + ['Finalizado'] * 2
+
+
+# ---------- datos sintéticos ----------
+
+def elegir_alias(rng, cantidad):
+    # Sesgado hacia los primeros alias: pocos usuarios concentran muchas tareas
+    return 'user-%d' % int(cantidad * rng.random() ** 3)
+
+
+def generar_dataset(size, rng):
+    n_users = max(10, size // 10)
+    tasks = []
+    for i in range(size):
+        task_id = 'task-%d' % i
+        alias = elegir_alias(rng, n_users)
+        # La primera asignación con el formato completo que deja POST /tasks
+        users = [{'task_id': task_id, 'user_id': alias, 'estado': 'activo',
+                  'fecha_asignacion': None, 'rol': None, 'usuario': alias}]
+        for _ in range(rng.choice((0, 0, 1, 1, 2))):
+            users.append({'usuario': elegir_alias(rng, n_users), 'rol': rng.choice(ROLES)})
+        dependencies = []
+        if i and rng.random() < 0.4:
+            # Solo hacia tareas anteriores, así el grafo no tiene ciclos
+            for _ in range(rng.randint(1, 3)):
+                dep = i - 1 - int(rng.expovariate(1 / 50))
+                if dep >= 0 and 'task-%d' % dep not in dependencies:
+                    dependencies.append('task-%d' % dep)
+        tasks.append({'id': task_id, 'title': 'tarea %d' % i,
+                      'description': 'descripción de la tarea %d' % i,
+                      'status': rng.choice(ESTADOS), 'users': users,
+                      'dependencies': dependencies})
+    users = [{'id': 'user-%d' % i, 'name': 'usuario %d' % i,
+              'email': 'user-%d@empresa.com' % i, 'contactos': [], 'tareas': []}
+             for i in range(n_users)]
+    return {'tasks': tasks, 'users': users}
+
+
+# ---------- rutas ----------
+
+def _tarea(ctx):
+    return ctx['rng'].choice(ctx['task_ids'])
+
+
+def _dependencia(ctx):
+    # Siempre hacia una tarea anterior para no provocar rechazos por ciclo
+    i = ctx['rng'].randrange(1, ctx['size'])
+    return ('/tasks/task-%d/dependencies' % i,
+            {'dependencytaskid': 'task-%d' % ctx['rng'].randrange(i), 'accion': 'adicionar'})
+
+
+def _operacion_lote(ctx):
+    task_id = _tarea(ctx)
+    return {'tipo': 'actualizar_estado', 'task_id': task_id,
+            'datos': {'estado': ctx['rng'].choice(ESTADOS)}}
+
+
+# nombre -> (método, constructor de (ruta, cuerpo), fracción de peticiones)
+RUTAS = {
+    'GET /dummy': ('GET', lambda ctx: ('/dummy', None), 1),
+    'GET /tasks': ('GET', lambda ctx: ('/tasks?estado=pending&limit=50', None), 1),
+    'GET /tasks?usuario&rol': ('GET', lambda ctx: (
+        '/tasks?usuario=%s&rol=programador&limit=50' % elegir_alias(ctx['rng'], ctx['n_users']),
+        None), 1),
+    'GET /tasks/ready': ('GET', lambda ctx: ('/tasks/ready', None), 0.1),
+    'GET /tasks/<id>/blocked-by': ('GET', lambda ctx: (
+        '/tasks/%s/blocked-by?transitivo=1' % _tarea(ctx), None), 1),
+    'GET /usuarios/<alias>': ('GET', lambda ctx: (
+        '/usuarios/%s?limit=100' % elegir_alias(ctx['rng'], ctx['n_users']), None), 1),
+    'POST /tasks': ('POST', lambda ctx: ('/tasks', {
+        'nombre': 'nueva', 'descripcion': 'tarea creada en el benchmark',
+        'usuario': elegir_alias(ctx['rng'], ctx['n_users']), 'rol': 'programador'}), 1),
+    'POST /tasks/<id>': ('POST', lambda ctx: (
+        '/tasks/%s' % _tarea(ctx), {'estado': ctx['rng'].choice(ESTADOS)}), 1),
+    'POST /tasks/<id>/users': ('POST', lambda ctx: ('/tasks/%s/users' % _tarea(ctx), {
+        'usuario': elegir_alias(ctx['rng'], ctx['n_users']),
+        'rol': ctx['rng'].choice(ROLES), 'accion': 'adicionar'}), 1),
+    'POST /tasks/<id>/dependencies': ('POST', _dependencia, 1),
+    'POST /usuarios': ('POST', lambda ctx: ('/usuarios', {
+        'contacto': 'bench-%d' % next(ctx['contador']), 'nombre': 'nuevo'}), 1),
+    'POST /batch': ('POST', lambda ctx: ('/batch', {
+        'operaciones': [_operacion_lote(ctx) for _ in range(10)]}), 1),
+}
+
+
+# ---------- medición ----------
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def resumir(latencias, duracion):
+    return {
+        'peticiones': len(latencias),
+        'p50_ms': round(percentil(latencias, 50) * 1e3, 3),
+        'p95_ms': round(percentil(latencias, 95) * 1e3, 3),
+        'p99_ms': round(percentil(latencias, 99) * 1e3, 3),
+        'throughput_rps': round(len(latencias) / duracion, 1) if duracion else None,
+    }
+
+
+def rss_pico_mb():
+    factor = 1 if sys.platform == 'darwin' else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * factor / 2 ** 20, 1)
+
+
+def cronometrar_saves(handler):
+    """Reemplaza save_data por una versión que registra cuánto tarda cada llamada."""
+    tiempos = []
+    original = handler.save_data
+
+    def save_data():
+        inicio = time.perf_counter()
+        original()
+        tiempos.append(time.perf_counter() - inicio)
+
+    handler.save_data = save_data
+    return tiempos
+
+
+def medir_cliente(client, metodo, construir, ctx, peticiones):
+    latencias = []
+    inicio = time.perf_counter()
+    for _ in range(peticiones):
+        ruta, cuerpo = construir(ctx)
+        t0 = time.perf_counter()
+        client.open(ruta, method=metodo, json=cuerpo)
+        latencias.append(time.perf_counter() - t0)
+    return latencias, time.perf_counter() - inicio
+
+
+def _peticion_http(base, metodo, ruta, cuerpo):
+    data = json.dumps(cuerpo).encode() if cuerpo is not None else None
+    req = urllib.request.Request(base + ruta, data=data, method=metodo,
+                                 headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req) as respuesta:
+            respuesta.read()
+    except urllib.error.HTTPError as error:
+        # 400/404 también son respuestas completas del servidor
+        error.read()
+
+
+def medir_servidor(base, metodo, construir, ctx, peticiones, hilos):
+    # Las rutas y cuerpos se generan antes para no medir el generador aleatorio
+    trabajos = [construir(ctx) for _ in range(peticiones)]
+
+    def ejecutar(trabajo):
+        t0 = time.perf_counter()
+        _peticion_http(base, metodo, *trabajo)
+        return time.perf_counter() - t0
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        latencias = list(pool.map(ejecutar, trabajos))
+    return latencias, time.perf_counter() - inicio
+
+
+def correr(size, args, directory):
+    rng = random.Random(args.semilla)
+    filename = os.path.join(directory, 'bench_%d.json' % size)
+    inicio = time.perf_counter()
+    dataset = generar_dataset(size, rng)
+    with open(filename, 'w') as f:
+        json.dump(dataset, f)
+    n_users = len(dataset['users'])
+    del dataset
+    generacion = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    handler = DataHandler(filename, journal=args.journal)
+    carga = time.perf_counter() - inicio
+    controller.data_handler = handler
+    saves = cronometrar_saves(handler)
+
+    ctx = {'rng': rng, 'size': size, 'n_users': n_users,
+           'task_ids': ['task-%d' % i for i in range(size)], 'contador': itertools.count()}
+    resultado = {'tasks': size, 'users': n_users, 'generacion_s': round(generacion, 3),
+                 'carga_s': round(carga, 3), 'rutas': {}}
+
+    servidor = None
+    if 'servidor' in args.modos:
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        servidor = make_server('127.0.0.1', 0, controller.app, threaded=True)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        base = 'http://127.0.0.1:%d' % servidor.server_port
+    client = controller.app.test_client()
+    try:
+        for nombre, (metodo, construir, fraccion) in RUTAS.items():
+            peticiones = max(1, int(args.requests * fraccion))
+            medicion = {}
+            if 'cliente' in args.modos:
+                medicion['cliente'] = resumir(
+                    *medir_cliente(client, metodo, construir, ctx, peticiones))
+            if servidor is not None:
+                medicion['servidor'] = resumir(
+                    *medir_servidor(base, metodo, construir, ctx, peticiones, args.hilos))
+            resultado['rutas'][nombre] = medicion
+    finally:
+        if servidor is not None:
+            servidor.shutdown()
+        handler.close()
+
+    resultado['save_data'] = {
+        'llamadas': len(saves),
+        'p50_ms': round(percentil(saves, 50) * 1e3, 3) if saves else None,
+        'p99_ms': round(percentil(saves, 99) * 1e3, 3) if saves else None,
+        'total_s': round(sum(saves), 3),
+    }
+    resultado['rss_pico_mb'] = rss_pico_mb()
+    return resultado
+
+
+def commit_actual():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--requests', type=int, default=500,
+                        help='peticiones por ruta y modo')
+    parser.add_argument('--hilos', type=int, default=8,
+                        help='clientes concurrentes contra el servidor local')
+    parser.add_argument('--modos', nargs='+', choices=['cliente', 'servidor'],
+                        default=['cliente', 'servidor'])
+    parser.add_argument('--journal', action='store_true',
+                        help='persistir con journal en lugar de reescribir data.json')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--salida', help='archivo JSON de resultados (por defecto stdout)')
+    args = parser.parse_args()
+
+    reporte = {
+        'commit': commit_actual(),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': vars(args),
+        'resultados': [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            reporte['resultados'].append(correr(size, args, directory))
+            print('%d tareas listas' % size, file=sys.stderr)
+
+    salida = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            f.write(salida)
+    else:
+        print(salida)
+    return reporte
+
+
+if __name__ == '__main__':
+    main()
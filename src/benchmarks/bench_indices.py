@@ -0,0 +1,82 @@
+"""
+Benchmark de latencia por petición con los índices por id del DataHandler.
+
+Carga N tareas en memoria y mide las peticiones que buscan registros por id.
+save_data se reemplaza por una función vacía para medir solo la búsqueda.
+
+Uso:
+    python src/benchmarks/bench_indices.py --sizes 1000 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import controller
+from data_handler import DataHandler
+
+
+def build_handler(size, directory):
+    handler = DataHandler(os.path.join(directory, 'bench_%d.json' % size))
+    handler.save_data = lambda: None
+    for i in range(size):
+        handler.add_task({
+            'id': 'task-%d' % i,
+            'title': 'tarea %d' % i,
+            'description': 'descripción de la tarea',
+            'status': 'pending',
+            'users': [{'usuario': 'user-%d' % (i % 1000), 'rol': 'programador'}],
+            'dependencies': [],
+        })
+    for i in range(1000):
+        handler.add_user({'id': 'user-%d' % i, 'name': 'usuario %d' % i,
+                          'email': None, 'contactos': [], 'tareas': []})
+    handler._pending.clear()
+    return handler
+
+
+def measure(client, size, requests):
+    ids = ['task-%d' % random.randrange(size) for _ in range(requests)]
+    start = time.perf_counter()
+    for task_id in ids:
+        client.post('/tasks/%s' % task_id, json={'estado': 'en_progreso'})
+    status_us = (time.perf_counter() - start) / requests * 1e6
+
+    start = time.perf_counter()
+    for task_id in ids:
+        client.post('/tasks/%s/dependencies' % task_id,
+                    json={'dependencytaskid': 'task-0', 'accion': 'adicionar'})
+    deps_us = (time.perf_counter() - start) / requests * 1e6
+
+    start = time.perf_counter()
+    for i in range(requests):
+        client.post('/usuarios', json={'contacto': 'user-%d' % (i % 1000), 'nombre': 'x'})
+    users_us = (time.perf_counter() - start) / requests * 1e6
+    return {'tasks': size, 'estado_us': round(status_us, 1),
+            'dependencias_us': round(deps_us, 1), 'usuario_duplicado_us': round(users_us, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    client = controller.app.test_client()
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            controller.data_handler = build_handler(size, directory)
+            results.append(measure(client, size, args.requests))
+            print(json.dumps(results[-1]))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark de memoria residente: N tareas como dicts frente a modelos con slots.
+
+Cada representación se mide en un proceso aparte para que la memoria de una
+no contamine a la otra. Se reporta el RSS ganado al construir las tareas.
+
+Uso:
+    python src/benchmarks/bench_memoria.py --sizes 1000 100000 1000000
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.tarea import Tarea
+
+ESTADOS = ['pending', 'en_progreso', 'Finalizado']
+ROLES = ['programador', 'pruebas', 'infra']
+
+
+def rss_bytes():
+    """RSS actual; en sistemas sin /proc se usa el máximo de getrusage."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        factor = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * factor
+
+
+def documents(size):
+    # Igual que json.load: cada registro trae sus propias copias de claves y valores
+    for i in range(size):
+        yield json.loads(json.dumps({
+            'id': 'task-%d' % i,
+            'title': 'tarea %d' % i,
+            'description': 'descripción de la tarea',
+            'status': ESTADOS[i % 3],
+            'users': [{'task_id': 'task-%d' % i, 'user_id': 'user-%d' % (i % 1000),
+                       'estado': 'activo', 'fecha_asignacion': None,
+                       'rol': ROLES[i % 3], 'usuario': 'user-%d' % (i % 1000)}],
+            'dependencies': ['task-%d' % (i - 1)] if i else [],
+        }))
+
+
+def measure(mode, size):
+    gc.collect()
+    before = rss_bytes()
+    if mode == 'dicts':
+        tasks = list(documents(size))
+    else:
+        tasks = [Tarea.from_dict(doc) for doc in documents(size)]
+    gc.collect()
+    used = rss_bytes() - before
+    return {'modo': mode, 'tasks': len(tasks), 'rss_mb': round(used / 2 ** 20, 1),
+            'bytes_por_tarea': round(used / size)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--modo', choices=['dicts', 'modelos'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        print(json.dumps(measure(args.modo, args.sizes[0])))
+        return None
+
+    results = []
+    for size in args.sizes:
+        for mode in ('dicts', 'modelos'):
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), '--modo', mode, '--sizes', str(size)])
+            results.append(json.loads(output))
+            print(json.dumps(results[-1]))
+    return results
+
+
+if __name__ == '__main__':
+    main()
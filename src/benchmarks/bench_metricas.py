@@ -0,0 +1,103 @@
+"""
+Benchmark del costo de las métricas y del profiler por muestreo.
+
+Carga un dataset sintético y recorre cada ruta de bench_endpoints con el
+cliente de prueba de Flask en tres configuraciones: métricas apagadas,
+métricas prendidas y métricas con el profiler corriendo. Las tres se
+alternan por ronda para que el ruido de la máquina las afecte por igual, y
+se reporta la p50 por ruta y el sobrecosto promedio contra la línea base.
+
+Uso:
+    python src/benchmarks/bench_metricas.py --size 100000 --requests 300
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_endpoints import RUTAS, commit_actual, generar_dataset, medir_cliente, percentil
+
+import controller
+from data_handler import DataHandler
+from utils import metrics
+
+CONFIGURACIONES = ('sin_metricas', 'metricas', 'metricas_y_profiler')
+
+
+def configurar(nombre):
+    metrics.REGISTRY.enabled = nombre != 'sin_metricas'
+    if nombre == 'metricas_y_profiler':
+        controller.profiler.start()
+    else:
+        controller.profiler.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=300,
+                        help='peticiones por ruta, configuración y ronda')
+    parser.add_argument('--rondas', type=int, default=3)
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semilla)
+    latencias = {nombre: {ruta: [] for ruta in RUTAS} for nombre in CONFIGURACIONES}
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'bench.json')
+        dataset = generar_dataset(args.size, rng)
+        with open(filename, 'w') as f:
+            json.dump(dataset, f)
+        n_users = len(dataset['users'])
+        del dataset
+
+        handler = DataHandler(filename, journal=True)
+        controller.data_handler = handler
+        client = controller.app.test_client()
+        ctx = {'rng': rng, 'size': args.size, 'n_users': n_users,
+               'task_ids': ['task-%d' % i for i in range(args.size)],
+               'contador': itertools.count()}
+        try:
+            for ronda in range(args.rondas):
+                for ruta, (metodo, construir, fraccion) in RUTAS.items():
+                    peticiones = max(1, int(args.requests * fraccion))
+                    for nombre in CONFIGURACIONES:
+                        configurar(nombre)
+                        medidas, _ = medir_cliente(client, metodo, construir, ctx, peticiones)
+                        latencias[nombre][ruta].extend(medidas)
+                print('ronda %d lista' % (ronda + 1), file=sys.stderr)
+        finally:
+            configurar('metricas')
+            handler.close()
+
+    rutas = {}
+    sobrecostos = {nombre: [] for nombre in CONFIGURACIONES[1:]}
+    for ruta in RUTAS:
+        base = percentil(latencias['sin_metricas'][ruta], 50)
+        rutas[ruta] = {}
+        for nombre in CONFIGURACIONES:
+            p50 = percentil(latencias[nombre][ruta], 50)
+            rutas[ruta][nombre + '_p50_ms'] = round(p50 * 1e3, 3)
+            if nombre in sobrecostos:
+                sobrecostos[nombre].append(p50 / base - 1)
+    reporte = {
+        'commit': commit_actual(),
+        'parametros': vars(args),
+        'rutas': rutas,
+        'sobrecosto_promedio_pct': {
+            nombre: round(100 * sum(valores) / len(valores), 2)
+            for nombre, valores in sobrecostos.items()},
+        'muestras_profiler': controller.profiler.samples,
+    }
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    return reporte
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark del modo multiproceso (DATA_SHARED=1).
+
+Crea un data.json sintético y lanza 1, 2, 4... procesos, cada uno con su
+propio DataHandler compartido y el cliente de prueba de Flask, como haría un
+servidor pre-fork. Cada proceso hace una mezcla de lecturas y escrituras;
+al final se verifica que ningún cambio de estado se perdió y se reporta el
+throughput total por cantidad de procesos en JSON.
+
+Uso:
+    python src/benchmarks/bench_multiproceso.py --tareas 10000 --procesos 1 2 4 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_endpoints import commit_actual, generar_dataset, percentil
+
+import controller
+from data_handler import DataHandler
+
+
+def trabajar(filename, semilla, peticiones, escrituras, tareas, inicio, cola):
+    handler = DataHandler(filename, shared=True)
+    controller.data_handler = handler
+    client = controller.app.test_client()
+    rng = random.Random(semilla)
+    latencias = []
+    escritas = 0
+    inicio.wait()
+    t_inicio = time.perf_counter()
+    for _ in range(peticiones):
+        t0 = time.perf_counter()
+        if rng.random() < escrituras:
+            # Cada proceso crea tareas propias: todas deben quedar en disco
+            response = client.post('/tasks', json={
+                'nombre': 'w%d' % semilla, 'descripcion': 'bench',
+                'usuario': 'user-%d' % rng.randrange(10), 'rol': 'programador'})
+            escritas += response.status_code < 400
+        else:
+            client.get('/tasks/task-%d' % rng.randrange(tareas) + '/blocked-by')
+        latencias.append(time.perf_counter() - t0)
+    cola.put((latencias, time.perf_counter() - t_inicio, escritas))
+    handler.close()
+
+
+def correr(procesos, args, directory):
+    filename = os.path.join(directory, 'bench_%d.json' % procesos)
+    with open(filename, 'w') as f:
+        json.dump(generar_dataset(args.tareas, random.Random(args.semilla)), f)
+    DataHandler(filename, shared=True).close()
+
+    contexto = multiprocessing.get_context('fork')
+    inicio = contexto.Event()
+    cola = contexto.Queue()
+    peticiones = args.requests // procesos
+    workers = [contexto.Process(target=trabajar, args=(
+        filename, i, peticiones, args.escrituras, args.tareas, inicio, cola))
+        for i in range(procesos)]
+    for worker in workers:
+        worker.start()
+    inicio.set()
+    resultados = [cola.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    latencias = [l for r in resultados for l in r[0]]
+    duracion = max(r[1] for r in resultados)
+    escritas = sum(r[2] for r in resultados)
+    recargado = DataHandler(filename, journal=True)
+    guardadas = len(recargado.tasks) - args.tareas
+    recargado.close()
+    return {
+        'procesos': procesos,
+        'peticiones': len(latencias),
+        'p50_ms': round(percentil(latencias, 50) * 1e3, 3),
+        'p99_ms': round(percentil(latencias, 99) * 1e3, 3),
+        'throughput_rps': round(len(latencias) / duracion, 1),
+        'escrituras': escritas,
+        'perdidas': escritas - guardadas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tareas', type=int, default=10000)
+    parser.add_argument('--procesos', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--requests', type=int, default=4000,
+                        help='peticiones totales, repartidas entre los procesos')
+    parser.add_argument('--escrituras', type=float, default=0.2,
+                        help='fracción de peticiones que escriben')
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    reporte = {'commit': commit_actual(), 'parametros': vars(args), 'resultados': []}
+    with tempfile.TemporaryDirectory() as directory:
+        for procesos in args.procesos:
+            reporte['resultados'].append(correr(procesos, args, directory))
+            print('%d procesos listos' % procesos, file=sys.stderr)
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    return reporte
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark del plan incremental frente a recalcularlo desde cero.
+
+Genera un data.json sintético por tamaño (con dependencias hacia tareas
+recientes, como bench_endpoints), arma el plan completo y mide la p50/p99 de
+un cambio de estado y de una dependencia nueva, con la cantidad de tareas
+que cada cambio recalcula. La consulta de GET /schedule también se mide.
+
+Uso:
+    python src/benchmarks/bench_schedule.py --sizes 100000 300000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_endpoints import ESTADOS, commit_actual, generar_dataset, percentil
+
+from data_handler import DataHandler
+from dependency_graph import CycleError
+
+
+def resumen(tiempos, recalculadas):
+    return {'p50_ms': round(percentil(tiempos, 50) * 1e3, 3),
+            'p99_ms': round(percentil(tiempos, 99) * 1e3, 3),
+            'recalculadas_p50': percentil(recalculadas, 50),
+            'recalculadas_max': max(recalculadas)}
+
+
+def medir(handler, cambio, repeticiones):
+    tiempos, recalculadas = [], []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cambio()
+        tiempos.append(time.perf_counter() - inicio)
+        recalculadas.append(handler.schedule.recomputed)
+    return resumen(tiempos, recalculadas)
+
+
+def correr(size, directory, args):
+    rng = random.Random(args.semilla)
+    filename = os.path.join(directory, 'data_%d.json' % size)
+    with open(filename, 'w') as f:
+        json.dump(generar_dataset(size, rng), f)
+    handler = DataHandler(filename)
+    resultado = {'tasks': size}
+
+    inicio = time.perf_counter()
+    handler.schedule
+    resultado['construccion_ms'] = round((time.perf_counter() - inicio) * 1e3, 1)
+
+    def cambiar_estado():
+        task = handler.get_task('task-%d' % rng.randrange(size))
+        handler.set_status(task, rng.choice(ESTADOS))
+
+    def agregar_dependencia():
+        task = handler.get_task('task-%d' % rng.randrange(1, size))
+        dep = 'task-%d' % rng.randrange(int(task.id[5:]))
+        try:
+            handler.add_dependency(task, dep)
+        except CycleError:
+            pass
+
+    resultado['cambio_estado'] = medir(handler, cambiar_estado, args.repeticiones)
+    resultado['dependencia_nueva'] = medir(handler, agregar_dependencia, args.repeticiones)
+
+    tiempos = []
+    for _ in range(args.repeticiones // 10 or 1):
+        inicio = time.perf_counter()
+        handler.schedule.end()
+        handler.schedule.critical_path(handler.schedule.end()[1])
+        tiempos.append(time.perf_counter() - inicio)
+    resultado['consulta_plan_p50_ms'] = round(percentil(tiempos, 50) * 1e3, 3)
+    handler.close()
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 300000])
+    parser.add_argument('--repeticiones', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    reporte = {'commit': commit_actual(), 'parametros': vars(args), 'resultados': []}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            reporte['resultados'].append(correr(size, directory, args))
+            print(json.dumps(reporte['resultados'][-1]), file=sys.stderr)
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    return reporte
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark de carga y save: data.json único frente al directorio de shards.
+
+Genera un data.json sintético por tamaño y lo migra a un directorio con cada
+cantidad de shards pedida. Para cada variante mide la lectura del storage (con
+el pool de procesos y sin él), la carga completa del DataHandler y la p50 de
+un save que modifica una sola tarea, sin journal, que es el caso en que un
+save reescribe archivos.
+
+Uso:
+    python src/benchmarks/bench_shards.py --sizes 10000 100000 --shards 4 16
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_endpoints import ESTADOS, commit_actual, generar_dataset, percentil
+
+from data_handler import DataHandler
+from migrate import migrate
+from storage import JsonStorage, ShardedStorage
+
+
+def ms(segundos):
+    return round(segundos * 1e3, 2)
+
+
+def bytes_en_disco(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+
+def medir_saves(handler, size, saves, rng):
+    tiempos = []
+    for _ in range(saves):
+        task = handler.get_task('task-%d' % rng.randrange(size))
+        handler.set_status(task, rng.choice(ESTADOS))
+        _, segundos = cronometrar(handler.save_data)
+        tiempos.append(segundos)
+    return ms(percentil(tiempos, 50))
+
+
+def medir(nombre, storage, abrir, size, saves, rng):
+    resultado = {'variante': nombre, 'tasks': size}
+    _, segundos = cronometrar(storage.load)
+    storage.close()
+    resultado['lectura_storage_ms'] = ms(segundos)
+    handler, segundos = cronometrar(abrir)
+    resultado['carga_handler_ms'] = ms(segundos)
+    resultado['save_una_tarea_p50_ms'] = medir_saves(handler, size, saves, rng)
+    handler.close()
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--shards', type=int, nargs='+', default=[4, 16])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='procesos del pool de carga')
+    parser.add_argument('--saves', type=int, default=20, help='saves medidos por variante')
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    reporte = {'commit': commit_actual(), 'cpus': os.cpu_count(), 'parametros': vars(args),
+               'resultados': []}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            rng = random.Random(args.semilla)
+            source = os.path.join(directory, 'data_%d.json' % size)
+            with open(source, 'w') as f:
+                json.dump(generar_dataset(size, rng), f)
+            variantes = [('json', JsonStorage(source),
+                          lambda: DataHandler(source))]
+            for shards in args.shards:
+                target = os.path.join(directory, 'data_%d_%d.shards' % (size, shards))
+                storage = ShardedStorage(target, shards=shards)
+                storage.load()
+                migrate(source, target, storage)
+                for workers in sorted({1, args.workers}):
+                    variantes.append((
+                        'sharded_%d_workers_%d' % (shards, workers),
+                        ShardedStorage(target, workers=workers),
+                        lambda target=target: DataHandler(target, backend='sharded')))
+            for nombre, storage, abrir in variantes:
+                resultado = medir(nombre, storage, abrir, size, args.saves, rng)
+                resultado['bytes'] = bytes_en_disco(getattr(storage, 'directory', source))
+                reporte['resultados'].append(resultado)
+                print(json.dumps(resultado), file=sys.stderr)
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    return reporte
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+Benchmark del arranque de la aplicación y de la memoria por worker.
+
+Genera un data.json sintético y, en procesos aparte con DATA_PATH apuntando a
+él, mide cuánto tarda ``import controller`` y el RSS que deja. Después crea
+workers con fork, como gunicorn, y cada uno atiende peticiones y
+reporta su RSS, PSS y USS (de /proc/self/smaps_rollup, solo Linux) después
+de 100 lecturas por id y después de un listado que recorre todas las tareas:
+
+    importar  cada worker importa la aplicación después del fork
+    preload   el proceso padre la importa con DATA_PRELOAD=1 antes del fork
+              y cada worker llama a post_fork (gunicorn --preload)
+
+La PSS reparte las páginas compartidas entre los procesos que las usan, así
+que su suma es la memoria real de todos los workers. Con ``--src`` se mide
+otro árbol, por ejemplo una versión anterior extraída con
+``git archive <commit> src | tar -x -C /tmp/anterior``.
+
+Uso:
+    python src/benchmarks/bench_workers.py --tareas 100000 --workers 4
+    python src/benchmarks/bench_workers.py --src /tmp/anterior/src
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_endpoints import commit_actual, generar_dataset
+
+# Corre en un intérprete aparte para que nada del árbol medido esté importado
+# de antemano. Argumentos: directorio src, modo, cantidad de workers y de tareas.
+MEDICION = r'''
+import json, os, random, sys, time
+sys.path.insert(0, sys.argv[1])
+modo, workers, tareas = sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+
+
+def memoria():
+    campos = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) == 3 and partes[2] == 'kB':
+                campos[partes[0].rstrip(':')] = int(partes[1]) * 1024
+    return {'rss': campos['Rss'], 'pss': campos['Pss'],
+            'uss': campos['Private_Clean'] + campos['Private_Dirty']}
+
+
+inicio = time.perf_counter()
+if modo != 'importar':
+    if modo == 'preload':
+        os.environ['DATA_PRELOAD'] = '1'
+    import controller
+if modo == 'solo_import':
+    print(json.dumps(dict(memoria(), import_ms=(time.perf_counter() - inicio) * 1e3)))
+    sys.exit()
+padre_ms = (time.perf_counter() - inicio) * 1e3
+
+resultados_r, resultados_w = os.pipe()
+salida_r, salida_w = os.pipe()
+hijos = []
+for _ in range(workers):
+    pid = os.fork()
+    if pid == 0:
+        os.close(salida_w)
+        inicio = time.perf_counter()
+        if modo == 'importar':
+            import controller
+        elif hasattr(controller, 'post_fork'):
+            controller.post_fork()
+        client = controller.app.test_client()
+        status = {client.get('/tasks/task-0/blocked-by').status_code}
+        primera_ms = (time.perf_counter() - inicio) * 1e3
+        rng = random.Random(os.getpid())
+        for _ in range(100):
+            status.add(client.get('/tasks/task-%d/blocked-by' % rng.randrange(tareas)).status_code)
+        lecturas = memoria()
+        # Recorre todas las tareas: sus contadores de referencias tocan cada página
+        status.add(client.get('/tasks?limit=10').status_code)
+        resultado = {'primera_peticion_ms': primera_ms, 'status': sorted(status),
+                     'lecturas': lecturas, 'listado': memoria()}
+        os.write(resultados_w, (json.dumps(resultado) + '\n').encode())
+        # Seguir vivo hasta que todos midieron: la PSS depende de quién comparte
+        os.read(salida_r, 1)
+        os._exit(0)
+    hijos.append(pid)
+os.close(resultados_w)
+with os.fdopen(resultados_r) as f:
+    resultados = [json.loads(f.readline()) for _ in hijos]
+padre = memoria()
+os.close(salida_w)
+for pid in hijos:
+    os.waitpid(pid, 0)
+print(json.dumps({'padre': dict(padre, arranque_ms=padre_ms), 'workers': resultados}))
+'''
+
+
+def mb(value):
+    return round(value / 2 ** 20, 1)
+
+
+def medir(args, directory, modo, workers=0):
+    env = dict(os.environ, DATA_PATH=os.path.join(directory, 'data.json'))
+    env.pop('DATA_PRELOAD', None)
+    output = subprocess.check_output(
+        [sys.executable, '-c', MEDICION, os.path.abspath(args.src), modo, str(workers),
+         str(args.tareas)],
+        cwd=directory, env=env)
+    return json.loads(output)
+
+
+def medir_import(args, directory):
+    corridas = [medir(args, directory, 'solo_import') for _ in range(args.repeticiones)]
+    return {'import_ms_p50': round(statistics.median(c['import_ms'] for c in corridas), 1),
+            'rss_mb': mb(statistics.median(c['rss'] for c in corridas))}
+
+
+def medir_workers(args, directory, modo):
+    medicion = medir(args, directory, modo, args.workers)
+    workers, padre = medicion['workers'], medicion['padre']
+    resultado = {
+        'modo': modo,
+        'workers': len(workers),
+        'status': sorted({s for w in workers for s in w['status']}),
+        'padre_arranque_ms': round(padre['arranque_ms'], 1),
+        'padre_pss_mb': mb(padre['pss']),
+        'primera_peticion_ms_p50': round(statistics.median(
+            w['primera_peticion_ms'] for w in workers), 1),
+    }
+    # Después de lecturas por id y después de un listado que recorre todo
+    for etapa in ('lecturas', 'listado'):
+        memorias = [w[etapa] for w in workers]
+        resultado[etapa] = {
+            'rss_mb_p50': mb(statistics.median(m['rss'] for m in memorias)),
+            'uss_mb_p50': mb(statistics.median(m['uss'] for m in memorias)),
+            # Memoria real del conjunto: PSS de los workers más la del padre
+            'pss_total_mb': mb(sum(m['pss'] for m in memorias) + padre['pss']),
+        }
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tareas', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--repeticiones', type=int, default=5,
+                        help='procesos que miden el import (se reporta la mediana)')
+    parser.add_argument('--src', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help='directorio src del árbol a medir')
+    parser.add_argument('--semilla', type=int, default=1)
+    args = parser.parse_args()
+
+    reporte = {'commit': commit_actual(), 'parametros': vars(args)}
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'data.json'), 'w') as f:
+            json.dump(generar_dataset(args.tareas, random.Random(args.semilla)), f)
+        reporte['import'] = medir_import(args, directory)
+        print(json.dumps(reporte['import']), file=sys.stderr)
+        reporte['resultados'] = []
+        for modo in ('importar', 'preload'):
+            reporte['resultados'].append(medir_workers(args, directory, modo))
+            print(json.dumps(reporte['resultados'][-1]), file=sys.stderr)
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    return reporte
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,446 @@
+"""
+Exporta e importa tareas, usuarios, asignaciones y dependencias en NDJSON o
+CSV, de a un registro.
+
+La exportación lee el backend directamente (``Storage.iter_records``) sin
+cargar los datos, así que la memoria no depende del tamaño del archivo. La
+importación lee la entrada de a una línea y aplica los registros sobre un
+DataHandler en lotes de ``--lote``, con un save por lote que se anexa al
+journal; al final pliega el journal en el archivo de datos. Como
+``reshard.py``, debe correr con la aplicación detenida.
+
+Los registros se validan como en los endpoints: roles de ROLES, ids que
+existen y dependencias sin ciclos. Una tarea (o un contacto) puede referirse
+a otra que aparece más adelante en la entrada; si al terminar no apareció, la
+referencia se quita y se informa. Los registros con errores se informan con
+su línea y no detienen la importación.
+
+En NDJSON las tareas y los usuarios van completos, con el formato de
+data.json; en CSV solo sus campos planos (ver ``COLUMNAS``) y las
+asignaciones y dependencias se exportan aparte.
+
+Uso:
+    python src/bulk.py exportar data.json tareas -o tareas.ndjson
+    python src/bulk.py exportar data.db asignaciones --backend sqlite -o asignaciones.csv
+    python src/bulk.py importar data.json tareas.ndjson tareas
+    python src/bulk.py importar data.json asignaciones.csv asignaciones --lote 5000
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+import uuid
+
+from data_handler import DataHandler
+from dependency_graph import CycleError
+from models.asignacion import ROLES
+from storage import BACKENDS, create_storage
+
+TIPOS = ('tareas', 'usuarios', 'asignaciones', 'dependencias')
+FORMATOS = ('ndjson', 'csv')
+# Columnas de cada tipo en CSV
+COLUMNAS = {
+    'tareas': ('id', 'title', 'description', 'status', 'duracion'),
+    'usuarios': ('id', 'name', 'email'),
+    'asignaciones': ('task_id', 'usuario', 'rol'),
+    'dependencias': ('task_id', 'depends_on'),
+}
+# Segundos entre dos informes de avance
+PROGRESO_SEGUNDOS = 1.0
+
+
+class Progreso:
+    """Informa por stderr los registros procesados y el ritmo, a lo sumo cada ``intervalo``."""
+
+    def __init__(self, etiqueta, intervalo=PROGRESO_SEGUNDOS, salida=None):
+        self.etiqueta = etiqueta
+        self.intervalo = intervalo
+        self.salida = salida
+        self.inicio = time.perf_counter()
+        self._ultimo = self.inicio
+
+    def segundos(self):
+        return time.perf_counter() - self.inicio
+
+    def ritmo(self, registros):
+        segundos = self.segundos()
+        return registros / segundos if segundos > 0 else 0.0
+
+    def informar(self, registros, detalle='', forzar=False):
+        ahora = time.perf_counter()
+        if not forzar and ahora - self._ultimo < self.intervalo:
+            return
+        self._ultimo = ahora
+        print("%s: %d registros%s (%d/s)" % (self.etiqueta, registros, detalle,
+                                             self.ritmo(registros)),
+              file=self.salida or sys.stderr)
+
+
+# ---------- exportación ----------
+
+def filas(storage, tipo):
+    """Genera las filas de ``tipo`` como dicts, leyendo ``storage`` de a un registro."""
+    kind = 'user' if tipo == 'usuarios' else 'task'
+    for record_kind, record in storage.iter_records():
+        if record_kind != kind:
+            continue
+        if tipo == 'asignaciones':
+            for user in record.get('users', ()):
+                yield {'task_id': record['id'], 'usuario': user.get('usuario'),
+                       'rol': user.get('rol')}
+        elif tipo == 'dependencias':
+            for dep_id in record.get('dependencies', ()):
+                yield {'task_id': record['id'], 'depends_on': dep_id}
+        else:
+            yield record
+
+
+def exportar(storage, tipo, formato, salida, progreso=None):
+    """Escribe las filas de ``tipo`` en ``salida``; retorna cuántas escribió."""
+    if formato == 'csv':
+        writer = csv.DictWriter(salida, COLUMNAS[tipo], extrasaction='ignore')
+        writer.writeheader()
+        escribir = writer.writerow
+    else:
+        def escribir(fila):
+            salida.write(json.dumps(fila, ensure_ascii=False, separators=(',', ':')) + '\n')
+    total = 0
+    for fila in filas(storage, tipo):
+        escribir(fila)
+        total += 1
+        if progreso is not None and not total % 1000:
+            progreso.informar(total)
+    return total
+
+
+# ---------- importación ----------
+
+def leer(entrada, formato):
+    """
+    Genera ``(línea, registro)`` de la entrada. En CSV una celda vacía es un
+    campo ausente; en NDJSON una línea que no es JSON llega como None.
+    """
+    if formato == 'csv':
+        reader = csv.DictReader(entrada)
+        for row in reader:
+            yield reader.line_num, {k: v for k, v in row.items()
+                                    if k is not None and v not in ('', None)}
+        return
+    for numero, linea in enumerate(entrada, 1):
+        if not linea.strip():
+            continue
+        try:
+            yield numero, json.loads(linea)
+        except ValueError:
+            yield numero, None
+
+
+def _id_valido(valor):
+    return isinstance(valor, str) and bool(valor)
+
+def _rol_valido(rol):
+    return rol in ROLES
+
+def _duracion_valida(valor):
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool) and valor >= 0
+
+def _numero(valor):
+    """Convierte una celda CSV a int o float; si no es un número la deja igual."""
+    for tipo in (int, float):
+        try:
+            return tipo(valor)
+        except ValueError:
+            pass
+    return valor
+
+def _validar_tarea(data):
+    if not _id_valido(data.get('id')):
+        return "Id no válido"
+    if 'status' in data and not isinstance(data['status'], str):
+        return "Estado no válido"
+    if 'duracion' in data and not _duracion_valida(data['duracion']):
+        return "Duración no válida"
+    users = data.get('users', [])
+    if not isinstance(users, list) or not all(
+            isinstance(u, dict) and _id_valido(u.get('usuario')) for u in users):
+        return "Usuarios no válidos"
+    # Las tareas exportadas de datos anteriores a guardar el rol de quien
+    # las creó traen esa asignación sin rol
+    if not all(u.get('rol') is None or _rol_valido(u['rol']) for u in users):
+        return "Rol no válido"
+    dependencies = data.get('dependencies', [])
+    if not isinstance(dependencies, list) or not all(_id_valido(d) for d in dependencies):
+        return "Dependencias no válidas"
+
+def _validar_usuario(data):
+    if not _id_valido(data.get('id')):
+        return "Id no válido"
+    contactos = data.get('contactos', [])
+    if not isinstance(contactos, list) or not all(_id_valido(c) for c in contactos):
+        return "Contactos no válidos"
+    if data['id'] in contactos:
+        return "Un usuario no puede ser su propio contacto"
+
+def _validar_asignacion(data):
+    if not all(k in data for k in ('task_id', 'usuario')):
+        return "Faltan campos requeridos"
+    if not _id_valido(data['usuario']):
+        return "Usuario no válido"
+    if not _rol_valido(data.get('rol')):
+        return "Rol no válido"
+
+def _validar_dependencia(data):
+    if not all(k in data for k in ('task_id', 'depends_on')):
+        return "Faltan campos requeridos"
+
+
+class Importador:
+    """
+    Aplica registros de un tipo sobre ``handler``. Se llama con el lock del
+    handler tomado; el save de cada lote queda a cargo de quien lo usa.
+
+    ``importados`` cuenta los registros aplicados y ``errores`` los
+    problemas informados a ``on_error(línea, mensaje)``, que por defecto
+    los escribe en stderr.
+    """
+
+    def __init__(self, handler, tipo, reemplazar=False, on_error=None):
+        self.handler = handler
+        self.tipo = tipo
+        self.reemplazar = reemplazar
+        self.on_error = on_error or self._imprimir
+        self.importados = 0
+        self.errores = 0
+        # ('task'|'user', id que todavía no apareció) -> [(línea, id que lo refiere)]
+        self._pendientes = {}
+        self._aplicar = {
+            'tareas': self._tarea, 'usuarios': self._usuario,
+            'asignaciones': self._asignacion, 'dependencias': self._dependencia,
+        }[tipo]
+
+    def aplicar(self, linea, registro):
+        """Valida y aplica un registro; retorna True si se importó."""
+        if not isinstance(registro, dict):
+            error = "Registro no válido"
+        else:
+            error = self._aplicar(linea, registro)
+        if error:
+            self._error(linea, error)
+            return False
+        self.importados += 1
+        return True
+
+    def terminar(self):
+        """Quita las referencias a ids que no aparecieron en toda la entrada."""
+        handler = self.handler
+        for (kind, faltante), origenes in self._pendientes.items():
+            for linea, record_id in origenes:
+                if kind == 'task':
+                    task = handler.get_task(record_id)
+                    if task is not None:
+                        handler.remove_dependency(task, faltante)
+                    self._error(linea, "Tarea dependiente no encontrada: %s" % faltante)
+                else:
+                    user = handler.get_user(record_id)
+                    if user is not None:
+                        handler.remove_contact(user, faltante)
+                    self._error(linea, "Contacto no encontrado: %s" % faltante)
+        self._pendientes = {}
+
+    def _tarea(self, linea, data):
+        handler = self.handler
+        data = dict(data)
+        if 'id' not in data:
+            # Sin id (CSV), un id nuevo como el que asigna POST /tasks
+            data['id'] = str(uuid.uuid4())
+        if isinstance(data.get('duracion'), str):
+            data['duracion'] = _numero(data['duracion'])
+        error = _validar_tarea(data)
+        if error:
+            return error
+        if not self.reemplazar and handler.get_task(data['id']) is not None:
+            return "La tarea ya existe"
+        task = handler.add_task(data)
+        for dep_id in task.dependencies:
+            if handler.get_task(dep_id) is None:
+                self._pendientes.setdefault(('task', dep_id), []).append((linea, task.id))
+        # El DataHandler enlaza solo las dependencias que esperaban a esta
+        # tarea; las que cerrarían un ciclo quedan en graph.rejected. La tarea
+        # se importa sin ellas
+        aristas = [(linea, task.id, dep_id) for dep_id in task.dependencies]
+        aristas += [(origen_linea, origen, task.id) for origen_linea, origen
+                    in self._pendientes.pop(('task', task.id), ())]
+        for origen_linea, origen, dep_id in aristas:
+            if (origen, dep_id) in handler.graph.rejected:
+                handler.graph.rejected.discard((origen, dep_id))
+                handler.remove_dependency(handler.get_task(origen), dep_id)
+                self._error(origen_linea, "La dependencia %s crea un ciclo" % dep_id)
+
+    def _usuario(self, linea, data):
+        handler = self.handler
+        error = _validar_usuario(data)
+        if error:
+            return error
+        if not self.reemplazar and handler.get_user(data['id']) is not None:
+            return "El alias ya está en uso"
+        user = handler.add_user(data)
+        for contacto in data.get('contactos', ()):
+            if handler.get_user(contacto) is None:
+                self._pendientes.setdefault(('user', contacto), []).append((linea, user.id))
+        self._pendientes.pop(('user', user.id), None)
+
+    def _asignacion(self, linea, data):
+        error = _validar_asignacion(data)
+        if error:
+            return error
+        task = self.handler.get_task(data['task_id'])
+        if task is None:
+            return "Tarea no encontrada"
+        self.handler.add_task_user(task, data['usuario'], data['rol'])
+
+    def _dependencia(self, linea, data):
+        error = _validar_dependencia(data)
+        if error:
+            return error
+        task = self.handler.get_task(data['task_id'])
+        if task is None:
+            return "Tarea no encontrada"
+        if self.handler.get_task(data['depends_on']) is None:
+            return "Tarea dependiente no encontrada"
+        try:
+            self.handler.add_dependency(task, data['depends_on'])
+        except CycleError:
+            return "La dependencia crea un ciclo"
+
+    def _error(self, linea, mensaje):
+        self.errores += 1
+        self.on_error(linea, mensaje)
+
+    @staticmethod
+    def _imprimir(linea, mensaje):
+        print("línea %d: %s" % (linea, mensaje), file=sys.stderr)
+
+
+def importar(handler, entrada, tipo, formato, lote=1000, reemplazar=False,
+             progreso=None, on_error=None):
+    """
+    Importa ``entrada`` en ``handler`` con un save_data por lote de ``lote``
+    registros. Retorna el Importador, con los contadores.
+    """
+    importador = Importador(handler, tipo, reemplazar, on_error)
+    registros = leer(entrada, formato)
+    leidos = 0
+    while True:
+        bloque = list(itertools.islice(registros, lote))
+        if not bloque:
+            break
+        antes = importador.importados
+        with handler.lock:
+            for linea, registro in bloque:
+                importador.aplicar(linea, registro)
+        # Un save sin cambios escribiría todo: solo si el lote aplicó algo
+        if importador.importados > antes:
+            handler.save_data()
+        leidos += len(bloque)
+        if progreso is not None:
+            progreso.informar(leidos, ", %d importados, %d errores"
+                              % (importador.importados, importador.errores))
+    if importador._pendientes:
+        with handler.lock:
+            importador.terminar()
+        handler.save_data()
+    return importador
+
+
+def _formato(formato, archivo):
+    if formato is not None:
+        return formato
+    return 'csv' if archivo and archivo.lower().endswith('.csv') else 'ndjson'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    exp = comandos.add_parser('exportar', help='escribe un tipo de registro en NDJSON o CSV')
+    exp.add_argument('datos', help='archivo o directorio de datos')
+    exp.add_argument('tipo', choices=TIPOS)
+    exp.add_argument('-o', '--salida', help='archivo de salida (por defecto, la salida estándar)')
+
+    imp = comandos.add_parser('importar', help='agrega registros desde NDJSON o CSV')
+    imp.add_argument('datos', help='archivo o directorio de datos (se crea si no existe)')
+    imp.add_argument('entrada', help="archivo NDJSON o CSV, o '-' para la entrada estándar")
+    imp.add_argument('tipo', choices=TIPOS)
+    imp.add_argument('--lote', type=int, default=1000, help='registros por save')
+    imp.add_argument('--reemplazar', action='store_true',
+                     help='reemplaza tareas y usuarios con el mismo id en lugar de rechazarlos')
+
+    for sub in (exp, imp):
+        sub.add_argument('--backend', choices=BACKENDS, default='json')
+        sub.add_argument('--formato', choices=FORMATOS,
+                         help='por defecto, csv si el archivo termina en .csv y si no ndjson')
+    args = parser.parse_args(argv)
+
+    if args.comando == 'exportar':
+        return _main_exportar(args)
+    return _main_importar(args)
+
+
+def _main_exportar(args):
+    if not os.path.exists(args.datos):
+        print("No existe %s" % args.datos, file=sys.stderr)
+        return 1
+    formato = _formato(args.formato, args.salida)
+    # El journal se lee si existe; sin él no cambia nada
+    storage = create_storage(args.backend, args.datos, journal=True)
+    progreso = Progreso(args.tipo)
+    try:
+        if args.salida is None:
+            total = exportar(storage, args.tipo, formato, sys.stdout, progreso)
+        else:
+            with open(args.salida, 'w', encoding='utf-8', newline='') as salida:
+                total = exportar(storage, args.tipo, formato, salida, progreso)
+    finally:
+        storage.close()
+    print("Exportadas %d filas de %s en %.1f s (%d/s)"
+          % (total, args.tipo, progreso.segundos(), progreso.ritmo(total)), file=sys.stderr)
+    return 0
+
+
+def _main_importar(args):
+    if args.lote < 1:
+        print("El lote debe ser positivo", file=sys.stderr)
+        return 1
+    if args.entrada != '-' and not os.path.exists(args.entrada):
+        print("No existe el archivo %s" % args.entrada, file=sys.stderr)
+        return 1
+    formato = _formato(args.formato, args.entrada)
+    # Con journal cada lote se anexa en lugar de reescribir todo, y se
+    # compacta una sola vez al final en lugar de cada compact_bytes. El
+    # historial de estados es de los cambios hechos desde la aplicación
+    handler = DataHandler(args.datos, journal=args.backend in ('json', 'sharded'),
+                          compact_bytes=sys.maxsize, backend=args.backend, history=False)
+    progreso = Progreso(args.tipo)
+    try:
+        if args.entrada == '-':
+            importador = importar(handler, sys.stdin, args.tipo, formato, args.lote,
+                                  args.reemplazar, progreso)
+        else:
+            with open(args.entrada, 'r', encoding='utf-8', newline='') as entrada:
+                importador = importar(handler, entrada, args.tipo, formato, args.lote,
+                                      args.reemplazar, progreso)
+        # Dejar el archivo completo para quien lo abra sin journal
+        handler.compact()
+    finally:
+        handler.close()
+    print("Importados %d registros de %s en %s (%d errores) en %.1f s (%d/s)"
+          % (importador.importados, args.tipo, args.datos, importador.errores,
+             progreso.segundos(), progreso.ritmo(importador.importados)))
+    return 1 if importador.errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+from collections import deque
+
+
+class ContactGraph:
+    """
+    Red de contactos entre alias, no dirigida y mantenida de forma incremental.
+
+    Dos alias son vecinos si comparten alguna tarea o si alguno tiene al otro
+    en sus ``contactos``. Por cada par se cuenta cuántas tareas comparten
+    (``shared``) y cuántos de los dos declararon al otro (``explicit``), así
+    que sacar a alguien de una tarea solo corta el vínculo si era la última
+    que tenían en común y no son contactos declarados.
+    """
+
+    def __init__(self):
+        self.shared = {}        # alias -> {alias: tareas en común}
+        self.explicit = {}      # alias -> {alias: 1 o 2 declaraciones}
+        self._declared = {}     # alias -> contactos que declaró
+
+    def __contains__(self, alias):
+        return alias in self.shared or alias in self.explicit
+
+    # ---------- construcción ----------
+
+    def load(self, task_aliases, user_contacts):
+        """
+        Construye la red desde cero. ``task_aliases`` es un iterable con los
+        alias de cada tarea y ``user_contacts`` uno de ``(alias, contactos)``.
+        """
+        self.__init__()
+        for aliases in task_aliases:
+            self.update_task((), aliases)
+        for alias, contacts in user_contacts:
+            self.set_contacts(alias, contacts)
+
+    def update_task(self, old, new):
+        """Aplica el cambio de los alias asignados a una tarea (sin repetidos)."""
+        kept = [a for a in new if a in old]
+        for aliases, delta in (([a for a in old if a not in new], -1),
+                               ([a for a in new if a not in old], 1)):
+            for i, alias in enumerate(aliases):
+                for other in kept:
+                    self._add(self.shared, alias, other, delta)
+                for other in aliases[i + 1:]:
+                    self._add(self.shared, alias, other, delta)
+
+    def set_contacts(self, alias, contacts):
+        """Reemplaza los contactos declarados por ``alias``."""
+        old = self._declared.pop(alias, ())
+        new = tuple(dict.fromkeys(c for c in contacts if c != alias))
+        for contact in old:
+            if contact not in new:
+                self._add(self.explicit, alias, contact, -1)
+        for contact in new:
+            if contact not in old:
+                self._add(self.explicit, alias, contact, 1)
+        if new:
+            self._declared[alias] = new
+
+    # ---------- consultas ----------
+
+    def neighbours(self, alias):
+        """Vecinos directos de ``alias`` con la cantidad de tareas en común."""
+        result = dict(self.shared.get(alias, ()))
+        for contact in self.explicit.get(alias, ()):
+            result.setdefault(contact, 0)
+        return result
+
+    def reachable(self, alias, depth=1, limit=None):
+        """
+        Alias a ``depth`` saltos o menos, como pares ``(alias, distancia)`` en
+        orden de distancia. Es una BFS que se corta al juntar ``limit``
+        resultados, así que con un hub no recorre toda la red.
+        """
+        seen = {alias}
+        result = []
+        frontier = deque([(alias, 0)])
+        while frontier:
+            node, distance = frontier.popleft()
+            if distance == depth:
+                continue
+            for neighbour in self._iter_neighbours(node):
+                if neighbour in seen:
+                    continue
+                seen.add(neighbour)
+                result.append((neighbour, distance + 1))
+                if limit is not None and len(result) >= limit:
+                    return result
+                frontier.append((neighbour, distance + 1))
+        return result
+
+    # ---------- internos ----------
+
+    def _iter_neighbours(self, alias):
+        yield from self.shared.get(alias, ())
+        shared = self.shared.get(alias, ())
+        for contact in self.explicit.get(alias, ()):
+            if contact not in shared:
+                yield contact
+
+    @staticmethod
+    def _add(edges, alias, other, delta):
+        for a, b in ((alias, other), (other, alias)):
+            counts = edges.setdefault(a, {})
+            count = counts.get(b, 0) + delta
+            if count > 0:
+                counts[b] = count
+            else:
+                counts.pop(b, None)
+                if not counts:
+                    del edges[a]
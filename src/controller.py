@@ -1,42 +1,311 @@
-from flask import Flask, jsonify, request
+from flask import (Blueprint, Flask, Response, current_app, g, jsonify, request,
+                   stream_with_context)
 from data_handler import DataHandler
+from dependency_graph import CycleError
 from models.tarea import Tarea
 from models.usuario import Usuario
 from models.asignacion import Asignacion
+from utils import metrics
+from utils.profiler import SamplingProfiler
+from workspaces import WorkspaceManager
 
+import base64
+import contextlib
+import contextvars
+import gc
+import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import os
+import threading
+import time
 import uuid
 
-app = Flask(__name__)
-data_handler = DataHandler()
+# Configuración (create_app la lee de estas variables de entorno, con los
+# mismos nombres como claves de app.config):
+#   DATA_BACKEND=json|sqlite|snapshot|sharded  backend de almacenamiento (json por defecto)
+#   DATA_PATH                 archivo de datos (data.json, data.db, data.snap o data.shards)
+#   DATA_JOURNAL=1            con json o sharded, anexa cambios a un journal en lugar de reescribir
+#   DATA_SHARDS               cantidad de shards al crear un directorio sharded (8 por defecto)
+#   DATA_DURABILITY           sync|group|async (sync por defecto)
+#   DATA_FLUSH_MS             ventana de agrupación del escritor en milisegundos
+#   DATA_CACHE_SIZE           registros codificados que guarda la caché de lectura
+#   DATA_SHARED=1             varios procesos worker sobre el mismo archivo (json)
+#   DATA_PRELOAD=1            carga los datos al crear la aplicación (ver preload)
+#   DATA_PRELOAD_INDICES      índices derivados a armar también, separados por coma
+#                             (text_index, contacts, schedule, status_counts)
+# Espacios de trabajo (rutas /w/<espacio>/..., cada uno con sus propios datos):
+#   WORKSPACES_DIR            directorio con un subdirectorio por espacio (workspaces)
+#   WORKSPACES_MEMORY_MB      memoria estimada de los espacios cargados antes de
+#                             descargar los menos usados (512 por defecto)
+# Instrumentación:
+#   METRICS=0                 no registra métricas (GET /metrics queda con los tamaños)
+#   PROFILER=1                arranca con el profiler por muestreo prendido
+DATA_PATHS = {'json': 'data.json', 'sqlite': 'data.db', 'snapshot': 'data.snap',
+              'sharded': 'data.shards'}
+
+bp = Blueprint('tareas', __name__)
+espacios_bp = Blueprint('espacios', __name__)
+# Rutas de operación del proceso: se registran una sola vez, sin /w/<espacio>
+admin_bp = Blueprint('admin', __name__)
+
+# El DataHandler del proceso: se crea en la primera petición (o en preload)
+# con la configuración de la aplicación. Las pruebas lo reemplazan.
+data_handler = None
+# Los espacios de trabajo del proceso, creados en el primer acceso a uno
+workspaces = None
+_init_lock = threading.Lock()
+# DataHandler de la petición en curso: el del proceso o el de su espacio
+_handler_actual = contextvars.ContextVar('data_handler')
+
+REQUEST_SECONDS = metrics.histogram(
+    'http_request_duration_seconds', 'Latencia de las peticiones por ruta',
+    ('route', 'method', 'status'))
+ENCODE_SECONDS = metrics.histogram(
+    'json_encode_seconds', 'Codificación de un documento a JSON (fallos de la caché)')
+profiler = SamplingProfiler()
+
+
+def config_from_env(environ=os.environ):
+    """Configuración de la aplicación a partir de las variables de entorno."""
+    return {
+        'DATA_BACKEND': environ.get('DATA_BACKEND', 'json'),
+        'DATA_PATH': environ.get('DATA_PATH'),
+        'DATA_JOURNAL': environ.get('DATA_JOURNAL') == '1',
+        'DATA_SHARDS': int(environ.get('DATA_SHARDS', '8')),
+        'DATA_DURABILITY': environ.get('DATA_DURABILITY', 'sync'),
+        'DATA_FLUSH_MS': int(environ.get('DATA_FLUSH_MS', '5')),
+        'DATA_CACHE_SIZE': int(environ.get('DATA_CACHE_SIZE', '10000')),
+        'DATA_HISTORY_DAYS': int(environ.get('DATA_HISTORY_DAYS', '30')),
+        'DATA_SHARED': environ.get('DATA_SHARED') == '1',
+        'DATA_PRELOAD': environ.get('DATA_PRELOAD') == '1',
+        'DATA_PRELOAD_INDICES': [nombre for nombre in
+                                 environ.get('DATA_PRELOAD_INDICES', '').split(',') if nombre],
+        'WORKSPACES_DIR': environ.get('WORKSPACES_DIR', 'workspaces'),
+        'WORKSPACES_MEMORY_MB': int(environ.get('WORKSPACES_MEMORY_MB', '512')),
+        'METRICS': environ.get('METRICS') != '0',
+        'PROFILER': environ.get('PROFILER') == '1',
+        'ADMIN_ROUTES': environ.get('ADMIN_ROUTES') != '0',
+        'ADMIN_TOKEN': environ.get('ADMIN_TOKEN'),
+    }
+
+
+def create_app(config=None):
+    """
+    Crea la aplicación con la configuración del entorno, pisada por
+    ``config``. No lee los datos: el DataHandler se crea en la primera
+    petición, salvo con DATA_PRELOAD.
+
+    El DataHandler, las métricas y el profiler son del proceso, así que se
+    usa una aplicación por proceso.
+    """
+    app = Flask(__name__)
+    app.config.update(config_from_env())
+    app.config.update(config or {})
+    app.register_blueprint(bp)
+    app.register_blueprint(bp, url_prefix='/w/<workspace>', name='tareas_espacio')
+    # Por nombre de registro: Flask 2.0.1 copia los before_request de un
+    # blueprint solo en su primer registro, y estos van en los dos
+    for nombre in (bp.name, 'tareas_espacio'):
+        app.before_request_funcs.setdefault(nombre, []).append(sincronizar_datos)
+        app.teardown_request_funcs.setdefault(nombre, []).append(liberar_espacio)
+    app.register_blueprint(espacios_bp)
+    if app.config['ADMIN_ROUTES']:
+        app.register_blueprint(admin_bp)
+    metrics.REGISTRY.enabled = app.config['METRICS']
+    if app.config['PROFILER']:
+        profiler.start()
+    if app.config['DATA_PRELOAD']:
+        preload(app, app.config['DATA_PRELOAD_INDICES'])
+    return app
+
+
+def get_data_handler(app=None):
+    """
+    El DataHandler del proceso; la primera llamada lo crea con la
+    configuración de ``app`` o de la aplicación de la petición en curso.
+    """
+    global data_handler
+    if data_handler is None:
+        with _init_lock:
+            if data_handler is None:
+                config = (app or current_app).config
+                data_handler = DataHandler(
+                    config['DATA_PATH'] or DATA_PATHS.get(config['DATA_BACKEND'], 'data.json'),
+                    **_opciones_handler(config))
+    return data_handler
+
+
+def get_workspaces(app=None):
+    """Como ``get_data_handler``, para el WorkspaceManager del proceso."""
+    global workspaces
+    if workspaces is None:
+        with _init_lock:
+            if workspaces is None:
+                config = (app or current_app).config
+                workspaces = WorkspaceManager(
+                    config['WORKSPACES_DIR'], config['WORKSPACES_MEMORY_MB'] * 2 ** 20,
+                    data_file=DATA_PATHS.get(config['DATA_BACKEND'], 'data.json'),
+                    **_opciones_handler(config))
+    return workspaces
+
+
+def _opciones_handler(config):
+    return {
+        'journal': config['DATA_JOURNAL'],
+        'backend': config['DATA_BACKEND'],
+        'durability': config['DATA_DURABILITY'],
+        'flush_ms': config['DATA_FLUSH_MS'],
+        'cache_size': config['DATA_CACHE_SIZE'],
+        'history_days': config['DATA_HISTORY_DAYS'],
+        'shared': config['DATA_SHARED'],
+        'shards': config['DATA_SHARDS'],
+    }
+
+
+def _handler():
+    """DataHandler de la petición en curso."""
+    return _handler_actual.get()
+
+
+def preload(app=None, indices=()):
+    """
+    Carga los datos, sus índices y los índices derivados de ``indices``
+    antes de que el servidor cree los workers con fork (gunicorn --preload),
+    para que todos compartan esas páginas copy-on-write en lugar de cargar
+    cada uno su copia. Cada worker debe llamar a ``post_fork`` al arrancar.
+    """
+    handler = get_data_handler(app)
+    with handler.lock.read():
+        # Con el snapshot binario, los índices secundarios se arman en el primer uso
+        handler.tasks_by_user
+        for nombre in indices:
+            getattr(handler, nombre)
+    # Fuera del recolector: sus pasadas no escriben en las páginas compartidas
+    gc.freeze()
+    return handler
+
+
+def post_fork():
+    """
+    Llamar en cada worker después del fork (hook post_fork de gunicorn): los
+    hilos del proceso padre no pasan al hijo y sus archivos abiertos no
+    deben compartirse.
+    """
+    if data_handler is not None:
+        data_handler.after_fork()
+    if workspaces is not None:
+        workspaces.after_fork()
+    profiler.after_fork()
+
+def _metricas_proceso():
+    return [
+        ('sse_connections', 'gauge', 'Clientes conectados a /changes/stream',
+         [({}, conexiones_sse)]),
+        ('profiler_running', 'gauge', 'Profiler por muestreo prendido',
+         [({}, int(profiler.running))]),
+        ('profiler_samples_total', 'counter', 'Muestras tomadas por el profiler',
+         [({}, profiler.samples)]),
+    ]
+
+# data_handler se busca en cada scrape: las pruebas lo reemplazan y antes de
+# la primera petición todavía no existe
+metrics.REGISTRY.add_collector(
+    lambda: data_handler.metric_families() if data_handler is not None else [])
+metrics.REGISTRY.add_collector(
+    lambda: workspaces.metric_families() if workspaces is not None else [])
+metrics.REGISTRY.add_collector(_metricas_proceso)
 
 class ControladorTareas:
     def __init__(self, data_handler):
         self.data_handler = data_handler
 
-@app.route('/dummy', methods=['GET'])
+@bp.before_app_request
+def iniciar_medicion():
+    g.inicio = time.perf_counter()
+
+@bp.after_app_request
+def registrar_medicion(response):
+    inicio = g.pop('inicio', None)
+    if inicio is not None:
+        # La regla (/tasks/<task_id>) y no la URL, para no abrir una serie por id
+        ruta = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+        REQUEST_SECONDS.observe(time.perf_counter() - inicio, ruta, request.method,
+                                str(response.status_code))
+    return response
+
+@bp.app_url_value_preprocessor
+def extraer_espacio(endpoint, values):
+    # Las rutas de /w/<workspace>/... son las mismas funciones sin ese argumento
+    g.workspace = values.pop('workspace', None) if values else None
+
+def sincronizar_datos():
+    # Elige el DataHandler de la petición (lo crea o carga el espacio si hace
+    # falta) y, con varios workers, aplica antes lo que hayan escrito los demás.
+    # Solo en las rutas de tareas (ver create_app): las de /workspaces y las
+    # de operación no deben cargar los datos
+    if g.workspace is None:
+        handler = get_data_handler()
+    else:
+        try:
+            handler = get_workspaces().acquire(g.workspace)
+        except KeyError:
+            g.workspace = None
+            return jsonify({"error": "Espacio de trabajo no encontrado"}), 404
+    _handler_actual.set(handler)
+    handler.refresh()
+
+def liberar_espacio(error):
+    # Con una respuesta en streaming, al terminar de enviarla
+    if g.get('workspace') is not None:
+        get_workspaces().release(g.workspace)
+
+@bp.route('/dummy', methods=['GET'])
 def dummy_endpoint():
     # Example dummy response
     return jsonify({"message": "This is a dummy endpoint!"})
 
-@app.route('/tasks', methods=['POST'])
-def crear_tarea():
+ROLES = ['programador', 'pruebas', 'infra']
+ACCIONES = ['adicionar', 'remover']
+
+
+def _ejecutar(validar, aplicar, data, *args):
     """
-    Crea una nueva tarea
-    Entrada esperada:
-    {
-        "nombre": "nombre de la tarea",
-        "descripcion": "descripción de la tarea",
-        "usuario": "alias",
-        "rol": "programador|pruebas|infra"
-    }
+    Valida la entrada, aplica la operación bajo el lock del DataHandler y
+    persiste si tuvo éxito. Retorna la respuesta HTTP.
+
+    Las operaciones sobre una tarea o un usuario (``args[0]``) toman además
+    su lock, que se mantiene durante el save: dos peticiones al mismo
+    registro se aplican y confirman en orden, mientras que las de otros solo
+    esperan la actualización en memoria.
     """
-    data = request.json
+    handler = _handler()
+    error = validar(data)
+    if error:
+        return jsonify({"error": error}), 400
+    with handler.task_lock(args[0]) if args else contextlib.nullcontext():
+        with handler.transaction():
+            with handler.lock:
+                respuesta, status = aplicar(*args, data)
+            if status < 400:
+                handler.save_data()
+    return jsonify(respuesta), status
+
+def _duracion_valida(valor):
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool) and valor >= 0
+
+def _validar_tarea(data):
     if not all(k in data for k in ['nombre', 'descripcion', 'usuario', 'rol']):
-        return jsonify({"error": "Faltan campos requeridos"}), 400
-    
-    if data['rol'] not in ['programador', 'pruebas', 'infra']:
-        return jsonify({"error": "Rol no válido"}), 400
+        return "Faltan campos requeridos"
+    if data['rol'] not in ROLES:
+        return "Rol no válido"
+    if 'duracion' in data and not _duracion_valida(data['duracion']):
+        return "Duración no válida"
 
+def _crear_tarea(data):
+    handler = _handler()
     task_id = str(uuid.uuid4())
     # Mapear los nombres de campos
     tarea = Tarea(
@@ -45,22 +314,147 @@ def crear_tarea():
         description=data['descripcion']
     )
     
-    # Crear asignación al crear la tarea
+    # Crear asignación al crear la tarea, con sus detalles completos y el
+    # rol pedido, para que el creador cuente en el índice y los conteos por rol
     asignacion = Asignacion(task_id, data['usuario'])
-    tarea.add_user(data['usuario'], data['rol'])
-    
-    # Convertir a diccionario y agregar detalles de asignación
-    tarea_dict = tarea.__dict__
-    if 'users' in tarea_dict and tarea_dict['users']:
-        for user in tarea_dict['users']:
-            user.update(asignacion.get_assignment_details())
+    asignacion.usuario = asignacion.user_id
+    asignacion.rol = data['rol']
+    tarea.users = (asignacion,)
+    if 'duracion' in data:
+        tarea.extra = {'duracion': data['duracion']}
     
-    data_handler.tasks.append(tarea_dict)
-    data_handler.save_data()
+    handler.add_task(tarea)
+    return {"id": task_id}, 201
+
+def _validar_estado(data):
+    if 'estado' not in data:
+        return "Falta el campo estado"
+    # Los estados se internan y son claves de los índices: solo strings
+    if not isinstance(data['estado'], str):
+        return "Estado no válido"
+
+def _actualizar_estado(task_id, data):
+    handler = _handler()
+    tarea = handler.get_task(task_id)
+    if not tarea:
+        return {"error": "Tarea no encontrada"}, 404
+
+    handler.set_status(tarea, data['estado'])
+    return {"mensaje": "Estado actualizado exitosamente"}, 200
+
+def _validar_duracion(data):
+    if 'duracion' not in data:
+        return "Falta el campo duracion"
+    if not _duracion_valida(data['duracion']):
+        return "Duración no válida"
+
+def _actualizar_duracion(task_id, data):
+    handler = _handler()
+    tarea = handler.get_task(task_id)
+    if not tarea:
+        return {"error": "Tarea no encontrada"}, 404
+
+    handler.set_duration(tarea, data['duracion'])
+    return {"mensaje": "Duración actualizada exitosamente"}, 200
+
+def _validar_usuarios(data):
+    if not all(k in data for k in ['usuario', 'rol', 'accion']):
+        return "Faltan campos requeridos"
+    if data['rol'] not in ROLES:
+        return "Rol no válido"
+    if data['accion'] not in ACCIONES:
+        return "Acción no válida"
+
+def _gestionar_usuarios(task_id, data):
+    handler = _handler()
+    tarea = handler.get_task(task_id)
+    if not tarea:
+        return {"error": "Tarea no encontrada"}, 404
+
+    if data['accion'] == 'adicionar':
+        handler.add_task_user(tarea, data['usuario'], data['rol'])
+    else:
+        handler.remove_task_user(tarea, data['usuario'], data['rol'])
+    return {"mensaje": "Usuarios actualizados exitosamente"}, 200
+
+def _validar_dependencias(data):
+    if not all(k in data for k in ['dependencytaskid', 'accion']):
+        return "Faltan campos requeridos"
+    if data['accion'] not in ACCIONES:
+        return "Acción no válida"
+
+def _gestionar_dependencias(task_id, data):
+    handler = _handler()
+    tarea = handler.get_task(task_id)
+    if not tarea:
+        return {"error": "Tarea no encontrada"}, 404
+
+    tarea_dependencia = handler.get_task(data['dependencytaskid'])
+    if not tarea_dependencia:
+        return {"error": "Tarea dependiente no encontrada"}, 404
+
+    if data['accion'] == 'adicionar':
+        try:
+            handler.add_dependency(tarea, data['dependencytaskid'])
+        except CycleError:
+            return {"error": "La dependencia crea un ciclo"}, 400
+    else:
+        handler.remove_dependency(tarea, data['dependencytaskid'])
     
-    return jsonify({"id": task_id}), 201
+    return {"mensaje": "Dependencias actualizadas exitosamente"}, 200
+
+def _validar_usuario(data):
+    if not all(k in data for k in ['contacto', 'nombre']):
+        return "Faltan campos requeridos"
+
+def _crear_usuario(data):
+    handler = _handler()
+    # Verificar si el usuario ya existe
+    if handler.get_user(data['contacto']) is not None:
+        return {"error": "El alias ya está en uso"}, 400
+
+    nuevo_usuario = Usuario(data['contacto'], data['nombre'], None)
+    handler.add_user(nuevo_usuario)
+    return {"mensaje": "Usuario creado exitosamente", "id": data['contacto']}, 201
+
+def _validar_contacto(data):
+    if not all(k in data for k in ['contacto', 'accion']):
+        return "Faltan campos requeridos"
+    if data['accion'] not in ACCIONES:
+        return "Acción no válida"
+
+def _gestionar_contactos(alias, data):
+    handler = _handler()
+    usuario = handler.get_user(alias)
+    if not usuario:
+        return {"error": "Usuario no encontrado"}, 404
+
+    if data['accion'] == 'adicionar':
+        if data['contacto'] == alias:
+            return {"error": "Un usuario no puede ser su propio contacto"}, 400
+        if handler.get_user(data['contacto']) is None:
+            return {"error": "Contacto no encontrado"}, 404
+        handler.add_contact(usuario, data['contacto'])
+    else:
+        handler.remove_contact(usuario, data['contacto'])
+    return {"mensaje": "Contactos actualizados exitosamente"}, 200
+
+@bp.route('/tasks', methods=['POST'])
+def crear_tarea():
+    """
+    Crea una nueva tarea
+    Entrada esperada:
+    {
+        "nombre": "nombre de la tarea",
+        "descripcion": "descripción de la tarea",
+        "usuario": "alias",
+        "rol": "programador|pruebas|infra",
+        "duracion": 3  (opcional, estimación para GET /schedule)
+    }
+    """
+    return _ejecutar(_validar_tarea, _crear_tarea, request.json)
 
-@app.route('/tasks/<task_id>', methods=['POST'])
+@bp.route('/tasks/<task_id>', methods=['POST'])
 def actualizar_estado_tarea(task_id):
     """
     Actualiza el estado de una tarea
@@ -69,20 +463,20 @@ def actualizar_estado_tarea(task_id):
         "estado": "nuevo_estado"
     }
     """
-    data = request.json
-    if 'estado' not in data:
-        return jsonify({"error": "Falta el campo estado"}), 400
-
-    tarea = next((t for t in data_handler.tasks if t['id'] == task_id), None)
-    if not tarea:
-        return jsonify({"error": "Tarea no encontrada"}), 404
+    return _ejecutar(_validar_estado, _actualizar_estado, request.json, task_id)
 
-    tarea['status'] = data['estado']
-    data_handler.save_data()
-    
-    return jsonify({"mensaje": "Estado actualizado exitosamente"}), 200
+@bp.route('/tasks/<task_id>/duracion', methods=['POST'])
+def actualizar_duracion_tarea(task_id):
+    """
+    Cambia la estimación de una tarea, en las unidades que use el equipo
+    Entrada esperada:
+    {
+        "duracion": 3
+    }
+    """
+    return _ejecutar(_validar_duracion, _actualizar_duracion, request.json, task_id)
 
-@app.route('/tasks/<task_id>/users', methods=['POST'])
+@bp.route('/tasks/<task_id>/users', methods=['POST'])
 def gestionar_usuarios_tarea(task_id):
     """
     Gestiona usuarios de una tarea
@@ -93,31 +487,9 @@ def gestionar_usuarios_tarea(task_id):
         "accion": "adicionar|remover"
     }
     """
-    data = request.json
-    if not all(k in data for k in ['usuario', 'rol', 'accion']):
-        return jsonify({"error": "Faltan campos requeridos"}), 400
+    return _ejecutar(_validar_usuarios, _gestionar_usuarios, request.json, task_id)
 
-    if data['rol'] not in ['programador', 'pruebas', 'infra']:
-        return jsonify({"error": "Rol no válido"}), 400
-
-    if data['accion'] not in ['adicionar', 'remover']:
-        return jsonify({"error": "Acción no válida"}), 400
-
-    tarea = next((t for t in data_handler.tasks if t['id'] == task_id), None)
-    if not tarea:
-        return jsonify({"error": "Tarea no encontrada"}), 404
-
-    if data['accion'] == 'adicionar':
-        if not any(u['usuario'] == data['usuario'] and u['rol'] == data['rol'] for u in tarea['users']):
-            tarea['users'].append({"usuario": data['usuario'], "rol": data['rol']})
-    else:
-        tarea['users'] = [u for u in tarea['users'] 
-                         if not (u['usuario'] == data['usuario'] and u['rol'] == data['rol'])]
-    
-    data_handler.save_data()
-    return jsonify({"mensaje": "Usuarios actualizados exitosamente"}), 200
-
-@app.route('/tasks/<task_id>/dependencies', methods=['POST'])
+@bp.route('/tasks/<task_id>/dependencies', methods=['POST'])
 def gestionar_dependencias_tarea(task_id):
     """
     Gestiona dependencias de una tarea
@@ -127,56 +499,387 @@ def gestionar_dependencias_tarea(task_id):
         "accion": "adicionar|remover"
     }
     """
-    data = request.json
-    if not all(k in data for k in ['dependencytaskid', 'accion']):
-        return jsonify({"error": "Faltan campos requeridos"}), 400
+    return _ejecutar(_validar_dependencias, _gestionar_dependencias, request.json, task_id)
 
-    if data['accion'] not in ['adicionar', 'remover']:
-        return jsonify({"error": "Acción no válida"}), 400
 
-    tarea = next((t for t in data_handler.tasks if t['id'] == task_id), None)
-    if not tarea:
-        return jsonify({"error": "Tarea no encontrada"}), 404
 
-    tarea_dependencia = next((t for t in data_handler.tasks if t['id'] == data['dependencytaskid']), None)
-    if not tarea_dependencia:
-        return jsonify({"error": "Tarea dependiente no encontrada"}), 404
 
-    if data['accion'] == 'adicionar':
-        if data['dependencytaskid'] not in tarea.get('dependencies', []):
-            if 'dependencies' not in tarea:
-                tarea['dependencies'] = []
-            tarea['dependencies'].append(data['dependencytaskid'])
+def _codificar(documento):
+    """
+    JSON compacto y con las claves ordenadas, como ``jsonify`` fuera de modo
+    debug, para que las respuestas armadas por partes sean idénticas byte a
+    byte a las que arma Flask.
+    """
+    inicio = time.perf_counter()
+    datos = json.dumps(documento, separators=(',', ':'), sort_keys=True).encode()
+    ENCODE_SECONDS.observe(time.perf_counter() - inicio)
+    return datos
+
+def _json_tarea(tarea):
+    """JSON de la tarea, tomado de la caché mientras su versión no cambie."""
+    handler = _handler()
+    return handler.cache.get(('task', tarea.id), handler.task_version(tarea.id),
+                             lambda: _codificar(tarea.to_dict()))
+
+def _json_usuario(usuario):
+    """JSON del usuario sin el campo "tareas", que GET /usuarios/<alias> reemplaza."""
+    handler = _handler()
+    return handler.cache.get(
+        ('user', usuario.id), handler.user_version(usuario.id),
+        lambda: _codificar({k: v for k, v in usuario.to_dict().items() if k != 'tareas'}))
+
+def _lista_json(tareas):
+    return b'[' + b','.join(_json_tarea(t) for t in tareas) + b']'
+
+def _etag(tareas, *partes):
+    """ETag a partir de las versiones de las tareas y del resto de la respuesta."""
+    handler = _handler()
+    digest = hashlib.blake2b(repr((handler.epoch, request.query_string) + partes).encode(),
+                             digest_size=16)
+    for tarea in tareas:
+        digest.update(('%s:%d;' % (tarea.id, handler.task_version(tarea.id))).encode())
+    return digest.hexdigest()
+
+def _respuesta_json(etag, cuerpo):
+    """304 si el cliente ya tiene ``etag``; si no, arma el cuerpo llamando a ``cuerpo()``."""
+    if request.if_none_match.contains(etag):
+        respuesta = Response(status=304)
     else:
-        if 'dependencies' in tarea and data['dependencytaskid'] in tarea['dependencies']:
-            tarea['dependencies'].remove(data['dependencytaskid'])
-    
-    data_handler.save_data()
-    return jsonify({"mensaje": "Dependencias actualizadas exitosamente"}), 200
+        # jsonify termina el cuerpo con un salto de línea
+        respuesta = Response(cuerpo() + b'\n', mimetype='application/json')
+    respuesta.set_etag(etag)
+    return respuesta
+
+# Criterios de orden de GET /tasks; "-criterio" invierte el orden
+ORDENES = {
+    'creacion': lambda handler, t: handler.task_seq[t.id],
+    'id': lambda handler, t: t.id,
+    'titulo': lambda handler, t: str(t.title or ''),
+    'estado': lambda handler, t: str(t.status or ''),
+}
+
+def _codificar_cursor(orden, clave):
+    return base64.urlsafe_b64encode(json.dumps([orden, clave]).encode()).decode()
+
+def _decodificar_cursor(orden, cursor):
+    """Retorna la clave guardada en el cursor; ValueError si no es de este orden."""
+    valor = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(valor, list) or len(valor) != 2 or valor[0] != orden:
+        raise ValueError(cursor)
+    return valor[1]
+
+@bp.route('/tasks', methods=['GET'])
+def listar_tareas():
+    """
+    Lista tareas filtradas, ordenadas y paginadas
+    Parámetros opcionales:
+        estado        estado de la tarea
+        rol           programador|pruebas|infra
+        usuario       alias asignado (con rol, asignado con ese rol)
+        dependencias  si|no
+        orden         creacion|id|titulo|estado, con "-" para orden inverso
+        limit         tamaño de página (100 por defecto)
+        cursor        valor de "siguiente_cursor" de la página anterior
+    """
+    handler = _handler()
+    args = request.args
+    orden = args.get('orden', 'creacion')
+    descendente = orden.startswith('-')
+    criterio = ORDENES.get(orden.lstrip('-'))
+    if criterio is None:
+        return jsonify({"error": "Orden no válido"}), 400
+    if args.get('dependencias') not in (None, 'si', 'no'):
+        return jsonify({"error": "Filtro de dependencias no válido"}), 400
+    try:
+        limit = int(args.get('limit', 100))
+        desde = _decodificar_cursor(orden, args['cursor']) if args.get('cursor') else None
+        if limit < 1:
+            raise ValueError(limit)
+    except ValueError:
+        return jsonify({"error": "Parámetros de paginación no válidos"}), 400
+
+    with_deps = args.get('dependencias')
+    with handler.lock.read():
+        ids = handler.query_tasks(
+            status=args.get('estado'),
+            role=args.get('rol'),
+            user=args.get('usuario'),
+            has_dependencies=None if with_deps is None else with_deps == 'si'
+        )
+
+        # La clave (criterio, creación) es única y permite retomar desde el cursor
+        def clave(task_id):
+            tarea = handler.get_task(task_id)
+            return [criterio(handler, tarea), handler.task_seq[task_id]]
+
+        claves = ((clave(t), t) for t in ids)
+        if desde is not None:
+            claves = (c for c in claves if (c[0] < desde if descendente else c[0] > desde))
+        seleccion = heapq.nlargest if descendente else heapq.nsmallest
+        pagina = seleccion(limit + 1, claves, key=lambda c: c[0])
+
+        siguiente = _codificar_cursor(orden, pagina[limit - 1][0]) if len(pagina) > limit else None
+        tareas = [handler.get_task(t) for _, t in pagina[:limit]]
+        return _respuesta_json(_etag(tareas, len(ids), siguiente), lambda: (
+            b'{"siguiente_cursor":%s,"tareas":%s,"total":%d}'
+            % (_codificar(siguiente), _lista_json(tareas), len(ids))))
+
+@bp.route('/tasks/search', methods=['GET'])
+def buscar_tareas():
+    """
+    Busca tareas por palabras del título o la descripción, sin distinguir
+    mayúsculas ni acentos. Todas las palabras deben aparecer; la última
+    puede estar incompleta
+    Parámetros:
+        q      texto a buscar
+        limit  cantidad máxima de resultados (20 por defecto)
+    """
+    handler = _handler()
+    consulta = request.args.get('q', '').strip()
+    if not consulta:
+        return jsonify({"error": "Consulta vacía"}), 400
+    try:
+        limit = int(request.args.get('limit', 20))
+        if limit < 1:
+            raise ValueError(limit)
+    except ValueError:
+        return jsonify({"error": "Límite no válido"}), 400
+
+    with handler.lock.read():
+        resultados = handler.search_tasks(consulta, limit)
+        tareas = [handler.get_task(task_id) for task_id, _ in resultados]
+        puntajes = [puntaje for _, puntaje in resultados]
+        return _respuesta_json(_etag(tareas), lambda: (
+            b'{"puntajes":%s,"tareas":%s}' % (_codificar(puntajes), _lista_json(tareas))))
 
+@bp.route('/tasks/ready', methods=['GET'])
+def get_tareas_listas():
+    """
+    Lista las tareas sin terminar cuyas dependencias ya están terminadas
+    """
+    handler = _handler()
+    with handler.lock.read():
+        tareas = [handler.get_task(t) for t in handler.graph.ready()]
+        return _respuesta_json(_etag(tareas), lambda: b'{"tareas":%s}' % _lista_json(tareas))
+
+@bp.route('/tasks/<task_id>/blocked-by', methods=['GET'])
+def get_bloqueos_tarea(task_id):
+    """
+    Lista las dependencias sin terminar que bloquean una tarea
+    Con ?transitivo=1 incluye también las dependencias indirectas
+    """
+    handler = _handler()
+    transitivo = request.args.get('transitivo') in ('1', 'true')
+    with handler.lock.read():
+        if handler.get_task(task_id) is None:
+            return jsonify({"error": "Tarea no encontrada"}), 404
+        bloqueos = [handler.get_task(t)
+                    for t in handler.graph.blocked_by(task_id, transitive=transitivo)]
+        return _respuesta_json(_etag(bloqueos, task_id), lambda: (
+            b'{"bloqueada_por":%s,"id":%s}' % (_lista_json(bloqueos), _codificar(task_id))))
+
+def _plan_tarea(plan, task_id):
+    return {"id": task_id, "inicio": plan.start[task_id], "fin": plan.finish[task_id],
+            "duracion": plan.finish[task_id] - plan.start[task_id]}
+
+@bp.route('/tasks/<task_id>/critical-path', methods=['GET'])
+def get_camino_critico(task_id):
+    """
+    Cadena de dependencias que determina cuándo puede terminar la tarea, con
+    el inicio y el fin más tempranos de cada una. Las tareas terminadas
+    duran 0 y las que no tienen estimación, 1
+    """
+    handler = _handler()
+    with handler.lock.read():
+        if handler.get_task(task_id) is None:
+            return jsonify({"error": "Tarea no encontrada"}), 404
+        plan = handler.schedule
+        camino = [_plan_tarea(plan, t) for t in plan.critical_path(task_id)]
+        return jsonify({"id": task_id, "fin": plan.finish[task_id], "camino": camino}), 200
+
+@bp.route('/schedule', methods=['GET'])
+def get_plan():
+    """
+    Plan de las tareas pendientes según sus dependencias y estimaciones
+    Parámetros opcionales:
+        usuario  agrega las tareas sin terminar del alias, por inicio más temprano
+        limit    cantidad máxima de alias en "carga" y de tareas (100 por defecto)
+    Responde la duración total, el camino crítico hasta la tarea que
+    termina última y la carga pendiente de los alias más cargados.
+    """
+    handler = _handler()
+    try:
+        limit = int(request.args.get('limit', 100))
+        if limit < 1:
+            raise ValueError(limit)
+    except ValueError:
+        return jsonify({"error": "Límite no válido"}), 400
+    usuario = request.args.get('usuario')
 
+    with handler.lock.read():
+        plan = handler.schedule
+        fin = plan.end()
+        respuesta = {
+            "duracion_total": fin[0] if fin is not None else 0,
+            "camino_critico": ([_plan_tarea(plan, t) for t in plan.critical_path(fin[1])]
+                               if fin is not None else []),
+            "carga": [{"usuario": alias, "tareas": tareas, "duracion": duracion}
+                      for alias, (tareas, duracion) in heapq.nsmallest(
+                          limit, plan.load.items(), key=lambda item: (-item[1][1], item[0]))],
+        }
+        if usuario is not None:
+            pendientes = [t for t in handler.tasks_by_user.get(usuario, ())
+                          if t not in handler.graph.finished]
+            respuesta["tareas"] = [_plan_tarea(plan, t) for t in heapq.nsmallest(
+                limit, pendientes, key=lambda t: (plan.start[t], handler.task_seq[t]))]
+        return jsonify(respuesta), 200
 
+# Ventanas de "transiciones" en GET /stats, en segundos
+VENTANAS_STATS = {'ultimo_minuto': 60, 'ultima_hora': 3600, 'ultimo_dia': 86400}
+
+def _por_estado(conteos):
+    # None es el estado "nuevo" de una tarea borrada
+    return {str(estado) if estado is not None else 'eliminada': cantidad
+            for estado, cantidad in conteos.items()}
+
+@bp.route('/stats', methods=['GET'])
+def get_estadisticas():
+    """
+    Cantidad de tareas por estado y por rol, y cambios de estado recientes
+    por estado nuevo, sin recorrer las tareas
+    Parámetros opcionales:
+        usuario  agrega las tareas del alias por estado
+    """
+    handler = _handler()
+    usuario = request.args.get('usuario')
+    with handler.lock.read():
+        conteos = handler.status_counts
+        respuesta = {
+            "tareas": conteos.total,
+            "por_estado": _por_estado(conteos.by_status),
+            "por_rol": {rol: _por_estado(c) for rol, c in conteos.by_role.items()},
+        }
+        if usuario is not None:
+            respuesta["usuario"] = _por_estado(conteos.by_user.get(usuario, {}))
+    historial = handler.history
+    respuesta["transiciones"] = {nombre: _por_estado(historial.rates(segundos))
+                                 for nombre, segundos in VENTANAS_STATS.items()}
+    respuesta["historial"] = len(historial)
+    return jsonify(respuesta), 200
 
-@app.route('/usuarios/<alias>', methods=['GET'])
+@bp.route('/stats/history', methods=['GET'])
+def get_historial_estados():
+    """
+    Cambios de estado registrados en un rango de tiempo
+    Parámetros opcionales:
+        desde, hasta  instantes Unix en segundos (hasta no incluido)
+        tarea         solo los cambios de esa tarea (no se combina con intervalo)
+        limit         cantidad máxima de cambios (1000 por defecto)
+        intervalo     segundos por balde: en lugar de los cambios, responde
+                      cuántos hubo por balde y por estado nuevo
+    Una tarea nueva figura con "desde" null y una borrada con "hacia" null.
+    """
+    handler = _handler()
+    try:
+        desde = request.args.get('desde')
+        hasta = request.args.get('hasta')
+        desde = float(desde) if desde is not None else None
+        hasta = float(hasta) if hasta is not None else None
+        limit = int(request.args.get('limit', 1000))
+        intervalo = request.args.get('intervalo')
+        intervalo = int(intervalo) if intervalo is not None else None
+        if limit < 1 or (intervalo is not None and intervalo < 1):
+            raise ValueError(limit, intervalo)
+    except ValueError:
+        return jsonify({"error": "Parámetros no válidos"}), 400
+
+    historial = handler.history
+    if intervalo is not None:
+        return jsonify({"baldes": [
+            {"inicio": inicio, "transiciones": _por_estado(conteos)}
+            for inicio, conteos in historial.histogram(desde, hasta, intervalo)]}), 200
+    cambios = historial.range(desde, hasta, request.args.get('tarea'), limit)
+    return jsonify({"transiciones": [
+        {"instante": instante, "id": task_id, "desde": anterior, "hacia": nuevo}
+        for instante, task_id, anterior, nuevo in cambios]}), 200
+
+def _parametros_paginacion():
+    """Lee limit y cursor de la query; lanza ValueError si no son válidos."""
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    limit = int(limit) if limit is not None else None
+    cursor = _decodificar_cursor('asignacion', cursor) if cursor else None
+    if limit is not None and limit < 1:
+        raise ValueError(limit)
+    # [task_seq, id] de la última tarea entregada
+    if cursor is not None and not (isinstance(cursor, list) and len(cursor) == 2
+                                   and type(cursor[0]) is int and isinstance(cursor[1], str)):
+        raise ValueError(cursor)
+    return limit, cursor
+
+def _stream_ndjson(cabecera, tareas):
+    """Genera una línea JSON para la cabecera y otra por cada tarea."""
+    yield _codificar(cabecera.to_dict()) + b'\n'
+    for tarea in tareas:
+        yield _json_tarea(tarea) + b'\n'
+
+@bp.route('/usuarios/<alias>', methods=['GET'])
 def get_usuario(alias):
     """
     Obtiene información del usuario y sus tareas asignadas
+    Parámetros opcionales:
+        limit   cantidad máxima de tareas a retornar
+        cursor  valor de "siguiente_cursor" de la página anterior
+        formato "ndjson" para recibir el usuario y luego una tarea por línea
     """
-    usuario = next((u for u in data_handler.users if u['id'] == alias), None)
+    handler = _handler()
+    usuario = handler.get_user(alias)
     if not usuario:
         return jsonify({"error": "Usuario no encontrado"}), 404
 
-    # Buscar tareas asignadas al usuario
-    tareas_usuario = [
-        t for t in data_handler.tasks 
-        if any(u['usuario'] == alias for u in t['users'])
-    ]
-    
-    response = usuario.copy()
-    response['tareas'] = tareas_usuario
-    return jsonify(response)
+    try:
+        limit, cursor = _parametros_paginacion()
+    except ValueError:
+        return jsonify({"error": "Parámetros de paginación no válidos"}), 400
 
-@app.route('/usuarios', methods=['POST'])
+    if (request.args.get('formato') == 'ndjson'
+            or request.accept_mimetypes.best == 'application/x-ndjson'):
+        tareas = handler.iter_tasks_for_user(alias, cursor)
+        if limit is not None:
+            tareas = itertools.islice(tareas, limit)
+        return Response(stream_with_context(_stream_ndjson(usuario, tareas)),
+                        mimetype='application/x-ndjson')
+
+    paginado = limit is not None or cursor is not None
+    siguiente = None
+    with handler.lock.read():
+        if not paginado:
+            # Buscar tareas asignadas al usuario
+            tareas = handler.tasks_for_user(alias)
+        else:
+            tareas, siguiente = handler.page_tasks_for_user(alias, cursor, limit)
+            if siguiente is not None:
+                siguiente = _codificar_cursor('asignacion', siguiente)
+
+        def cuerpo():
+            if any(clave >= 'siguiente_cursor' for clave in (usuario.extra or ())):
+                # Un campo extra que va después de la página en orden alfabético
+                documento = {k: v for k, v in usuario.to_dict().items() if k != 'tareas'}
+                if paginado:
+                    documento['siguiente_cursor'] = siguiente
+                documento['tareas'] = [tarea.to_dict() for tarea in tareas]
+                return _codificar(documento)
+            # El JSON del usuario sin su llave de cierre, seguido de la página
+            partes = [_json_usuario(usuario)[:-1]]
+            if paginado:
+                partes.append(b',"siguiente_cursor":' + _codificar(siguiente))
+            partes.append(b',"tareas":' + _lista_json(tareas) + b'}')
+            return b''.join(partes)
+
+        etag = _etag(tareas, alias, handler.user_version(alias), siguiente)
+        return _respuesta_json(etag, cuerpo)
+
+@bp.route('/usuarios', methods=['POST'])
 def crear_usuario():
     """
     Crea un nuevo usuario
@@ -186,22 +889,354 @@ def crear_usuario():
         "nombre": "nombre del usuario"
     }
     """
+    return _ejecutar(_validar_usuario, _crear_usuario, request.json)
+
+@bp.route('/usuarios/<alias>/contactos', methods=['POST'])
+def gestionar_contactos(alias):
+    """
+    Agrega o quita un contacto del usuario
+    Entrada esperada:
+    {
+        "contacto": "alias",
+        "accion": "adicionar|remover"
+    }
+    """
+    return _ejecutar(_validar_contacto, _gestionar_contactos, request.json, alias)
+
+# Profundidad máxima de GET /usuarios/<alias>/contactos
+PROFUNDIDAD_MAXIMA = 4
+
+@bp.route('/usuarios/<alias>/contactos', methods=['GET'])
+def get_contactos(alias):
+    """
+    Lista la red del usuario: los contactos que declaró, quienes lo
+    declararon a él y quienes comparten alguna tarea con él
+    Parámetros opcionales:
+        profundidad  saltos a recorrer, de 1 a 4 (1 por defecto); con 2
+                     incluye a los colaboradores de sus colaboradores
+        limit        cantidad máxima de alias a retornar (100 por defecto)
+    """
+    handler = _handler()
+    try:
+        profundidad = int(request.args.get('profundidad', 1))
+        limit = int(request.args.get('limit', 100))
+        if not 1 <= profundidad <= PROFUNDIDAD_MAXIMA or limit < 1:
+            raise ValueError(profundidad, limit)
+    except ValueError:
+        return jsonify({"error": "Parámetros no válidos"}), 400
+
+    with handler.lock.read():
+        red = handler.contacts
+        if handler.get_user(alias) is None and alias not in red:
+            return jsonify({"error": "Usuario no encontrado"}), 404
+        # Uno más que el límite para saber si quedaron alias afuera
+        alcanzados = red.reachable(alias, profundidad, limit + 1)
+        directos = red.neighbours(alias)
+        contactos = [{"alias": otro, "distancia": distancia,
+                      "tareas_compartidas": directos.get(otro, 0)}
+                     for otro, distancia in alcanzados[:limit]]
+        return jsonify({"alias": alias, "contactos": contactos,
+                        "truncado": len(alcanzados) > limit}), 200
+
+@bp.route('/usuarios/<alias>/tareas-compartidas/<otro>', methods=['GET'])
+def get_tareas_compartidas(alias, otro):
+    """
+    Lista las tareas asignadas a los dos alias, en el orden de asignación
+    del que tiene menos tareas
+    """
+    handler = _handler()
+    with handler.lock.read():
+        tareas = [handler.get_task(t) for t in handler.shared_tasks(alias, otro)]
+        return _respuesta_json(_etag(tareas, alias, otro), lambda: (
+            b'{"tareas":%s,"total":%d}' % (_lista_json(tareas), len(tareas))))
+
+# Segundos sin eventos tras los que /changes/stream manda un comentario
+# para que proxies y clientes no den la conexión por muerta
+SSE_KEEPALIVE = 15
+conexiones_sse = 0
+_conexiones_lock = threading.Lock()
+
+def _filtro_cambios():
+    """Función que decide si un evento corresponde a ?usuario= y ?tarea=."""
+    usuario = request.args.get('usuario')
+    tarea = request.args.get('tarea')
+
+    def filtro(evento):
+        if usuario is not None and usuario not in evento['usuarios']:
+            return False
+        return tarea is None or (evento['tipo'] == 'tarea' and evento['id'] == tarea)
+    return filtro
+
+@bp.route('/changes', methods=['GET'])
+def listar_cambios():
+    """
+    Cambios posteriores a una secuencia, para no tener que releer todo
+    Parámetros:
+        since    valor de "ultimo" de la respuesta anterior (sin él, solo
+                 retorna la secuencia actual)
+        usuario  solo cambios de tareas asignadas (antes o después) al alias
+                 y del propio usuario
+        tarea    solo cambios de esa tarea
+        limit    cantidad máxima de eventos revisados (1000 por defecto)
+    Responde 410 si los cambios pedidos ya no están en el buffer: hay que
+    volver a leer los datos y seguir desde el "ultimo" que se informa.
+    """
+    handler = _handler()
+    feed = handler.changes
+    try:
+        since = request.args.get('since')
+        since = int(since) if since is not None else None
+        limit = int(request.args.get('limit', 1000))
+        if limit < 1:
+            raise ValueError(limit)
+    except ValueError:
+        return jsonify({"error": "Parámetros no válidos"}), 400
+    if since is None:
+        return jsonify({"cambios": [], "ultimo": feed.last}), 200
+    try:
+        eventos = feed.since(since, limit)
+    except LookupError:
+        return jsonify({"error": "Cambios no disponibles, releer los datos",
+                        "ultimo": feed.last}), 410
+    filtro = _filtro_cambios()
+    # El último revisado y no el último que pasó el filtro, para no repetirlos
+    ultimo = eventos[-1]['seq'] if eventos else since
+    return jsonify({"cambios": [e for e in eventos if filtro(e)], "ultimo": ultimo}), 200
+
+def _stream_cambios(feed, since, filtro):
+    global conexiones_sse
+    with _conexiones_lock:
+        conexiones_sse += 1
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                eventos = feed.wait(since, SSE_KEEPALIVE, limit=1000)
+            except LookupError:
+                yield 'event: resync\ndata: {"ultimo":%d}\n\n' % feed.last
+                return
+            if not eventos:
+                yield ': keepalive\n\n'
+                continue
+            for evento in eventos:
+                if filtro(evento):
+                    yield 'id: %d\nevent: cambio\ndata: %s\n\n' % (
+                        evento['seq'], json.dumps(evento, separators=(',', ':')))
+            since = eventos[-1]['seq']
+    finally:
+        with _conexiones_lock:
+            conexiones_sse -= 1
+
+@bp.route('/changes/stream', methods=['GET'])
+def stream_cambios():
+    """
+    Server-sent events con cada cambio, en lugar de consultar periódicamente
+    Parámetros opcionales:
+        usuario, tarea  los mismos filtros que GET /changes
+        since           secuencia desde la que seguir; un cliente que se
+                        reconecta manda en cambio el encabezado Last-Event-ID
+    Si los eventos pedidos ya no están en el buffer se envía un evento
+    "resync" y se cierra la conexión.
+    """
+    handler = _handler()
+    feed = handler.changes
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        since = int(since) if since is not None else feed.last
+    except ValueError:
+        return jsonify({"error": "Parámetros no válidos"}), 400
+    respuesta = Response(stream_with_context(_stream_cambios(feed, since, _filtro_cambios())),
+                         mimetype='text/event-stream')
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    respuesta.headers['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+# Operaciones admitidas por /batch: (validación, aplicación, recibe task_id)
+OPERACIONES = {
+    'crear_tarea': (_validar_tarea, _crear_tarea, False),
+    'actualizar_estado': (_validar_estado, _actualizar_estado, True),
+    'actualizar_duracion': (_validar_duracion, _actualizar_duracion, True),
+    'gestionar_usuarios': (_validar_usuarios, _gestionar_usuarios, True),
+    'gestionar_dependencias': (_validar_dependencias, _gestionar_dependencias, True),
+    'crear_usuario': (_validar_usuario, _crear_usuario, False),
+}
+
+def _validar_operacion(operacion, refs):
+    if not isinstance(operacion, dict) or operacion.get('tipo') not in OPERACIONES:
+        return "Tipo de operación no válido"
+    validar, _, usa_tarea = OPERACIONES[operacion['tipo']]
+    datos = operacion.get('datos')
+    if not isinstance(datos, dict):
+        return "Faltan campos requeridos"
+    if usa_tarea and 'task_id' not in operacion:
+        return "Faltan campos requeridos"
+    for valor in (operacion.get('task_id'), datos.get('dependencytaskid')):
+        if isinstance(valor, str) and valor.startswith('$') and valor[1:] not in refs:
+            return "Referencia no definida: %s" % valor
+    error = validar(datos)
+    if error:
+        return error
+    if 'ref' in operacion:
+        if operacion['tipo'] != 'crear_tarea':
+            return "Solo crear_tarea admite ref"
+        refs.add(operacion['ref'])
+
+def _resolver(valor, ids):
+    """Reemplaza "$ref" por el id creado antes en el mismo lote."""
+    if isinstance(valor, str) and valor.startswith('$'):
+        return ids.get(valor[1:])
+    return valor
+
+@bp.route('/batch', methods=['POST'])
+def ejecutar_lote():
+    """
+    Ejecuta varias operaciones con una sola escritura a disco
+    Entrada esperada:
+    {
+        "operaciones": [
+            {"tipo": "crear_tarea", "ref": "a", "datos": {...}},
+            {"tipo": "gestionar_usuarios", "task_id": "$a", "datos": {...}},
+            {"tipo": "gestionar_dependencias", "task_id": "$a",
+             "datos": {"dependencytaskid": "$b", "accion": "adicionar"}},
+            ...
+        ]
+    }
+    "tipo" es crear_tarea, actualizar_estado, actualizar_duracion,
+    gestionar_usuarios, gestionar_dependencias o crear_usuario, y "datos"
+    lleva la misma entrada que el endpoint correspondiente. "$ref" apunta al
+    id de una tarea creada antes en el mismo lote.
+    """
+    handler = _handler()
     data = request.json
-    if not all(k in data for k in ['contacto', 'nombre']):
+    operaciones = data.get('operaciones') if isinstance(data, dict) else None
+    if not isinstance(operaciones, list):
         return jsonify({"error": "Faltan campos requeridos"}), 400
 
-    # Verificar si el usuario ya existe
-    if any(u['id'] == data['contacto'] for u in data_handler.users):
-        return jsonify({"error": "El alias ya está en uso"}), 400
+    refs = set()
+    errores = [_validar_operacion(operacion, refs) for operacion in operaciones]
+    if any(errores):
+        return jsonify({"error": "Operaciones no válidas", "errores": [
+            {"indice": i, "error": error} for i, error in enumerate(errores) if error
+        ]}), 400
 
-    nuevo_usuario = Usuario(data['contacto'], data['nombre'], None)
-    data_handler.users.append(nuevo_usuario.get_user_info())
-    data_handler.save_data()
-    
-    return jsonify({"mensaje": "Usuario creado exitosamente", "id": data['contacto']}), 201
+    ids = {}
+    resultados = []
+    with handler.transaction():
+        with handler.lock:
+            for operacion in operaciones:
+                _, aplicar, usa_tarea = OPERACIONES[operacion['tipo']]
+                datos = dict(operacion['datos'])
+                if 'dependencytaskid' in datos:
+                    datos['dependencytaskid'] = _resolver(datos['dependencytaskid'], ids)
+                args = (_resolver(operacion['task_id'], ids),) if usa_tarea else ()
+                respuesta, status = aplicar(*args, datos)
+                if 'ref' in operacion and status < 400:
+                    ids[operacion['ref']] = respuesta['id']
+                resultados.append({"status": status, "respuesta": respuesta})
+
+        if any(r['status'] < 400 for r in resultados):
+            handler.save_data()
+    return jsonify({"resultados": resultados}), 200
+
+@admin_bp.before_request
+def verificar_token_admin():
+    # Con ADMIN_TOKEN, las rutas de operación piden "Authorization: Bearer <token>"
+    token = current_app.config['ADMIN_TOKEN']
+    if not token:
+        return None
+    recibido = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(recibido.encode(), ('Bearer ' + token).encode()):
+        return jsonify({"error": "No autorizado"}), 401, {'WWW-Authenticate': 'Bearer'}
+
+@admin_bp.route('/metrics', methods=['GET'])
+def exponer_metricas():
+    """Métricas en el formato de texto de Prometheus"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@admin_bp.route('/profiler', methods=['GET'])
+def obtener_perfil():
+    """
+    Pilas muestreadas en formato plegado ("a;b;c cuenta"), para flamegraph.pl
+    o speedscope
+    """
+    return Response(profiler.folded(), mimetype='text/plain')
 
+@admin_bp.route('/profiler', methods=['POST'])
+def controlar_profiler():
+    """
+    Prende o apaga el profiler por muestreo sin reiniciar
+    Entrada esperada:
+    {
+        "accion": "iniciar" | "detener" | "reiniciar",
+        "intervalo_ms": 5  (opcional, solo con iniciar)
+    }
+    """
+    data = request.json
+    accion = data.get('accion') if isinstance(data, dict) else None
+    if accion not in ('iniciar', 'detener', 'reiniciar'):
+        return jsonify({"error": "Acción no válida"}), 400
+    if accion == 'iniciar':
+        intervalo = data.get('intervalo_ms', profiler.interval * 1000)
+        if not isinstance(intervalo, (int, float)) or isinstance(intervalo, bool) or intervalo <= 0:
+            return jsonify({"error": "Intervalo no válido"}), 400
+        profiler.start(intervalo / 1000)
+    elif accion == 'detener':
+        profiler.stop()
+    else:
+        profiler.reset()
+    return jsonify({"activo": profiler.running, "muestras": profiler.samples,
+                    "intervalo_ms": profiler.interval * 1000}), 200
+
+@admin_bp.route('/shards', methods=['POST'])
+def cambiar_shards():
+    """
+    Reparte los datos en otra cantidad de shards sin detener el servicio
+    (solo con DATA_BACKEND=sharded)
+    Entrada esperada:
+    {
+        "cantidad": 16
+    }
+    """
+    handler = get_data_handler()
+    data = request.json
+    cantidad = data.get('cantidad') if isinstance(data, dict) else None
+    if not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad < 1:
+        return jsonify({"error": "Cantidad de shards no válida"}), 400
+    try:
+        handler.reshard(cantidad)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"shards": handler.storage.shards,
+                    "generacion": handler.storage.generation}), 200
+
+@espacios_bp.route('/workspaces', methods=['GET'])
+def listar_espacios():
+    """
+    Lista los espacios de trabajo; "bytes" es la memoria estimada de los que
+    están cargados y null en los demás
+    """
+    espacios = get_workspaces()
+    return jsonify({
+        "espacios": [{"id": espacio, "cargado": tamano is not None, "bytes": tamano}
+                     for espacio, tamano in espacios.list()],
+        "presupuesto_bytes": espacios.budget_bytes,
+    }), 200
+
+@espacios_bp.route('/workspaces/<workspace_id>', methods=['PUT'])
+def crear_espacio(workspace_id):
+    """
+    Crea un espacio de trabajo vacío; sus rutas quedan en /w/<workspace_id>/...
+    El id admite letras, dígitos, "-" y "_" (hasta 64)
+    """
+    try:
+        creado = get_workspaces().create(workspace_id)
+    except ValueError:
+        return jsonify({"error": "Id de espacio de trabajo no válido"}), 400
+    return jsonify({"id": workspace_id}), 201 if creado else 200
 
 
+# Para gunicorn controller:app y las pruebas; no lee los datos
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -1,27 +1,1128 @@
-import json
+import atexit
+import collections
+import contextlib
+import itertools
+import logging
+import os
+import threading
+import time
+
+from contact_graph import ContactGraph
+from dependency_graph import CycleError, DependencyGraph, ESTADOS_FINALIZADOS
+from models.tarea import Tarea
+from models.usuario import Usuario
+from schedule import Schedule, duration_of
+from storage import create_storage, to_document
+from storage.writer import FAILURES_KEPT, GroupCommitWriter
+from utils import metrics
+from utils.change_feed import ChangeFeed
+from utils.lazy_records import LazyDict, LazyList, Reordered
+from utils.posting_list import PostingList
+from utils.response_cache import ResponseCache
+from utils.text_index import TextIndex
+from utils.rwlock import LockStripes, RWLock
+from utils.status_history import StatusCounters, StatusHistory
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ('sync', 'group', 'async')
+
+SAVE_SECONDS = metrics.histogram(
+    'data_save_seconds', 'Duración de save_data, incluida la espera de su turno',
+    ('durability',))
+FLUSH_SECONDS = metrics.histogram(
+    'storage_flush_seconds', 'Escritura de un lote de cambios en el storage', ('backend',))
+LOCK_WAIT_SECONDS = metrics.histogram(
+    'lock_wait_seconds', 'Espera por un lock que estaba tomado', ('mode',))
+QUERY_SCANNED = metrics.histogram(
+    'query_scanned_records', 'Ids recorridos por query_tasks en el índice más selectivo',
+    buckets=(1, 10, 100, 1000, 10000, 100000, 1000000))
+
+# Índices que, con un snapshot binario, se construyen en el primer acceso
+LAZY_INDEXES = ('tasks_by_user', '_task_aliases', 'tasks_by_status', 'tasks_by_role',
+                'tasks_with_deps', 'tasks_without_deps', '_task_keys', 'task_seq',
+                '_dangling', 'graph')
+# Peso del título y de la descripción en la búsqueda de texto
+TEXT_WEIGHTS = (3, 1)
 
 
 class DataHandler:
-    def __init__(self, filename='data.json'):
+    """
+    Datos en memoria con sus índices y su persistencia.
+
+    Concurrencia: las consultas deben hacerse con ``lock.read()`` tomado y
+    las operaciones compuestas (buscar, validar y modificar) con ``lock``
+    en escritura; los métodos que modifican lo toman por su cuenta.
+    ``task_lock(task_id)`` ordena las operaciones sobre una misma tarea,
+    incluido su save_data, sin frenar a las demás tareas.
+
+    Con el backend 'snapshot' la carga no decodifica nada: ``tasks`` y
+    ``users`` son listas diferidas sobre el archivo mapeado y los índices
+    secundarios se arman recién cuando se consultan por primera vez. El
+    índice de texto (``text_index``), la red de contactos (``contacts``), el
+    plan (``schedule``) y los contadores por estado (``status_counts``) se
+    arman así con cualquier backend, en la primera consulta, y desde entonces
+    se mantienen con cada cambio.
+
+    ``history`` registra cada cambio de estado hecho en este proceso, con su
+    instante, y lo anexa a ``<filename>.history`` en cada save. El log se
+    lee recién con la primera consulta al historial.
+    """
+
+    def __init__(self, filename='data.json', journal=False, compact_bytes=4 * 1024 * 1024,
+                 backend='json', durability='sync', flush_ms=5, cache_size=10000,
+                 shared=False, shards=8, feed_size=10000, history=True,
+                 history_days=30):
+        """
+        cache_size: cantidad máxima de registros codificados en ``cache``.
+
+        feed_size: eventos que guarda ``changes``, el registro de cambios
+            para los clientes que se reconectan.
+
+        history: si es False, el historial de estados queda solo en memoria.
+
+        history_days: días que se guardan los cambios de estado; None los
+            guarda todos. Con ``shared`` no se recorta, porque los workers
+            anexan al mismo log.
+
+        shards: cantidad de archivos al crear un directorio del backend
+            'sharded'; se puede cambiar después con ``reshard``.
+
+        shared: modo multiproceso, para varios workers sobre el mismo archivo.
+            Las escrituras deben hacerse dentro de ``transaction()`` y las
+            lecturas después de ``refresh()``; requiere durabilidad 'sync'.
+
+        durability:
+            'sync'  cada save_data escribe antes de retornar.
+            'group' los saves de una ventana de flush_ms se escriben juntos y
+                    save_data retorna cuando terminó ese flush compartido.
+            'async' save_data retorna de inmediato; el flush ocurre dentro
+                    de flush_ms.
+        """
+        if durability not in DURABILITY_MODES:
+            raise ValueError("Modo de durabilidad no válido: %s" % durability)
+        if shared and durability != 'sync':
+            raise ValueError("El modo multiproceso requiere durabilidad 'sync'")
         self.filename = filename
+        self.backend = backend
+        self.durability = durability
+        self.shared = shared
+        self.storage = create_storage(backend, filename, journal=journal,
+                                      compact_bytes=compact_bytes, shared=shared, shards=shards,
+                                      durability=durability)
+        self._writer = None
         self.tasks = []
         self.users = []
+        self.tasks_by_id = {}
+        self.users_by_id = {}
+        self._task_pos = {}
+        self._user_pos = {}
+        # Índice invertido alias -> ids de tareas en orden de creación
+        self.tasks_by_user = {}
+        self._seq = itertools.count()
+        self._task_aliases = {}
+        # Índices secundarios por estado, rol y presencia de dependencias
+        self.tasks_by_status = {}
+        self.tasks_by_role = {}
+        self.tasks_with_deps = set()
+        self.tasks_without_deps = set()
+        self._task_keys = {}
+        # Orden de creación de cada tarea, estable ante cambios de estado
+        self.task_seq = {}
+        self.graph = DependencyGraph()
+        # Dependencias hacia tareas aún no cargadas: id faltante -> tareas
+        self._dangling = {}
+        self._pending = {}
+        # Versión por registro modificado (los no modificados desde la carga
+        # tienen versión 0); ``epoch`` cambia con cada carga
+        self.task_versions = {}
+        self.user_versions = {}
+        self._version = itertools.count(1)
+        self.epoch = None
+        self.cache = ResponseCache(cache_size)
+        self.changes = ChangeFeed(feed_size)
+        self.history = StatusHistory(
+            filename + '.history' if history else None,
+            max_age=history_days * 86400 if history_days and not shared else None)
+        self.lock = RWLock(on_wait=LOCK_WAIT_SECONDS.observe)
+        self.task_lock = LockStripes(on_wait=LOCK_WAIT_SECONDS.observe)
+        self.load_seconds = None
+        # Orden de los saves: cada drenaje de _pending se escribe en turno
+        self._pending_lock = threading.Lock()
+        self._flush_cond = threading.Condition()
+        self._drained = 0
+        self._flushed = 0
+        # (turno, error) de los últimos saves síncronos que fallaron
+        self._failed_turns = collections.deque(maxlen=FAILURES_KEPT)
+        self._local = threading.local()
+        self._index_lock = threading.Lock()
+        self._index_rows = None
+        # Una carga diferida cuyo orden de tareas ya no es el de creación
+        self._reordered = False
         self.load_data()
+        # Después de cargar: la carga del backend 'sharded' usa fork mientras
+        # el proceso no tenga otros hilos
+        if durability != 'sync':
+            self._writer = GroupCommitWriter(self._flush, window_ms=flush_ms)
+            atexit.register(self._writer.close)
+        if shared:
+            self.storage.on_compact = self._catch_up
+
+    def __getattr__(self, name):
+        # Solo se llama si el atributo no existe: índices que se arman al primer uso
+        if name == 'text_index':
+            self._build_text_index()
+        elif name == 'contacts':
+            self._build_contacts()
+        elif name == 'schedule':
+            self._build_schedule()
+        elif name == 'status_counts':
+            self._build_status_counts()
+        elif name in LAZY_INDEXES and self.__dict__.get('_index_rows') is not None:
+            self._build_lazy_indexes()
+        else:
+            raise AttributeError(name)
+        return self.__dict__[name]
+
+    def get_task(self, task_id):
+        return self.tasks_by_id.get(task_id)
+
+    def get_user(self, user_id):
+        return self.users_by_id.get(user_id)
+
+    def task_version(self, task_id):
+        return self.task_versions.get(task_id, 0)
+
+    def user_version(self, user_id):
+        return self.user_versions.get(user_id, 0)
+
+    def tasks_for_user(self, alias):
+        """Tareas asignadas a un alias, en orden de creación."""
+        return [self.tasks_by_id[task_id] for task_id in self.tasks_by_user.get(alias, ())]
+
+    def page_tasks_for_user(self, alias, cursor=None, limit=None):
+        """
+        Página de tareas del alias posteriores a ``cursor``. Retorna
+        ``(tareas, siguiente_cursor)``; el cursor es None en la última página.
+
+        El cursor es ``[task_seq, id]`` de la última tarea entregada. Se
+        retoma desde el ``task_seq`` actual de esa tarea, que puede cambiar
+        al recargar si se borraron tareas anteriores; el guardado solo se usa
+        si la tarea ya no existe. Como todos los backends recargan las tareas
+        en orden de creación, la tarea sigue en el mismo lugar relativo.
+        """
+        posting = self.tasks_by_user.get(alias)
+        if posting is None:
+            return [], None
+        task_ids, next_seq = posting.page(self._cursor_seq(cursor), limit)
+        next_cursor = [next_seq, task_ids[-1]] if next_seq is not None else None
+        return [self.tasks_by_id[task_id] for task_id in task_ids], next_cursor
+
+    def iter_tasks_for_user(self, alias, cursor=None, chunk=256):
+        """
+        Generador de las tareas del alias, sin materializar la lista. Lee por
+        bloques de ``chunk`` con el lock en lectura y lo suelta entre bloques,
+        así un cliente lento no frena a los escritores.
+        """
+        while True:
+            with self.lock.read():
+                posting = self.tasks_by_user.get(alias)
+                if posting is None:
+                    return
+                task_ids, cursor = posting.page(self._cursor_seq(cursor), chunk)
+                tasks = [self.tasks_by_id[task_id] for task_id in task_ids]
+                if cursor is not None:
+                    cursor = [cursor, task_ids[-1]]
+            yield from tasks
+            if cursor is None:
+                return
+
+    def query_tasks(self, status=None, role=None, user=None, has_dependencies=None):
+        """
+        Ids de las tareas que cumplen todos los filtros dados. Recorre solo el
+        índice más selectivo y verifica el resto por pertenencia, de modo que
+        el costo es proporcional a las coincidencias y no al total de tareas.
+        """
+        candidates = []
+        if status is not None:
+            candidates.append(self.tasks_by_status.get(status, ()))
+        if role is not None:
+            candidates.append(self.tasks_by_role.get(role, ()))
+        if user is not None:
+            candidates.append(self.tasks_by_user.get(user, ()))
+        if has_dependencies is not None:
+            candidates.append(self.tasks_with_deps if has_dependencies else self.tasks_without_deps)
+        if not candidates:
+            return list(self.tasks_by_id)
+
+        candidates.sort(key=len)
+        driver, others = candidates[0], candidates[1:]
+        QUERY_SCANNED.observe(len(driver))
+        matches = [t for t in driver if all(t in other for other in others)]
+        if user is not None and role is not None:
+            # El rol debe corresponder al usuario pedido, no a otro asignado
+            matches = [t for t in matches if any(
+                u.usuario == user and u.rol == role
+                for u in self.tasks_by_id[t].users)]
+        return matches
+
+    def search_tasks(self, query, limit=20):
+        """
+        Tareas cuyo título o descripción contienen todas las palabras de
+        ``query`` (la última como prefijo), sin distinguir mayúsculas ni
+        acentos. Retorna pares ``(id, puntaje)`` de mayor a menor puntaje.
+        """
+        return self.text_index.search(query, limit)
+
+    def shared_tasks(self, alias, other):
+        """
+        Ids de las tareas asignadas a ambos alias. Recorre la lista del que
+        tiene menos tareas y prueba cada una en la del otro.
+        """
+        smaller = self.tasks_by_user.get(alias)
+        larger = self.tasks_by_user.get(other)
+        if not smaller or not larger:
+            return []
+        if len(larger) < len(smaller):
+            smaller, larger = larger, smaller
+        return [task_id for task_id in smaller if task_id in larger]
+
+    def add_task(self, task):
+        """
+        Inserta o reemplaza una tarea manteniendo el índice por id. Acepta una
+        Tarea o un dict con el formato de data.json; retorna la Tarea guardada.
+        """
+        if isinstance(task, dict):
+            task = Tarea.from_dict(task)
+        with self.lock:
+            # mark_task indexa: así ve los alias y el estado que tenía antes
+            self._put(self.tasks, self.tasks_by_id, self._task_pos, task)
+            self.mark_task(task)
+            return task
+
+    def add_user(self, user):
+        """Inserta o reemplaza un usuario (Usuario o dict); retorna el Usuario guardado."""
+        if isinstance(user, dict):
+            user = Usuario.from_dict(user)
+        with self.lock:
+            self._put(self.users, self.users_by_id, self._user_pos, user)
+            self.mark_user(user)
+            return user
+
+    def add_contact(self, user, contacto):
+        """Agrega un contacto al usuario; retorna False si ya lo tenía."""
+        with self.lock:
+            contactos = self._contactos(user)
+            if contacto in contactos:
+                return False
+            # Lista nueva en lugar de append: un snapshot puede estar serializándola
+            user.contactos = contactos + [contacto]
+            self.mark_user(user)
+            return True
+
+    def remove_contact(self, user, contacto):
+        with self.lock:
+            contactos = self._contactos(user)
+            if contacto not in contactos:
+                return False
+            user.contactos = [c for c in contactos if c != contacto]
+            self.mark_user(user)
+            return True
+
+    def set_status(self, task, status):
+        with self.lock:
+            task.update_status(status)
+            self.mark_task(task)
+
+    def set_duration(self, task, duracion):
+        """Guarda la estimación de la tarea en su campo "duracion"."""
+        with self.lock:
+            # Dict nuevo en lugar de modificarlo: un snapshot puede estar serializándolo
+            task.extra = dict(task.extra or (), duracion=duracion)
+            self.mark_task(task)
+
+    def add_task_user(self, task, usuario, rol):
+        """Asigna un usuario con un rol; retorna False si ya estaba asignado."""
+        with self.lock:
+            if task.has_user(usuario, rol):
+                return False
+            task.add_user(usuario, rol)
+            self.mark_task(task)
+            return True
+
+    def remove_task_user(self, task, usuario, rol):
+        with self.lock:
+            task.remove_user(usuario, rol)
+            self.mark_task(task)
+
+    def add_dependency(self, task, dep_id):
+        """
+        Hace que la tarea dependa de ``dep_id``. Lanza CycleError si la
+        dependencia cerraría un ciclo; retorna False si ya existía.
+        """
+        with self.lock:
+            if dep_id in task.dependencies:
+                return False
+            self.graph.add_dependency(task.id, dep_id)
+            # Reusar el string del id ya guardado en lugar de la copia de la petición
+            task.add_dependency(self.tasks_by_id[dep_id].id)
+            self.mark_task(task)
+            return True
+
+    def remove_dependency(self, task, dep_id):
+        with self.lock:
+            if dep_id not in task.dependencies:
+                return False
+            task.remove_dependency(dep_id)
+            self.mark_task(task)
+            return True
+
+    def remove_task(self, task_id):
+        with self.lock:
+            previous = self._task_aliases.get(task_id, ())
+            task = self._delete_task(task_id)
+            if task is not None:
+                self._pending[('task', task_id)] = None
+                self._touch(self.task_versions, 'task', task_id)
+                self._publish_task(task_id, None, previous)
+                self._record_status(task_id, task.status, None)
+                self._mark_local()
+            return task
+
+    def remove_user(self, user_id):
+        with self.lock:
+            user = self._delete(self.users, self.users_by_id, self._user_pos, user_id)
+            if user is not None:
+                self._unindex_user(user_id)
+                self._pending[('user', user_id)] = None
+                self._touch(self.user_versions, 'user', user_id)
+                self._publish_user(user_id, None)
+                self._mark_local()
+            return user
+
+    def mark_task(self, task):
+        """Registra una tarea modificada para el próximo save_data."""
+        with self.lock:
+            previous = self._task_aliases.get(task.id, ())
+            keys = self._task_keys.get(task.id)
+            self._index_task(task)
+            self._pending[('task', task.id)] = task
+            self._touch(self.task_versions, 'task', task.id)
+            self._publish_task(task.id, task, previous)
+            if keys is None or keys[0] != task.status:
+                self._record_status(task.id, keys[0] if keys is not None else None, task.status)
+            self._mark_local()
+
+    def mark_user(self, user):
+        """Registra un usuario modificado para el próximo save_data."""
+        with self.lock:
+            self._index_user(user)
+            self._pending[('user', user.id)] = user
+            self._touch(self.user_versions, 'user', user.id)
+            self._publish_user(user.id, user)
+            self._mark_local()
 
     def save_data(self):
-        data = {
-            'tasks': self.tasks,
-            'users': self.users
-        }
-        with open(self.filename, 'w') as f:
-            json.dump(data, f)
+        """
+        Persiste los cambios registrados. Si no hay ninguno y este hilo no
+        modificó nada, escribe todo. Si otro save ya se llevó los cambios de
+        este hilo, espera a que se escriban en lugar de repetirlos.
+
+        Los cambios se copian con el lock en lectura y se escriben después de
+        soltarlo, por eso no debe llamarse con el lock tomado en escritura.
+        """
+        if self.lock.is_writer():
+            raise RuntimeError("save_data no puede llamarse con el lock tomado en escritura")
+        start = time.perf_counter()
+        try:
+            self._save_data()
+        finally:
+            SAVE_SECONDS.observe(time.perf_counter() - start, self.durability)
+
+    def _save_data(self):
+        marked = self._local.__dict__.pop('marked', None)
+        with self.lock.read(), self._pending_lock:
+            own = bool(self._pending) or marked is None
+            if own:
+                pending, self._pending = self._pending, {}
+                changes = self._changes(pending) if pending else None
+                self._drained += 1
+                if self._writer is not None:
+                    self._writer.submit(changes)
+            turn = self._drained
+            ticket = self._writer.last_ticket if self._writer is not None else None
+
+        if self._writer is not None:
+            if self.durability == 'group':
+                self._writer.wait(ticket, since=marked)
+            return
+        with self._flush_cond:
+            while self._flushed < (turn - 1 if own else turn):
+                self._flush_cond.wait()
+        if own:
+            error = None
+            try:
+                self._flush(changes)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                with self._flush_cond:
+                    if error is not None:
+                        self._failed_turns.append((turn, error))
+                    self._flushed = turn
+                    self._flush_cond.notify_all()
+        if marked is not None:
+            # Los cambios de este hilo pudo drenarlos el save de otro
+            with self._flush_cond:
+                error = next((error for failed, error in self._failed_turns
+                              if marked < failed <= turn), None)
+            if error is not None:
+                raise error
+
+    def _mark_local(self):
+        """
+        Recuerda que este hilo dejó cambios en ``_pending``, con el último
+        drenaje anterior a ellos: los drenajes que siguen pueden llevárselos y
+        sus errores son también los de este hilo.
+        """
+        if 'marked' not in self._local.__dict__:
+            self._local.marked = (self._writer.last_ticket if self._writer is not None
+                                  else self._drained)
+
+    def flush(self):
+        """Espera a que los saves pendientes del escritor estén en disco."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def compact(self):
+        self.storage.compact(self.snapshot)
+
+    def reshard(self, shards):
+        """
+        Con el backend 'sharded', reparte los datos en ``shards`` archivos sin
+        detener la aplicación: lecturas y saves siguen mientras se escriben.
+        """
+        reshard = getattr(self.storage, 'reshard', None)
+        if reshard is None:
+            raise ValueError("El backend %s no admite cambiar la cantidad de shards"
+                             % self.backend)
+        reshard(shards)
+
+    def refresh(self):
+        """
+        En modo multiproceso, aplica los cambios que otros procesos hayan
+        escrito. Si no hubo ninguno solo compara el contador publicado.
+        """
+        if self.shared and self.storage.changed():
+            with self.storage.locked():
+                self._catch_up()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        En modo multiproceso toma el lock de archivo, aplica los cambios de
+        otros procesos y lo mantiene hasta el final del bloque, que debe
+        incluir el save_data. Fuera de ese modo no hace nada.
+        """
+        if not self.shared:
+            yield
+            return
+        with self.storage.locked():
+            self._catch_up()
+            yield
+
+    def snapshot(self):
+        """
+        Copia de las listas de tareas y usuarios para escribirlas completas.
+        Se toma con el lock en lectura, así que no frena a los lectores. Los
+        modelos se comparten con la copia, pero cada modificación reemplaza
+        un solo atributo, de modo que al serializarlos después siempre se ve
+        un estado completo de cada registro.
+
+        Las tareas van en orden de creación aunque los borrados hayan movido
+        alguna dentro de la lista, para que al recargar ``task_seq`` y el
+        orden del índice invertido sean los mismos. Con un snapshot binario
+        se ordenan las posiciones, sin decodificar las tareas, y solo si un
+        borrado movió alguna.
+        """
+        with self.lock.read():
+            tasks = self.tasks.copy()
+            if type(tasks) is list:
+                # Casi ordenada: timsort la recorre en tiempo lineal
+                tasks.sort(key=lambda task: self.task_seq[task.id])
+            elif self._reordered:
+                seq = self.task_seq
+                tasks = Reordered(tasks, sorted(range(len(tasks)),
+                                                key=lambda i: seq[tasks.id_at(i)]))
+            return tasks, self.users.copy()
 
     def load_data(self):
+        start = time.perf_counter()
         try:
-            with open(self.filename, 'r') as f:
-                data = json.load(f)
-                self.tasks = data.get('tasks', [])
-                self.users = data.get('users', [])
-        except FileNotFoundError:
-            self.tasks = []
-            self.users = []
\ No newline at end of file
+            self._load_data()
+        finally:
+            self.load_seconds = time.perf_counter() - start
+
+    def _load_data(self):
+        with self.lock:
+            self._pending.clear()
+            self.__dict__.pop('text_index', None)
+            self.__dict__.pop('contacts', None)
+            self.__dict__.pop('schedule', None)
+            self.__dict__.pop('status_counts', None)
+            self.task_versions = {}
+            self.user_versions = {}
+            self.epoch = os.urandom(8).hex()
+            self.cache.clear()
+            self.changes.clear()
+            if self.storage.lazy:
+                self._load_lazy()
+                return
+            self._index_rows = None
+            tasks, users = self.storage.load()
+            # Convertir en el mismo lugar para liberar cada dict a medida que avanza
+            for i, task in enumerate(tasks):
+                tasks[i] = Tarea.from_dict(task)
+            for i, user in enumerate(users):
+                users[i] = Usuario.from_dict(user)
+            self.tasks, self.users = tasks, users
+            self._rebuild_indexes()
+
+    def metric_families(self):
+        """
+        Tamaños del dataset, de los índices y de la caché, y los contadores
+        del storage, como colector de ``utils.metrics``. Los índices de una
+        carga diferida que todavía no se armaron no se reportan.
+        """
+        with self.lock.read():
+            records = [({'kind': 'tasks'}, len(self.tasks)), ({'kind': 'users'}, len(self.users))]
+            families = [
+                ('data_records', 'gauge', 'Registros en memoria', records),
+                ('data_pending_changes', 'gauge', 'Cambios esperando save_data',
+                 [({}, len(self._pending))]),
+            ]
+            if isinstance(self.tasks, LazyList):
+                families.append(('data_records_decoded', 'gauge',
+                                 'Registros del snapshot ya decodificados',
+                                 [({'kind': 'tasks'}, self.tasks.loaded),
+                                  ({'kind': 'users'}, self.users.loaded)]))
+            if 'tasks_by_status' in self.__dict__:
+                families += [
+                    ('data_tasks_by_status', 'gauge', 'Tareas por estado',
+                     [({'status': str(status)}, len(ids))
+                      for status, ids in sorted(self.tasks_by_status.items(), key=str)]),
+                    ('data_index_keys', 'gauge', 'Claves distintas por índice',
+                     [({'index': 'user'}, len(self.tasks_by_user)),
+                      ({'index': 'role'}, len(self.tasks_by_role)),
+                      ({'index': 'status'}, len(self.tasks_by_status))]),
+                ]
+            text_index = self.__dict__.get('text_index')
+            if text_index is not None:
+                families.append(('data_text_index_terms', 'gauge',
+                                 'Términos distintos del índice de texto',
+                                 [({}, len(text_index))]))
+        families += [
+            ('response_cache_hits_total', 'counter', 'Lecturas servidas desde la caché',
+             [({}, self.cache.hits)]),
+            ('response_cache_misses_total', 'counter', 'Lecturas que tuvieron que codificar',
+             [({}, self.cache.misses)]),
+            ('response_cache_entries', 'gauge', 'Registros codificados en la caché',
+             [({}, len(self.cache))]),
+            ('change_feed_events_total', 'counter', 'Eventos publicados en el registro de cambios',
+             [({}, self.changes.published)]),
+            ('change_feed_buffered', 'gauge', 'Eventos guardados para reconexiones',
+             [({}, len(self.changes))]),
+            ('status_transitions_total', 'counter',
+             'Cambios de estado registrados en el historial por este proceso',
+             [({}, self.history.recorded)]),
+            ('storage_bytes_written_total', 'counter',
+             'Bytes escritos por el storage (en sqlite, tamaño de los documentos)',
+             [({'backend': self.backend}, self.storage.bytes_written)]),
+            ('storage_compactions_total', 'counter', 'Compactaciones terminadas',
+             [({'backend': self.backend}, self.storage.compactions)]),
+        ]
+        if self.load_seconds is not None:
+            families.append(('data_load_seconds', 'gauge', 'Duración de la última carga',
+                             [({}, self.load_seconds)]))
+        return families
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            # El registro en atexit mantendría vivo al handler hasta la salida
+            atexit.unregister(self._writer.close)
+        self.storage.close()
+        self.history.close()
+
+    def after_fork(self):
+        """
+        Prepara el handler heredado de un fork para usarlo en el proceso
+        hijo: el hilo escritor no pasa al hijo y los archivos abiertos no se
+        comparten con el padre. Cambia ``epoch`` y el registro de cambios
+        para que cada worker dé ETags y secuencias propias.
+        """
+        if self._writer is not None:
+            # El hijo hereda los registros de atexit del padre
+            atexit.unregister(self._writer.close)
+            self._writer = GroupCommitWriter(self._flush, window_ms=self._writer.window * 1000)
+            atexit.register(self._writer.close)
+        self.epoch = os.urandom(8).hex()
+        self.cache.clear()
+        self.changes = ChangeFeed(self.changes.capacity)
+        self.storage.after_fork()
+        self.history.after_fork()
+
+    def _catch_up(self):
+        if not self.storage.changed():
+            return
+        records = self.storage.read_delta()
+        if records is None:
+            logger.warning("Cambios externos de más de una generación: recargando %s",
+                           self.filename)
+            self.load_data()
+            return
+        with self.lock:
+            self._apply_records(records)
+
+    def _apply_records(self, records):
+        """Aplica registros del journal escritos por otro proceso, sin marcarlos pendientes."""
+        for entry in records:
+            action, _, kind = entry['op'].partition('_')
+            if kind == 'task':
+                previous = self._task_aliases.get(entry['id'], ())
+                if action == 'put':
+                    task = Tarea.from_dict(entry['record'])
+                    self._put_task(task)
+                    record_id = task.id
+                else:
+                    task = None
+                    record_id = entry['id']
+                    self._delete_task(record_id)
+                self._touch(self.task_versions, 'task', record_id)
+                self._publish_task(record_id, task, previous)
+            else:
+                if action == 'put':
+                    user = Usuario.from_dict(entry['record'])
+                    self._put(self.users, self.users_by_id, self._user_pos, user)
+                    self._index_user(user)
+                    record_id = user.id
+                else:
+                    record_id = entry['id']
+                    user = None
+                    if self._delete(self.users, self.users_by_id, self._user_pos,
+                                    record_id) is not None:
+                        self._unindex_user(record_id)
+                self._touch(self.user_versions, 'user', record_id)
+                self._publish_user(record_id, user)
+
+    def _load_lazy(self):
+        """
+        Carga en tiempo constante: mapea el snapshot y aplica solo el journal.
+        Los registros se decodifican al pedirlos y los índices secundarios
+        se construyen con ``_build_lazy_indexes`` cuando alguien los usa.
+        """
+        snapshot, records = self.storage.open()
+        # Igual que JsonStorage._replay: lo que el journal borra del snapshot
+        # deja de estar sin mover al resto, y lo que agrega va al final en el
+        # orden en que apareció, así task_seq no depende del backend
+        removed = {'task': set(), 'user': set()}
+        changes = {'task': {}, 'user': {}}
+        sections = {'task': snapshot.tasks, 'user': snapshot.users}
+        for entry in records:
+            action, _, kind = entry['op'].partition('_')
+            if action == 'put':
+                # Un dict conserva el lugar de la primera aparición
+                changes[kind][entry['record']['id']] = entry['record']
+                continue
+            changes[kind].pop(entry['id'], None)
+            try:
+                removed[kind].add(sections[kind].position(entry['id']))
+            except KeyError:
+                pass
+        self._reordered = False
+        self.tasks = LazyList(snapshot.tasks, Tarea.from_dict, removed['task'])
+        self.users = LazyList(snapshot.users, Usuario.from_dict, removed['user'])
+        self._task_pos = LazyDict(self.tasks.index, self.tasks.ids)
+        self._user_pos = LazyDict(self.users.index, self.users.ids)
+        self.tasks_by_id = LazyDict(lambda task_id: self.tasks[self._task_pos[task_id]],
+                                    self.tasks.ids, contains=self._task_pos.__contains__)
+        self.users_by_id = LazyDict(lambda user_id: self.users[self._user_pos[user_id]],
+                                    self.users.ids, contains=self._user_pos.__contains__)
+        for record in changes['task'].values():
+            self._put(self.tasks, self.tasks_by_id, self._task_pos, Tarea.from_dict(record))
+        for record in changes['user'].values():
+            self._put(self.users, self.users_by_id, self._user_pos, Usuario.from_dict(record))
+        for name in LAZY_INDEXES:
+            self.__dict__.pop(name, None)
+        self._index_rows = snapshot.task_rows
+        self.storage.recover(self.snapshot)
+
+    def _build_text_index(self):
+        """
+        Arma el índice de texto con todas las tareas. Como los índices
+        diferidos, se publica recién completo. Con un snapshot binario
+        decodifica todas las tareas, porque los textos no están en las filas
+        de índice.
+        """
+        # Antes del lock: con carga diferida, task_seq también se arma al usarlo
+        task_seq = self.task_seq
+        with self._index_lock:
+            if 'text_index' in self.__dict__:
+                return
+            index = TextIndex(weights=TEXT_WEIGHTS)
+            index.extend((task.id, task_seq[task.id], (task.title, task.description))
+                         for task in self.tasks)
+            self.__dict__['text_index'] = index
+
+    def _build_contacts(self):
+        """
+        Arma la red de contactos con los alias de todas las tareas y los
+        contactos de todos los usuarios, y la publica completa. Con un
+        snapshot binario decodifica los usuarios pero no las tareas.
+        """
+        task_aliases = self._task_aliases
+        with self._index_lock:
+            if 'contacts' in self.__dict__:
+                return
+            graph = ContactGraph()
+            graph.load(task_aliases.values(),
+                       ((user.id, self._contactos(user)) for user in self.users))
+            self.__dict__['contacts'] = graph
+
+    def _build_schedule(self):
+        """
+        Arma el plan sobre el grafo de dependencias y lo publica completo.
+        Con un snapshot binario decodifica todas las tareas, porque las
+        duraciones no están en las filas de índice.
+        """
+        graph, task_aliases = self.graph, self._task_aliases
+        with self._index_lock:
+            if 'schedule' in self.__dict__:
+                return
+            schedule = Schedule(graph)
+            schedule.load_tasks((task.id, duration_of(task), task_aliases.get(task.id, ()))
+                                for task in self.tasks)
+            self.__dict__['schedule'] = schedule
+
+    def _build_status_counts(self):
+        """Cuenta las tareas por estado, alias y rol a partir de los índices."""
+        task_keys, task_aliases = self._task_keys, self._task_aliases
+        with self._index_lock:
+            if 'status_counts' in self.__dict__:
+                return
+            counters = StatusCounters()
+            counters.load((status, task_aliases.get(task_id, ()), roles)
+                          for task_id, (status, roles, _) in task_keys.items())
+            self.__dict__['status_counts'] = counters
+
+    def _cursor_seq(self, cursor):
+        if cursor is None:
+            return None
+        seq, task_id = cursor
+        return self.task_seq.get(task_id, seq)
+
+    def _status_key(self, task_id):
+        keys = self._task_keys.get(task_id)
+        if keys is None:
+            return None
+        return keys[0], self._task_aliases.get(task_id, ()), keys[1]
+
+    def _record_status(self, task_id, source, target):
+        # AUSENTE (registro sin estado) se guarda como None
+        self.history.record(task_id, source if isinstance(source, str) else None,
+                            target if isinstance(target, str) else None)
+
+    def _build_lazy_indexes(self):
+        """
+        Arma los índices a partir de las filas de índice del snapshot, sin
+        decodificar las tareas, y de los modelos ya cargados. Se construyen
+        aparte y se publican completos, porque puede llamarse con el lock solo
+        en lectura y otro lector no debe ver un índice a medio llenar.
+        """
+        with self._index_lock:
+            if all(name in self.__dict__ for name in LAZY_INDEXES):
+                return
+            rows = self._index_rows()
+            tasks = [self.tasks.peek(i) or rows[self.tasks.section_index(i)]
+                     for i in range(len(self.tasks))]
+            del rows
+            builder = DataHandler.__new__(DataHandler)
+            # Solo se usa para saber qué dependencias existen: un set evita
+            # una búsqueda binaria en el snapshot por cada una
+            builder.tasks_by_id = {task.id for task in tasks}
+            builder._build_indexes(tasks)
+            self._seq = builder._seq
+            for name in LAZY_INDEXES:
+                self.__dict__[name] = builder.__dict__[name]
+
+    def _touch(self, versions, kind, record_id):
+        """Da una versión nueva al registro y descarta su copia en caché."""
+        versions[record_id] = next(self._version)
+        self.cache.invalidate((kind, record_id))
+
+    def _publish_task(self, task_id, task, previous):
+        """
+        Publica el cambio en ``changes``. ``usuarios`` incluye a los alias que
+        tenía antes, para que también se entere quien fue desasignado.
+        """
+        current = self._task_aliases.get(task_id, ()) if task is not None else ()
+        event = {'tipo': 'tarea', 'accion': 'actualizar' if task is not None else 'eliminar',
+                 'id': task_id, 'usuarios': list(dict.fromkeys(previous + current)),
+                 'version': self.task_version(task_id)}
+        if task is not None and isinstance(task.status, str):
+            event['estado'] = task.status
+        self.changes.publish(event)
+
+    def _publish_user(self, user_id, user):
+        self.changes.publish({'tipo': 'usuario',
+                              'accion': 'actualizar' if user is not None else 'eliminar',
+                              'id': user_id, 'usuarios': [user_id],
+                              'version': self.user_version(user_id)})
+
+    def _flush(self, changes):
+        start = time.perf_counter()
+        try:
+            self.storage.save(changes, self.snapshot)
+        except Exception:
+            self._requeue(changes)
+            raise
+        self.history.flush()
+        FLUSH_SECONDS.observe(time.perf_counter() - start, self.backend)
+
+    @staticmethod
+    def _changes(pending):
+        return [
+            {'op': 'put_' + kind, 'id': record_id, 'record': to_document(record)}
+            if record is not None else {'op': 'del_' + kind, 'id': record_id}
+            for (kind, record_id), record in pending.items()
+        ]
+
+    def _requeue(self, changes):
+        """Devuelve a pendientes los cambios de un flush fallido, sin pisar otros más nuevos."""
+        if changes is None:
+            return
+        with self.lock.read(), self._pending_lock:
+            for entry in changes:
+                key = (entry['op'][4:], entry['id'])
+                self._pending.setdefault(key, entry.get('record'))
+
+    def _rebuild_indexes(self):
+        self.tasks_by_id = {t.id: t for t in self.tasks}
+        self.users_by_id = {u.id: u for u in self.users}
+        self._task_pos = {t.id: i for i, t in enumerate(self.tasks)}
+        self._user_pos = {u.id: i for i, u in enumerate(self.users)}
+        self._build_indexes(self.tasks)
+
+    def _build_indexes(self, tasks):
+        """
+        Índices secundarios y grafo desde cero. ``tasks`` puede ser de
+        modelos o de filas con id, status, users y dependencies.
+        """
+        self.tasks_by_user = {}
+        self._task_aliases = {}
+        self.tasks_by_status = {}
+        self.tasks_by_role = {}
+        self.tasks_with_deps = set()
+        self.tasks_without_deps = set()
+        self._task_keys = {}
+        self.task_seq = {}
+        self._dangling = {}
+        # El orden de creación sale del orden de carga, igual en cada worker
+        self._seq = itertools.count()
+        for task in tasks:
+            self._index_fields(task)
+            self._index_aliases(task)
+            for dep_id in task.dependencies:
+                if dep_id not in self.tasks_by_id:
+                    self._dangling.setdefault(dep_id, set()).add(task.id)
+        self.graph = DependencyGraph()
+        self.graph.load(
+            (t.id, t.status in ESTADOS_FINALIZADOS, t.dependencies)
+            for t in tasks
+        )
+
+    def _put_task(self, task):
+        self._put(self.tasks, self.tasks_by_id, self._task_pos, task)
+        self._index_task(task)
+
+    def _delete_task(self, task_id):
+        if isinstance(self.tasks, LazyList) and task_id in self.tasks_by_id:
+            # El borrado mueve la última tarea: task_seq tiene que numerarse
+            # antes, con el orden de creación, para que snapshot lo recupere
+            self.task_seq
+            if self._task_pos[task_id] != len(self.tasks) - 1:
+                self._reordered = True
+        task = self._delete(self.tasks, self.tasks_by_id, self._task_pos, task_id)
+        if task is not None:
+            self._unindex_task(task_id)
+            dependents = tuple(self.graph.dependents.get(task_id, ()))
+            self.graph.remove_task(task_id)
+            schedule = self.__dict__.get('schedule')
+            if schedule is not None:
+                schedule.remove(task_id, dependents)
+        return task
+
+    def _index_task(self, task):
+        """Actualiza el grafo y el índice invertido con los cambios de la tarea."""
+        counters = self.__dict__.get('status_counts')
+        if counters is not None:
+            old = self._status_key(task.id)
+        self._sync_graph(task)
+        self._index_fields(task)
+        self._index_aliases(task)
+        if counters is not None:
+            counters.move(old, self._status_key(task.id))
+        text_index = self.__dict__.get('text_index')
+        if text_index is not None:
+            text_index.add(task.id, self.task_seq[task.id], (task.title, task.description))
+        schedule = self.__dict__.get('schedule')
+        if schedule is not None:
+            schedule.update(task.id, duration_of(task), self._task_aliases.get(task.id, ()))
+
+    def _index_aliases(self, task):
+        """Aplica al índice invertido la diferencia de alias de la tarea."""
+        task_id = task.id
+        old = self._task_aliases.get(task_id, ())
+        new = tuple(dict.fromkeys(u.usuario for u in task.users))
+        if old == new:
+            return
+        contacts = self.__dict__.get('contacts')
+        if contacts is not None:
+            contacts.update_task(old, new)
+        for alias in old:
+            if alias not in new:
+                self._unlink(alias, task_id)
+        for alias in new:
+            if alias not in old:
+                posting = self.tasks_by_user.get(alias)
+                if posting is None:
+                    posting = self.tasks_by_user[alias] = PostingList()
+                posting.add(task_id, self.task_seq[task_id])
+        self._task_aliases[task_id] = new
+
+    def _index_fields(self, task):
+        """Mueve la tarea entre los índices de estado, rol y dependencias."""
+        task_id = task.id
+        if task_id not in self.task_seq:
+            self.task_seq[task_id] = next(self._seq)
+        new = (task.status,
+               frozenset(u.rol for u in task.users),
+               bool(task.dependencies))
+        old = self._task_keys.get(task_id)
+        if old == new:
+            return
+        if old is not None:
+            self._unindex_fields(task_id, old)
+        status, roles, has_deps = new
+        self.tasks_by_status.setdefault(status, set()).add(task_id)
+        for role in roles:
+            self.tasks_by_role.setdefault(role, set()).add(task_id)
+        (self.tasks_with_deps if has_deps else self.tasks_without_deps).add(task_id)
+        self._task_keys[task_id] = new
+
+    def _unindex_fields(self, task_id, keys):
+        status, roles, has_deps = keys
+        self._discard(self.tasks_by_status, status, task_id)
+        for role in roles:
+            self._discard(self.tasks_by_role, role, task_id)
+        (self.tasks_with_deps if has_deps else self.tasks_without_deps).discard(task_id)
+
+    @staticmethod
+    def _discard(index, key, task_id):
+        task_ids = index[key]
+        task_ids.discard(task_id)
+        if not task_ids:
+            del index[key]
+
+    def _sync_graph(self, task):
+        graph = self.graph
+        task_id = task.id
+        finished = task.status in ESTADOS_FINALIZADOS
+        if task_id not in graph:
+            graph.add_task(task_id, finished)
+            for dependent in self._dangling.pop(task_id, ()):
+                self._link(dependent, task_id)
+        else:
+            graph.set_finished(task_id, finished)
+        wanted = set(task.dependencies)
+        current = graph.deps[task_id]
+        if wanted == current:
+            return
+        for dep_id in current - wanted:
+            graph.remove_dependency(task_id, dep_id)
+        for dep_id in wanted - current:
+            if dep_id not in graph:
+                self._dangling.setdefault(dep_id, set()).add(task_id)
+            else:
+                self._link(task_id, dep_id)
+
+    def _link(self, task_id, dep_id):
+        if task_id not in self.graph or (task_id, dep_id) in self.graph.rejected:
+            return
+        try:
+            self.graph.add_dependency(task_id, dep_id)
+        except CycleError:
+            self.graph.reject(task_id, dep_id)
+
+    def _unindex_task(self, task_id):
+        counters = self.__dict__.get('status_counts')
+        if counters is not None:
+            counters.move(self._status_key(task_id), None)
+        aliases = self._task_aliases.pop(task_id, ())
+        for alias in aliases:
+            self._unlink(alias, task_id)
+        contacts = self.__dict__.get('contacts')
+        if contacts is not None:
+            contacts.update_task(aliases, ())
+        keys = self._task_keys.pop(task_id, None)
+        if keys is not None:
+            self._unindex_fields(task_id, keys)
+        self.task_seq.pop(task_id, None)
+        text_index = self.__dict__.get('text_index')
+        if text_index is not None:
+            text_index.remove(task_id)
+
+    def _index_user(self, user):
+        contacts = self.__dict__.get('contacts')
+        if contacts is not None:
+            contacts.set_contacts(user.id, self._contactos(user))
+
+    def _unindex_user(self, user_id):
+        contacts = self.__dict__.get('contacts')
+        if contacts is not None:
+            contacts.set_contacts(user_id, ())
+
+    @staticmethod
+    def _contactos(user):
+        # Un usuario cargado sin el campo tiene AUSENTE en lugar de la lista
+        return user.contactos if isinstance(user.contactos, list) else []
+
+    def _unlink(self, alias, task_id):
+        posting = self.tasks_by_user[alias]
+        posting.discard(task_id)
+        if not posting:
+            del self.tasks_by_user[alias]
+
+    @staticmethod
+    def _put(items, by_id, positions, record):
+        position = positions.get(record.id)
+        if position is None:
+            positions[record.id] = len(items)
+            items.append(record)
+        else:
+            items[position] = record
+        by_id[record.id] = record
+
+    @staticmethod
+    def _delete(items, by_id, positions, record_id):
+        """Elimina en O(1) moviendo el último elemento al hueco."""
+        record = by_id.pop(record_id, None)
+        if record is None:
+            return None
+        position = positions.pop(record_id)
+        last = items.pop()
+        if last is not record:
+            items[position] = last
+            positions[last.id] = position
+        return record
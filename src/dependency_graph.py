@@ -0,0 +1,249 @@
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Estados que cuentan como tarea terminada para desbloquear a sus dependientes
+ESTADOS_FINALIZADOS = frozenset(['Finalizado', 'finalizado', 'completed', 'completado'])
+
+
+class CycleError(ValueError):
+    """La dependencia pedida cerraría un ciclo en el grafo."""
+
+
+class DependencyGraph:
+    """
+    Grafo de dependencias entre tareas mantenido de forma incremental.
+
+    Guarda un orden topológico (``ord``) que se corrige al insertar cada
+    arista con el algoritmo de Pearce-Kelly: solo se recorre la región entre
+    las posiciones de los dos extremos, así que la mayoría de inserciones no
+    recorren nada y los ciclos se detectan sin visitar todo el grafo.
+
+    También mantiene, por tarea, cuántas dependencias siguen sin terminar,
+    de modo que el conjunto de tareas listas se consulta sin recorrer el grafo.
+    """
+
+    def __init__(self):
+        self.deps = {}          # tarea -> tareas de las que depende
+        self.dependents = {}    # tarea -> tareas que dependen de ella
+        self.ord = {}
+        self.finished = set()
+        self._pending = {}      # tarea -> dependencias sin terminar
+        self._ready = {}        # tareas sin terminar y sin bloqueos (conjunto ordenado)
+        self._next_ord = 0
+        self.rejected = set()   # aristas descartadas por formar ciclos
+
+    def __contains__(self, task_id):
+        return task_id in self.ord
+
+    def __len__(self):
+        return len(self.ord)
+
+    # ---------- construcción ----------
+
+    def load(self, tasks):
+        """
+        Construye el grafo desde cero en O(V + E). ``tasks`` es un iterable de
+        ``(task_id, finished, dependencies)``. Las aristas que forman ciclos
+        (como una tarea que depende de sí misma) se descartan y se registran
+        en ``rejected``.
+        """
+        self.__init__()
+        edges = []
+        for task_id, finished, dependencies in tasks:
+            self.deps[task_id] = set()
+            self.dependents[task_id] = set()
+            if finished:
+                self.finished.add(task_id)
+            edges.extend((task_id, dep_id) for dep_id in dependencies)
+
+        indegree = dict.fromkeys(self.deps, 0)
+        for task_id, dep_id in edges:
+            if dep_id not in self.deps:
+                continue
+            if task_id == dep_id:
+                self.reject(task_id, dep_id)
+                continue
+            if dep_id not in self.deps[task_id]:
+                self.deps[task_id].add(dep_id)
+                self.dependents[dep_id].add(task_id)
+                indegree[task_id] += 1
+
+        # Kahn: las tareas que quedan sin ordenar están en algún ciclo
+        queue = deque(t for t, n in indegree.items() if n == 0)
+        while queue:
+            task_id = queue.popleft()
+            self.ord[task_id] = self._next_ord
+            self._next_ord += 1
+            for dependent in self.dependents[task_id]:
+                indegree[dependent] -= 1
+                if indegree[dependent] == 0:
+                    queue.append(dependent)
+
+        cyclic = [t for t in self.deps if t not in self.ord]
+        if cyclic:
+            cyclic_set = set(cyclic)
+            retry = []
+            for task_id in cyclic:
+                self.ord[task_id] = self._next_ord
+                self._next_ord += 1
+                for dep_id in list(self.deps[task_id]):
+                    if dep_id in cyclic_set:
+                        self._unlink(task_id, dep_id)
+                        retry.append((task_id, dep_id))
+            for task_id, dep_id in retry:
+                try:
+                    self._insert_edge(task_id, dep_id)
+                except CycleError:
+                    self.reject(task_id, dep_id)
+
+        for task_id in self.deps:
+            self._pending[task_id] = sum(1 for d in self.deps[task_id] if d not in self.finished)
+            self._update_ready(task_id)
+
+    def add_task(self, task_id, finished=False):
+        if task_id in self.ord:
+            return
+        self.deps[task_id] = set()
+        self.dependents[task_id] = set()
+        self.ord[task_id] = self._next_ord
+        self._next_ord += 1
+        self._pending[task_id] = 0
+        if finished:
+            self.finished.add(task_id)
+        self._update_ready(task_id)
+
+    def remove_task(self, task_id):
+        if task_id not in self.ord:
+            return
+        for dep_id in list(self.deps[task_id]):
+            self.remove_dependency(task_id, dep_id)
+        for dependent in list(self.dependents[task_id]):
+            self.remove_dependency(dependent, task_id)
+        del self.deps[task_id], self.dependents[task_id], self.ord[task_id], self._pending[task_id]
+        self.finished.discard(task_id)
+        self._ready.pop(task_id, None)
+
+    def set_finished(self, task_id, finished):
+        if finished == (task_id in self.finished):
+            return
+        delta = -1 if finished else 1
+        if finished:
+            self.finished.add(task_id)
+        else:
+            self.finished.discard(task_id)
+        self._update_ready(task_id)
+        for dependent in self.dependents[task_id]:
+            self._pending[dependent] += delta
+            self._update_ready(dependent)
+
+    def add_dependency(self, task_id, dep_id):
+        """Registra que ``task_id`` depende de ``dep_id``; lanza CycleError si cierra un ciclo."""
+        if dep_id in self.deps[task_id]:
+            return
+        self._insert_edge(task_id, dep_id)
+        if dep_id not in self.finished:
+            self._pending[task_id] += 1
+            self._update_ready(task_id)
+
+    def _insert_edge(self, task_id, dep_id):
+        if task_id == dep_id:
+            raise CycleError("Una tarea no puede depender de sí misma")
+        lower, upper = self.ord[task_id], self.ord[dep_id]
+        if upper > lower:
+            # dep_id está después de task_id: reordenar la región afectada
+            forward = self._search(task_id, self.dependents, lambda n: self.ord[n] <= upper, dep_id)
+            if forward is None:
+                raise CycleError("La dependencia crea un ciclo")
+            backward = self._search(dep_id, self.deps, lambda n: self.ord[n] >= lower)
+            self._reorder(backward, forward)
+        self.deps[task_id].add(dep_id)
+        self.dependents[dep_id].add(task_id)
+
+    def remove_dependency(self, task_id, dep_id):
+        if dep_id not in self.deps.get(task_id, ()):
+            return
+        self._unlink(task_id, dep_id)
+        if dep_id not in self.finished:
+            self._pending[task_id] -= 1
+            self._update_ready(task_id)
+
+    def would_cycle(self, task_id, dep_id):
+        if task_id == dep_id:
+            return True
+        upper = self.ord[dep_id]
+        if upper < self.ord[task_id]:
+            return False
+        return self._search(task_id, self.dependents, lambda n: self.ord[n] <= upper, dep_id) is None
+
+    def reject(self, task_id, dep_id):
+        logger.warning("Dependencia %s -> %s descartada: forma un ciclo", task_id, dep_id)
+        self.rejected.add((task_id, dep_id))
+
+    # ---------- consultas ----------
+
+    def topological_order(self):
+        """Todas las tareas, cada una después de sus dependencias."""
+        return sorted(self.ord, key=self.ord.__getitem__)
+
+    def transitive_dependencies(self, task_id):
+        return self._closure(task_id, self.deps)
+
+    def transitive_dependents(self, task_id):
+        return self._closure(task_id, self.dependents)
+
+    def ready(self):
+        """Tareas sin terminar cuyas dependencias están todas terminadas."""
+        return list(self._ready)
+
+    def blocked_by(self, task_id, transitive=False):
+        """Dependencias sin terminar que bloquean a ``task_id``."""
+        if transitive:
+            candidates = self.transitive_dependencies(task_id)
+        else:
+            candidates = sorted(self.deps[task_id], key=self.ord.__getitem__)
+        return [d for d in candidates if d not in self.finished]
+
+    # ---------- internos ----------
+
+    def _unlink(self, task_id, dep_id):
+        self.deps[task_id].discard(dep_id)
+        self.dependents[dep_id].discard(task_id)
+
+    def _update_ready(self, task_id):
+        if task_id not in self.finished and self._pending[task_id] == 0:
+            self._ready[task_id] = None
+        else:
+            self._ready.pop(task_id, None)
+
+    def _search(self, start, edges, inside, target=None):
+        """DFS acotado a la región; retorna None si alcanza ``target``."""
+        visited = {start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for neighbour in edges[node]:
+                if neighbour == target:
+                    return None
+                if neighbour not in visited and inside(neighbour):
+                    visited.add(neighbour)
+                    stack.append(neighbour)
+        return visited
+
+    def _reorder(self, backward, forward):
+        """Reasigna las posiciones: primero ``backward`` y luego ``forward``."""
+        nodes = sorted(backward, key=self.ord.__getitem__) + sorted(forward, key=self.ord.__getitem__)
+        positions = sorted(self.ord[n] for n in nodes)
+        for node, position in zip(nodes, positions):
+            self.ord[node] = position
+
+    def _closure(self, task_id, edges):
+        seen = set()
+        stack = list(edges[task_id])
+        while stack:
+            node = stack.pop()
+            if node not in seen:
+                seen.add(node)
+                stack.extend(edges[node])
+        return sorted(seen, key=self.ord.__getitem__)
@@ -0,0 +1,56 @@
+"""
+Importa un data.json existente (incluido su journal, si lo hay) a SQLite, al
+snapshot binario o a un directorio de shards.
+
+Uso:
+    python src/migrate.py data.json data.db
+    python src/migrate.py data.json data.snap --formato snapshot
+    python src/migrate.py data.json data.shards --formato sharded --shards 16
+"""
+import argparse
+import os
+import sys
+
+from storage import JsonStorage, ShardedStorage, SqliteStorage
+from storage.snapshot import convert_json
+
+
+def migrate(source, target, storage=None):
+    """Copia el JSON a ``storage`` (por defecto, SQLite en ``target``)."""
+    tasks, users = JsonStorage(source, journal=os.path.exists(source + '.journal')).load()
+    if storage is None:
+        storage = SqliteStorage(target)
+    try:
+        storage.save(None, lambda: (tasks, users))
+    finally:
+        storage.close()
+    return len(tasks), len(users)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('source', help='archivo JSON de origen')
+    parser.add_argument('target', help='base de datos SQLite, snapshot o directorio de destino')
+    parser.add_argument('--formato', choices=['sqlite', 'snapshot', 'sharded'], default='sqlite',
+                        help='snapshot convierte leyendo de a un registro, sin cargar el JSON')
+    parser.add_argument('--shards', type=int, default=8,
+                        help='cantidad de shards con --formato sharded')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.source):
+        print("No existe el archivo %s" % args.source, file=sys.stderr)
+        return 1
+    if args.formato == 'snapshot':
+        tasks, users = convert_json(args.source, args.target)
+    elif args.formato == 'sharded':
+        storage = ShardedStorage(args.target, shards=args.shards)
+        storage.load()
+        tasks, users = migrate(args.source, args.target, storage)
+    else:
+        tasks, users = migrate(args.source, args.target)
+    print("Migradas %d tareas y %d usuarios a %s" % (tasks, users, args.target))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
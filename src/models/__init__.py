@@ -1 +1,14 @@
-# This file is intentionally left blank.
\ No newline at end of file
+class _Ausente:
+    """Marca un campo que no venía en el registro original."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'AUSENTE'
+
+    def __bool__(self):
+        return False
+
+
+# Los campos con este valor se omiten al convertir a dict, de modo que un
+# registro cargado se serializa con exactamente las mismas claves.
+AUSENTE = _Ausente()
@@ -1,15 +1,69 @@
+import sys
+
+from models import AUSENTE
+
+# Roles y estados se repiten en cada asignación: se internan para compartir el string
+ROLES = tuple(sys.intern(r) for r in ('programador', 'pruebas', 'infra'))
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
 class Asignacion:
+    __slots__ = ('task_id', 'user_id', 'estado', 'fecha_asignacion', 'rol', 'usuario', 'extra')
+
+    _CAMPOS = ('usuario', 'rol', 'task_id', 'user_id', 'estado', 'fecha_asignacion')
+
     def __init__(self, task_id, user_id):
         self.task_id = task_id
         self.user_id = user_id
         self.estado = "activo"  # Para tracking del estado de la asignación
         self.fecha_asignacion = None
         self.rol = None
+        self.usuario = AUSENTE
+        self.extra = None
+
+    @classmethod
+    def simple(cls, usuario, rol):
+        """Asignación con solo usuario y rol, como las que agrega /tasks/<id>/users"""
+        asignacion = cls.__new__(cls)
+        asignacion.usuario = _intern(usuario)
+        asignacion.rol = _intern(rol)
+        asignacion.task_id = asignacion.user_id = AUSENTE
+        asignacion.estado = asignacion.fecha_asignacion = AUSENTE
+        asignacion.extra = None
+        return asignacion
+
+    @classmethod
+    def from_dict(cls, data):
+        asignacion = cls.__new__(cls)
+        asignacion.usuario = _intern(data.get('usuario', AUSENTE))
+        asignacion.rol = _intern(data.get('rol', AUSENTE))
+        asignacion.task_id = data.get('task_id', AUSENTE)
+        user_id = data.get('user_id', AUSENTE)
+        # user_id suele repetir el alias: compartir el mismo string
+        asignacion.user_id = asignacion.usuario if user_id == asignacion.usuario else _intern(user_id)
+        asignacion.estado = _intern(data.get('estado', AUSENTE))
+        asignacion.fecha_asignacion = data.get('fecha_asignacion', AUSENTE)
+        extra = {k: v for k, v in data.items() if k not in cls._CAMPOS}
+        asignacion.extra = extra or None
+        return asignacion
+
+    def to_dict(self):
+        data = {}
+        for campo in self._CAMPOS:
+            value = getattr(self, campo)
+            if value is not AUSENTE:
+                data[campo] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
 
     def set_rol(self, rol):
         """Establece el rol del usuario en la asignación"""
-        if rol in ['programador', 'pruebas', 'infra']:
-            self.rol = rol
+        if rol in ROLES:
+            self.rol = _intern(rol)
             return True
         return False
 
@@ -25,4 +79,4 @@ class Asignacion:
             "estado": self.estado,
             "rol": self.rol,
             "fecha_asignacion": self.fecha_asignacion
-        }
\ No newline at end of file
+        }
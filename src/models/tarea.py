@@ -1,29 +1,77 @@
+import sys
+
+from models import AUSENTE
+from models.asignacion import Asignacion
+
+
 class Tarea:
+    # Representación en memoria de DataHandler: slots en lugar de __dict__ y
+    # tuplas para usuarios y dependencias, que casi nunca cambian.
+    __slots__ = ('id', 'title', 'description', 'status', 'users', 'dependencies', 'extra')
+    _CAMPOS = ('id', 'title', 'description', 'status', 'users', 'dependencies')
+
     def __init__(self, id, title, description, status='pending'):
         self.id = id
         self.title = title
         self.description = description
-        self.status = status
-        self.users = []
-        self.dependencies = [] # Lista de IDs de tareas dependientes
+        self.status = sys.intern(status)
+        self.users = ()
+        self.dependencies = () # IDs de tareas dependientes
+        self.extra = None
+
+    @classmethod
+    def from_dict(cls, data):
+        tarea = cls.__new__(cls)
+        tarea.id = data['id']
+        tarea.title = data.get('title', AUSENTE)
+        tarea.description = data.get('description', AUSENTE)
+        status = data.get('status', AUSENTE)
+        tarea.status = sys.intern(status) if type(status) is str else status
+        users = []
+        for user in data.get('users', ()):
+            asignacion = Asignacion.from_dict(user)
+            # Reutilizar el mismo str del id en lugar de una copia por asignación
+            if asignacion.task_id == tarea.id:
+                asignacion.task_id = tarea.id
+            users.append(asignacion)
+        tarea.users = tuple(users)
+        tarea.dependencies = tuple(data.get('dependencies', ()))
+        extra = {k: v for k, v in data.items() if k not in cls._CAMPOS}
+        tarea.extra = extra or None
+        return tarea
+
+    def to_dict(self):
+        data = {'id': self.id}
+        for campo in ('title', 'description', 'status'):
+            value = getattr(self, campo)
+            if value is not AUSENTE:
+                data[campo] = value
+        data['users'] = [u.to_dict() for u in self.users]
+        data['dependencies'] = list(self.dependencies)
+        if self.extra:
+            data.update(self.extra)
+        return data
 
     def mark_complete(self):
         self.status = 'completed'
 
     def update_status(self, new_status):
-        self.status = new_status
+        self.status = sys.intern(new_status)
         return True
 
+    def has_user(self, usuario, rol):
+        return any(u.usuario == usuario and u.rol == rol for u in self.users)
+
     def add_user(self, usuario, rol):
-        self.users.append({"usuario": usuario, "rol": rol})
+        self.users += (Asignacion.simple(usuario, rol),)
 
     def remove_user(self, usuario, rol):
-        self.users = [u for u in self.users if not (u["usuario"] == usuario and u["rol"] == rol)]
+        self.users = tuple(u for u in self.users if not (u.usuario == usuario and u.rol == rol))
 
     def add_dependency(self, task_id):
         if task_id not in self.dependencies:
-            self.dependencies.append(task_id)
+            self.dependencies += (task_id,)
 
     def remove_dependency(self, task_id):
         if task_id in self.dependencies:
-            self.dependencies.remove(task_id)
\ No newline at end of file
+            self.dependencies = tuple(d for d in self.dependencies if d != task_id)
@@ -1,10 +1,35 @@
+from models import AUSENTE
+
+
 class Usuario:
+    __slots__ = ('id', 'name', 'email', 'contactos', 'tareas', 'extra')
+    _CAMPOS = ('id', 'name', 'email', 'contactos', 'tareas')
+
     def __init__(self, user_id, name, email):
         self.id = user_id
         self.name = name
         self.email = email
         self.contactos = []
         self.tareas = []
+        self.extra = None
+
+    @classmethod
+    def from_dict(cls, data):
+        usuario = cls.__new__(cls)
+        usuario.id = data['id']
+        usuario.name = data.get('name', AUSENTE)
+        usuario.email = data.get('email', AUSENTE)
+        usuario.contactos = data.get('contactos', AUSENTE)
+        usuario.tareas = data.get('tareas', AUSENTE)
+        extra = {k: v for k, v in data.items() if k not in cls._CAMPOS}
+        usuario.extra = extra or None
+        return usuario
+
+    def to_dict(self):
+        data = {k: v for k, v in self.get_user_info().items() if v is not AUSENTE}
+        if self.extra:
+            data.update(self.extra)
+        return data
 
     def add_contacto(self, contacto):
         if contacto not in self.contactos:
@@ -17,4 +42,4 @@ class Usuario:
             "email": self.email,
             "contactos": self.contactos,
             "tareas": self.tareas
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,50 @@
+"""
+Cambia la cantidad de shards de un directorio del backend sharded.
+
+Lee cada shard existente (con su journal), escribe una generación nueva con
+la cantidad pedida y recién entonces cambia el manifiesto; si se interrumpe,
+la generación anterior sigue siendo la vigente. Con la aplicación corriendo
+sobre el mismo directorio hay que usar ``POST /shards``, que hace lo mismo
+dentro del proceso sin frenar las peticiones.
+
+Uso:
+    python src/reshard.py data.shards 16
+"""
+import argparse
+import os
+import sys
+
+from storage import ShardedStorage
+
+
+def reshard(directory, shards):
+    # Con journal para incluir los cambios que todavía no se compactaron
+    storage = ShardedStorage(directory, journal=True)
+    try:
+        storage.load()
+        previous = storage.shards
+        storage.reshard(shards)
+    finally:
+        storage.close()
+    return previous, storage.shards
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('directory', help='directorio con manifest.json')
+    parser.add_argument('shards', type=int, help='cantidad de shards nueva')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(os.path.join(args.directory, 'manifest.json')):
+        print("%s no es un directorio de shards" % args.directory, file=sys.stderr)
+        return 1
+    if args.shards < 1:
+        print("La cantidad de shards debe ser positiva", file=sys.stderr)
+        return 1
+    previous, shards = reshard(args.directory, args.shards)
+    print("%s: %d shards -> %d" % (args.directory, previous, shards))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import heapq
+
+# Duración de una tarea sin estimación, en las mismas unidades que "duracion"
+DURACION_POR_DEFECTO = 1
+
+
+def duration_of(task, default=DURACION_POR_DEFECTO):
+    """Estimación de la tarea (campo "duracion"), o ``default`` si no tiene una válida."""
+    value = task.extra.get('duracion') if task.extra else None
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0:
+        return value
+    return default
+
+
+class Schedule:
+    """
+    Plan de las tareas sobre el grafo de dependencias, mantenido de forma
+    incremental.
+
+    Cada tarea empieza cuando terminan todas sus dependencias (``start``) y
+    termina después de su duración (``finish``); las tareas terminadas
+    duran 0, así que solo cuenta el trabajo pendiente. ``critical`` guarda
+    la dependencia que define el inicio de cada tarea: seguirla hacia atrás
+    da el camino crítico.
+
+    Un cambio se propaga en el orden topológico que ya mantiene
+    ``DependencyGraph`` (``graph.ord``) y solo sigue hacia los dependientes
+    de las tareas cuyo fin cambió, así que cada tarea afectada se recalcula
+    una vez y el resto del grafo no se toca.
+
+    También lleva la carga pendiente de cada alias asignado: cantidad de
+    tareas sin terminar y suma de sus duraciones.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.duration = {}      # tarea -> duración estimada
+        self.start = {}
+        self.finish = {}
+        self.critical = {}      # tarea -> dependencia que define su inicio
+        self.load = {}          # alias -> [tareas sin terminar, duración pendiente]
+        self.recomputed = 0     # tareas recalculadas por la última actualización
+        self._aliases = {}
+        self._contribution = {} # tarea -> (1 si está sin terminar, duración pendiente)
+        self._end = None        # (fin, tarea) del plan; None si hay que buscarlo
+
+    def __contains__(self, task_id):
+        return task_id in self.finish
+
+    # ---------- construcción ----------
+
+    def load_tasks(self, tasks):
+        """
+        Arma el plan desde cero en O(V + E). ``tasks`` es un iterable de
+        ``(task_id, duración, alias)`` de tareas que ya están en el grafo.
+        """
+        self.__init__(self.graph)
+        for task_id, duration, aliases in tasks:
+            self.duration[task_id] = duration
+            self._assign(task_id, aliases)
+        for task_id in self.graph.topological_order():
+            if task_id in self.duration:
+                self._compute(task_id)
+        self.recomputed = len(self.finish)
+
+    def update(self, task_id, duration, aliases):
+        """
+        Registra la duración y los alias de la tarea, que ya debe tener en
+        el grafo sus dependencias y su estado actuales, y propaga el cambio.
+        """
+        self.duration[task_id] = duration
+        self._assign(task_id, aliases)
+        self._propagate((task_id,))
+
+    def remove(self, task_id, dependents):
+        """
+        Quita la tarea, ya borrada del grafo; ``dependents`` son las tareas
+        que dependían de ella, que pueden empezar antes.
+        """
+        self._assign(task_id, ())
+        self._contribution.pop(task_id, None)
+        self.duration.pop(task_id, None)
+        self.start.pop(task_id, None)
+        self.finish.pop(task_id, None)
+        self.critical.pop(task_id, None)
+        if self._end is not None and self._end[1] == task_id:
+            self._end = None
+        self._propagate(dependents)
+
+    # ---------- consultas ----------
+
+    def end(self):
+        """``(fin, tarea)`` de la tarea que termina más tarde, o None sin tareas."""
+        if self._end is None and self.finish:
+            self._end = max((finish, task_id) for task_id, finish in self.finish.items())
+        return self._end
+
+    def critical_path(self, task_id):
+        """Tareas que determinan el fin de ``task_id``, desde la primera hasta ella."""
+        path = []
+        while task_id is not None:
+            path.append(task_id)
+            task_id = self.critical.get(task_id)
+        path.reverse()
+        return path
+
+    # ---------- internos ----------
+
+    def _propagate(self, task_ids):
+        graph = self.graph
+        heap = [(graph.ord[t], t) for t in task_ids if t in self.duration]
+        heapq.heapify(heap)
+        queued = {t for _, t in heap}
+        self.recomputed = 0
+        while heap:
+            _, task_id = heapq.heappop(heap)
+            self.recomputed += 1
+            if not self._compute(task_id):
+                continue
+            for dependent in graph.dependents[task_id]:
+                if dependent not in queued and dependent in self.duration:
+                    queued.add(dependent)
+                    heapq.heappush(heap, (graph.ord[dependent], dependent))
+
+    def _compute(self, task_id):
+        """Recalcula inicio y fin de la tarea; retorna True si su fin cambió."""
+        start, critical = 0, None
+        finish = self.finish
+        for dep_id in self.graph.deps[task_id]:
+            dep_finish = finish.get(dep_id)
+            # Las dependencias que ya no demoran (fin 0) no entran en el camino;
+            # los empates van al menor id para que el camino no dependa del hash
+            if dep_finish and (dep_finish > start or (
+                    dep_finish == start and dep_id < critical)):
+                start, critical = dep_finish, dep_id
+        if task_id in self.graph.finished:
+            duration = 0
+            self._contribute(task_id, (0, 0))
+        else:
+            duration = self.duration[task_id]
+            self._contribute(task_id, (1, duration))
+        self.start[task_id] = start
+        self.critical[task_id] = critical
+        previous = finish.get(task_id)
+        finish[task_id] = start + duration
+        if previous == finish[task_id]:
+            return False
+        end = self._end
+        if end is not None:
+            if (finish[task_id], task_id) > end:
+                self._end = (finish[task_id], task_id)
+            elif end[1] == task_id:
+                # La que terminaba última terminó antes: buscar de nuevo al consultar
+                self._end = None
+        return True
+
+    def _assign(self, task_id, aliases):
+        contribution = self._contribution.get(task_id)
+        old = self._aliases.pop(task_id, ())
+        if aliases:
+            self._aliases[task_id] = aliases
+        if contribution is not None and old != aliases:
+            self._add_load(old, contribution, -1)
+            self._add_load(aliases, contribution, 1)
+
+    def _contribute(self, task_id, contribution):
+        """Cambia lo que la tarea suma a la carga de sus alias."""
+        previous = self._contribution.get(task_id)
+        if previous == contribution:
+            return
+        aliases = self._aliases.get(task_id, ())
+        if previous is not None:
+            self._add_load(aliases, previous, -1)
+        self._contribution[task_id] = contribution
+        self._add_load(aliases, contribution, 1)
+
+    def _add_load(self, aliases, contribution, sign):
+        count, duration = contribution
+        if not count:
+            return
+        for alias in aliases:
+            entry = self.load.setdefault(alias, [0, 0])
+            entry[0] += sign * count
+            entry[1] += sign * duration
+            if not entry[0]:
+                del self.load[alias]
@@ -0,0 +1,34 @@
+from .base import Storage, to_document
+from .json_storage import JsonStorage
+from .sharded_storage import ShardedStorage
+from .shared_storage import SharedJsonStorage
+from .snapshot_storage import SnapshotStorage
+from .sqlite_storage import SqliteStorage
+
+BACKENDS = ('json', 'sqlite', 'snapshot', 'sharded')
+
+
+def create_storage(backend, filename, journal=False, compact_bytes=4 * 1024 * 1024,
+                   shared=False, shards=8, durability='sync'):
+    """
+    Construye el storage configurado ('json', 'sqlite', 'snapshot' o
+    'sharded'). ``shared`` activa el modo multiproceso, que usa el journal de
+    json para propagar cambios. ``shards`` solo se usa al crear un directorio
+    'sharded' nuevo; uno existente conserva la cantidad de su manifiesto.
+    ``durability`` es el modo del DataHandler: con 'sync' SQLite sincroniza
+    cada commit; con 'group' y 'async' ya se acepta perder los últimos.
+    """
+    if shared:
+        if backend != 'json':
+            raise ValueError("El modo multiproceso solo está disponible con el backend json")
+        return SharedJsonStorage(filename, compact_bytes=compact_bytes)
+    if backend == 'json':
+        return JsonStorage(filename, journal=journal, compact_bytes=compact_bytes)
+    if backend == 'sqlite':
+        return SqliteStorage(filename,
+                             synchronous='FULL' if durability == 'sync' else 'NORMAL')
+    if backend == 'snapshot':
+        return SnapshotStorage(filename, compact_bytes=compact_bytes)
+    if backend == 'sharded':
+        return ShardedStorage(filename, shards=shards, journal=journal, compact_bytes=compact_bytes)
+    raise ValueError("Backend de almacenamiento no válido: %s" % backend)
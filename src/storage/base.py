@@ -0,0 +1,70 @@
+from abc import ABC, abstractmethod
+
+
+def to_document(record):
+    """
+    Convierte un modelo (Tarea, Usuario) a dict para persistirlo; los dicts
+    pasan tal cual. Sirve también como ``default`` de json.dumps.
+    """
+    if isinstance(record, dict):
+        return record
+    return record.to_dict()
+
+
+class Storage(ABC):
+    """
+    Interfaz de persistencia usada por DataHandler.
+
+    El DataHandler mantiene los datos e índices en memoria; el storage solo
+    los carga y persiste. ``load`` retorna dicts con el formato de data.json
+    y los cambios llegan como registros
+    ``{'op': 'put_task'|'put_user', 'id': ..., 'record': modelo}`` o
+    ``{'op': 'del_task'|'del_user', 'id': ...}``; ``to_document`` convierte
+    el modelo a dict.
+
+    ``snapshot`` es una función que retorna ``(tasks, users)`` completos. Se
+    llama solo cuando hace falta escribirlos todos, y en el momento en que se
+    escriben, para que la copia incluya todo lo que ya pasó por el journal.
+
+    Un storage con ``lazy = True`` también implementa ``open()``, que
+    retorna el snapshot sin decodificar y los registros del journal, y
+    ``recover(snapshot)``, que termina una compactación interrumpida.
+    """
+
+    lazy = False
+    # Contadores que lleva cada backend para las métricas
+    bytes_written = 0
+    compactions = 0
+
+    @abstractmethod
+    def load(self):
+        """Retorna la tupla ``(tasks, users)`` persistida."""
+
+    @abstractmethod
+    def save(self, changes, snapshot):
+        """
+        Persiste los cambios. Si ``changes`` es None no se sabe qué cambió y
+        se deben guardar completos los datos que retorna ``snapshot()``.
+        """
+
+    def iter_records(self):
+        """
+        Genera ``(tipo, registro)`` con tipo 'task' o 'user' y el registro
+        como dict, para recorrer lo persistido sin pasar por DataHandler.
+        Por defecto usa ``load``; los backends que pueden leer sus archivos de
+        a un registro lo redefinen para no cargarlos completos.
+        """
+        tasks, users = self.load()
+        for task in tasks:
+            yield 'task', task
+        for user in users:
+            yield 'user', user
+
+    def compact(self, snapshot):
+        """Reorganiza el almacenamiento; por defecto no hace nada."""
+
+    def close(self):
+        pass
+
+    def after_fork(self):
+        """Reabre en el proceso hijo lo que no debe compartir con el padre."""
@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+
+from .base import Storage, to_document
+from .journal import Journal
+from .snapshot import iter_json_arrays
+
+
+class JsonStorage(Storage):
+    """
+    Persistencia en un único archivo JSON.
+
+    Sin journal cada save reescribe el archivo completo a través de un
+    temporal y un rename atómico. Con journal los cambios se anexan a
+    ``<archivo>.journal`` y una compactación en segundo plano los pliega en
+    un snapshot nuevo cuando el log supera ``compact_bytes``.
+    """
+
+    def __init__(self, filename, journal=False, compact_bytes=4 * 1024 * 1024):
+        self.filename = filename
+        self.journal = Journal(filename + '.journal') if journal else None
+        self.compact_bytes = compact_bytes
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compacting = False
+        self._compaction = None
+
+    def load(self):
+        tasks, users = self._read()
+        if self.journal is not None:
+            self._replay(tasks, users, self.journal.replay())
+            if os.path.exists(self.journal.rotated_filename):
+                # Una compactación quedó a medias: terminarla ahora
+                self.compact(lambda: (tasks, users))
+        return tasks, users
+
+    def save(self, changes, snapshot):
+        if self.journal is None:
+            with self._lock:
+                self.bytes_written += self._write_snapshot(self._dumps(snapshot))
+            return
+        if changes is None:
+            # No se sabe qué cambió: plegar todo en un snapshot nuevo
+            self.compact(snapshot)
+            return
+
+        with self._lock:
+            self.bytes_written += self.journal.append(changes)
+            should_compact = (not self._compacting
+                              and self.journal.size() >= self.compact_bytes)
+            if should_compact:
+                self._compacting = True
+        if should_compact:
+            self._compaction = threading.Thread(target=self.compact, args=(snapshot,),
+                                                daemon=True)
+            self._compaction.start()
+
+    def iter_records(self):
+        """
+        Recorre el archivo de a un registro. El journal no supera
+        ``compact_bytes`` hasta la próxima compactación, así que su estado
+        final se arma en memoria: los registros que cambió se saltean en el
+        archivo y se generan al final, en el orden de su último cambio.
+
+        Solo lee: el journal no se repara, porque puede estar abierto por la
+        aplicación y una cola incompleta ser un registro que se está anexando.
+        """
+        changed = {}
+        if self.journal is not None:
+            for entry in self.journal.replay(repair=False):
+                key = (entry['op'][4:], entry['id'])
+                changed.pop(key, None)
+                changed[key] = entry.get('record')
+        for kind, record in self._iter_file():
+            if (kind, record['id']) not in changed:
+                yield kind, record
+        for (kind, _), record in changed.items():
+            if record is not None:
+                yield kind, record
+
+    def compact(self, snapshot):
+        """Pliega el journal en un snapshot nuevo del archivo JSON."""
+        if self.journal is None:
+            return
+        with self._compact_lock:
+            with self._lock:
+                self._compacting = True
+                data = self._dumps(snapshot)
+                self.journal.rotate()
+            try:
+                written = self._write_snapshot(data)
+                with self._lock:
+                    self.bytes_written += written
+                    self.compactions += 1
+                self._finish_rotation()
+            finally:
+                self._compacting = False
+
+    def close(self):
+        # Una compactación en segundo plano todavía usa el journal
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+        if self.journal is not None:
+            self.journal.close()
+
+    def after_fork(self):
+        # Los locks pudo tenerlos un hilo del padre, que no existe en el hijo
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compacting = False
+        self._compaction = None
+        if self.journal is not None:
+            # Se vuelve a abrir en el próximo append
+            self.journal.close()
+
+    def _finish_rotation(self):
+        """El snapshot ya incluye el log rotado: descartarlo."""
+        self.journal.discard_rotated()
+
+    def _read(self):
+        """Listas de tareas y usuarios del archivo, sin aplicar el journal."""
+        try:
+            with open(self.filename, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return [], []
+        return data.get('tasks', []), data.get('users', [])
+
+    def _iter_file(self):
+        """``(tipo, registro)`` del archivo sin aplicar el journal, sin cargarlo completo."""
+        try:
+            f = open(self.filename, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for key, record in iter_json_arrays(f):
+                if key in ('tasks', 'users'):
+                    yield key[:-1], record
+
+    @staticmethod
+    def _dumps(snapshot):
+        tasks, users = snapshot()
+        return json.dumps({'tasks': tasks, 'users': users}, default=to_document)
+
+    @staticmethod
+    def _replay(tasks, users, records):
+        positions = {
+            'task': (tasks, {t['id']: i for i, t in enumerate(tasks)}),
+            'user': (users, {u['id']: i for i, u in enumerate(users)}),
+        }
+        for entry in records:
+            action, _, kind = entry['op'].partition('_')
+            items, index = positions[kind]
+            if action == 'put':
+                record = entry['record']
+                position = index.get(record['id'])
+                if position is None:
+                    index[record['id']] = len(items)
+                    items.append(record)
+                else:
+                    items[position] = record
+            elif entry['id'] in index:
+                # Hueco en lugar de mover el último: se mantiene el orden de
+                # creación y task_seq queda igual que antes de reiniciar
+                items[index.pop(entry['id'])] = None
+        for items, index in positions.values():
+            if len(index) < len(items):
+                items[:] = [item for item in items if item is not None]
+
+    def _write_snapshot(self, snapshot):
+        """
+        Escribe a un temporal y lo renombra, para no dejar el archivo
+        truncado. Retorna los bytes escritos.
+        """
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'w') as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+            written = f.tell()
+        os.replace(tmp_filename, self.filename)
+        return written
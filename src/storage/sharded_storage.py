@@ -0,0 +1,324 @@
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+
+from .base import Storage, to_document
+from .json_storage import JsonStorage
+
+MANIFEST = 'manifest.json'
+SHARD_NAME = re.compile(r'shard-(\d+)-\d+\.json')
+
+
+def shard_of(record_id, shards):
+    """Shard de un id; crc32 y no hash() para que sea igual en todos los procesos."""
+    return zlib.crc32(record_id.encode('utf-8')) % shards
+
+
+def _record_id(record):
+    return record['id'] if isinstance(record, dict) else record.id
+
+
+class ShardFile(JsonStorage):
+    """
+    Un shard: JSON con las tareas y usuarios cuyo id cae en él, más su
+    journal. Junto a cada registro se guarda su secuencia global, el orden en
+    que se creó, para reconstruir el orden de todas las tareas al cargar.
+
+    Lo que se escribe se arma leyendo el propio shard del disco (``read``),
+    así que reescribir o compactar un shard nunca toca a los demás ni
+    necesita los datos en memoria del DataHandler.
+    """
+
+    def read(self, changes=()):
+        """
+        Retorna ``(tareas, usuarios)`` como listas de ``(registro, secuencia)``
+        ordenadas por secuencia, con el journal y ``changes`` aplicados.
+        """
+        try:
+            with open(self.filename, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        items = {}
+        for kind in ('task', 'user'):
+            records = data.get(kind + 's', [])
+            seqs = data.get(kind + '_seq', range(len(records)))
+            items[kind] = {record['id']: (record, seq) for record, seq in zip(records, seqs)}
+        records = self.journal.replay() if self.journal is not None else []
+        for entry in itertools.chain(records, changes):
+            action, _, kind = entry['op'].partition('_')
+            current = items[kind]
+            if action == 'put':
+                # Un registro que ya existía conserva su lugar en el orden
+                previous = current.get(entry['id'])
+                current[entry['id']] = (entry['record'],
+                                        previous[1] if previous is not None else entry['seq'])
+            else:
+                current.pop(entry['id'], None)
+        return (sorted(items['task'].values(), key=itemgetter(1)),
+                sorted(items['user'].values(), key=itemgetter(1)))
+
+    @staticmethod
+    def _dumps(snapshot):
+        tasks, users = snapshot()
+        return json.dumps({
+            'tasks': [record for record, _ in tasks],
+            'users': [record for record, _ in users],
+            'task_seq': [seq for _, seq in tasks],
+            'user_seq': [seq for _, seq in users],
+        }, default=to_document)
+
+    def remove(self):
+        """Cierra el shard y borra sus archivos."""
+        self.close()
+        for filename in (self.filename, self.filename + '.journal',
+                         self.filename + '.journal.old'):
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+
+
+def _read_shard(filename, journal):
+    # Corre en un proceso del pool: retorna listas planas, que se serializan
+    # más rápido que las tuplas
+    shard = ShardFile(filename, journal=journal)
+    try:
+        tasks, users = shard.read()
+    finally:
+        shard.close()
+    return ([record for record, _ in tasks], [seq for _, seq in tasks],
+            [record for record, _ in users], [seq for _, seq in users])
+
+
+class ShardedStorage(Storage):
+    """
+    Tareas y usuarios repartidos por crc32 del id en ``shards`` archivos
+    JSON dentro del directorio ``directory``.
+
+    Un save agrupa los cambios por shard y reescribe (o anexa al journal de)
+    solo los shards afectados. La carga lee los shards en paralelo con un
+    pool de ``workers`` procesos, si el proceso todavía no tiene otros hilos,
+    y los une en orden de creación.
+
+    ``manifest.json`` guarda la cantidad de shards y la generación actual;
+    los archivos de una generación se llaman ``shard-<gen>-<n>.json``.
+    ``reshard`` escribe una generación nueva mientras la aplicación sigue
+    atendiendo y cambia el manifiesto al final, así que una interrupción deja
+    la generación anterior intacta.
+    """
+
+    def __init__(self, directory, shards=8, journal=False, compact_bytes=4 * 1024 * 1024,
+                 workers=None):
+        if shards < 1:
+            raise ValueError("La cantidad de shards debe ser positiva")
+        self.directory = directory
+        self.shards = shards
+        self.generation = 0
+        self.journal = journal
+        self.compact_bytes = compact_bytes
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self._files = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._reshard_lock = threading.Lock()
+        # Cambios guardados mientras corre un reshard, para aplicarlos al final
+        self._buffer = None
+        # Contadores de los shards de generaciones anteriores
+        self._retired = [0, 0]
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def bytes_written(self):
+        return self._retired[0] + sum(shard.bytes_written for shard in self._files)
+
+    @property
+    def compactions(self):
+        return self._retired[1] + sum(shard.compactions for shard in self._files)
+
+    def load(self):
+        with self._lock:
+            self._read_manifest()
+            self._remove_stale()
+            for shard in self._files:
+                shard.close()
+            self._files = [self._shard(self.generation, i) for i in range(self.shards)]
+            parts = self._read_all([shard.filename for shard in self._files])
+            tasks, task_seq, users, user_seq = [], [], [], []
+            for part_tasks, part_task_seq, part_users, part_user_seq in parts:
+                tasks += part_tasks
+                task_seq += part_task_seq
+                users += part_users
+                user_seq += part_user_seq
+            self._seq = itertools.count(max(task_seq + user_seq, default=-1) + 1)
+            for shard in self._files:
+                if shard.journal is not None and os.path.exists(shard.journal.rotated_filename):
+                    # Una compactación quedó a medias: terminarla ahora
+                    shard.compact(shard.read)
+        order = sorted(range(len(tasks)), key=task_seq.__getitem__)
+        tasks = [tasks[i] for i in order]
+        order = sorted(range(len(users)), key=user_seq.__getitem__)
+        users = [users[i] for i in order]
+        return tasks, users
+
+    def save(self, changes, snapshot):
+        with self._lock:
+            if changes is None:
+                self._save_all(snapshot)
+                return
+            entries = []
+            for entry in changes:
+                entry = dict(entry)
+                if entry['op'].startswith('put'):
+                    # Solo cuenta si el registro es nuevo: uno existente conserva la suya
+                    entry['seq'] = next(self._seq)
+                entries.append(entry)
+            if self._buffer is not None:
+                self._buffer.extend(entries)
+            self._write_changes(entries)
+
+    def iter_records(self):
+        """
+        Recorre los shards de a uno, cada uno de a un registro: el orden es
+        por shard y no el de creación.
+        """
+        with self._lock:
+            self._read_manifest()
+            files = [self._shard(self.generation, i) for i in range(self.shards)]
+        for shard in files:
+            try:
+                yield from shard.iter_records()
+            finally:
+                shard.close()
+
+    def compact(self, snapshot):
+        """Pliega el journal de cada shard leyendo solo ese shard."""
+        for shard in self._files:
+            shard.compact(shard.read)
+
+    def reshard(self, shards):
+        """
+        Reparte los datos en ``shards`` archivos nuevos. Los saves siguen
+        llegando a los shards actuales mientras tanto y se vuelven a aplicar
+        sobre los nuevos antes de cambiar el manifiesto.
+        """
+        if shards < 1:
+            raise ValueError("La cantidad de shards debe ser positiva")
+        with self._reshard_lock:
+            with self._lock:
+                self._buffer = []
+                old = self._files
+                generation = self.generation + 1
+            files = [self._shard(generation, i) for i in range(shards)]
+            try:
+                parts = [([], []) for _ in range(shards)]
+                for shard in old:
+                    # Con el lock del shard para no leer un registro a medio anexar
+                    with shard._lock:
+                        tasks, users = shard.read()
+                    for kind, items in enumerate((tasks, users)):
+                        for record, seq in items:
+                            parts[shard_of(record['id'], shards)][kind].append((record, seq))
+                    del tasks, users
+                for shard, (tasks, users) in zip(files, parts):
+                    tasks.sort(key=itemgetter(1))
+                    users.sort(key=itemgetter(1))
+                    shard.bytes_written += shard._write_snapshot(
+                        shard._dumps(lambda: (tasks, users)))
+                del parts
+                with self._lock:
+                    buffered, self._buffer = self._buffer, None
+                    self._files, self.shards, self.generation = files, shards, generation
+                    self._write_changes(buffered)
+                    self._write_manifest()
+            except BaseException:
+                with self._lock:
+                    self._buffer = None
+                    self._files, self.shards, self.generation = old, len(old), generation - 1
+                for shard in files:
+                    shard.remove()
+                raise
+        for shard in old:
+            shard.remove()
+            self._retired[0] += shard.bytes_written
+            self._retired[1] += shard.compactions
+
+    def close(self):
+        for shard in self._files:
+            shard.close()
+
+    def after_fork(self):
+        self._lock = threading.Lock()
+        self._reshard_lock = threading.Lock()
+        for shard in self._files:
+            shard.after_fork()
+
+    def _shard(self, generation, index):
+        filename = os.path.join(self.directory, 'shard-%d-%03d.json' % (generation, index))
+        return ShardFile(filename, journal=self.journal, compact_bytes=self.compact_bytes)
+
+    def _read_all(self, filenames):
+        workers = min(self.workers, len(filenames))
+        # fork evita reimportar la aplicación en cada proceso del pool, pero
+        # solo es seguro sin otros hilos: un lock que otro hilo tenga tomado
+        # queda tomado para siempre en el hijo. Fuera de la carga inicial (un
+        # espacio de trabajo en un servidor con hilos) se lee en serie
+        fork = 'fork' in multiprocessing.get_all_start_methods()
+        if workers <= 1 or (fork and threading.active_count() > 1):
+            return [_read_shard(filename, self.journal) for filename in filenames]
+        context = multiprocessing.get_context('fork' if fork else None)
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            return list(pool.map(_read_shard, filenames, itertools.repeat(self.journal)))
+
+    def _save_all(self, snapshot):
+        # No se sabe qué cambió: reescribir todos los shards en el orden actual
+        tasks, users = snapshot()
+        parts = [([], []) for _ in range(self.shards)]
+        for kind, items in enumerate((tasks, users)):
+            for record in items:
+                parts[shard_of(_record_id(record), self.shards)][kind].append(
+                    (record, next(self._seq)))
+        for shard, part in zip(self._files, parts):
+            shard.save(None, lambda part=part: part)
+
+    def _write_changes(self, entries):
+        groups = {}
+        for entry in entries:
+            groups.setdefault(shard_of(entry['id'], self.shards), []).append(entry)
+        for index, group in sorted(groups.items()):
+            shard = self._files[index]
+            if shard.journal is not None:
+                shard.save(group, shard.read)
+            else:
+                shard.save(group, lambda shard=shard, group=group: shard.read(group))
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST), 'r') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            self._write_manifest()
+            return
+        self.shards = manifest['shards']
+        self.generation = manifest['generation']
+
+    def _write_manifest(self):
+        filename = os.path.join(self.directory, MANIFEST)
+        with open(filename + '.tmp', 'w') as f:
+            json.dump({'shards': self.shards, 'generation': self.generation}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(filename + '.tmp', filename)
+
+    def _remove_stale(self):
+        """Borra los shards de un reshard interrumpido o ya reemplazados."""
+        for name in os.listdir(self.directory):
+            match = SHARD_NAME.match(name)
+            if match and int(match.group(1)) != self.generation:
+                os.remove(os.path.join(self.directory, name))
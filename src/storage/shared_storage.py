@@ -0,0 +1,160 @@
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .journal import Journal
+from .json_storage import JsonStorage
+
+HEADER = struct.Struct('<QQ')
+
+
+class SharedJsonStorage(JsonStorage):
+    """
+    Archivo JSON con journal compartido por varios procesos.
+
+    Las escrituras se coordinan con un ``flock`` sobre ``<archivo>.lock``.
+    Cada proceso recuerda hasta qué generación y offset del journal aplicó;
+    ``<archivo>.gen`` publica, mapeado en memoria, la generación y el tamaño
+    del journal tras la última escritura, así que detectar cambios externos
+    es comparar 16 bytes sin llamadas al sistema. Los cambios se leen desde
+    el offset propio (``read_delta``) y se aplican sin recargar todo.
+
+    Cada compactación incrementa la generación y conserva el log anterior en
+    ``<archivo>.journal.prev``, para que un proceso una generación atrás
+    pueda terminar de leerlo. Uno más atrasado debe recargar.
+    """
+
+    def __init__(self, filename, compact_bytes=4 * 1024 * 1024):
+        if fcntl is None:
+            raise ValueError("El modo multiproceso requiere fcntl (sistemas POSIX)")
+        super().__init__(filename, journal=True, compact_bytes=compact_bytes)
+        self.generation = 0
+        self.offset = 0
+        # Lo llama compact() con el lock tomado, antes de tomar el snapshot
+        self.on_compact = None
+        self._loading = False
+        self._lockfile = open(filename + '.lock', 'a+b')
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        with self.locked():
+            with open(filename + '.gen', 'a+b') as f:
+                if os.fstat(f.fileno()).st_size < HEADER.size:
+                    f.truncate(0)
+                    f.write(HEADER.pack(0, 0))
+                    f.flush()
+                self._header = mmap.mmap(f.fileno(), HEADER.size)
+
+    @property
+    def previous_filename(self):
+        return self.journal.filename + '.prev'
+
+    @contextmanager
+    def locked(self):
+        """Lock exclusivo entre procesos (y entre hilos del proceso); reentrante."""
+        with self._thread_lock:
+            if not self._depth:
+                fcntl.flock(self._lockfile.fileno(), fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    fcntl.flock(self._lockfile.fileno(), fcntl.LOCK_UN)
+
+    def published(self):
+        return HEADER.unpack(self._header[:HEADER.size])
+
+    def changed(self):
+        """True si otro proceso escribió desde lo último aplicado; no toma locks."""
+        return self.published() != (self.generation, self.offset)
+
+    def load(self):
+        with self.locked():
+            # Otro proceso pudo haber rotado el log que este tenía abierto
+            self.journal.close()
+            self._loading = True
+            try:
+                tasks, users = super().load()
+            finally:
+                self._loading = False
+            self.generation = self.published()[0]
+            self.offset = self._journal_size()
+            self._publish()
+        return tasks, users
+
+    def read_delta(self):
+        """
+        Registros escritos por otros procesos desde lo último aplicado, o None
+        si el proceso quedó más de una generación atrás. Requiere ``locked()``.
+        """
+        generation = self.published()[0]
+        if generation == self.generation:
+            records, self.offset = Journal.read_from(self.journal.filename, self.offset, repair=True)
+            return records
+        if generation != self.generation + 1:
+            return None
+        previous = self.previous_filename
+        if os.path.exists(self.journal.rotated_filename):
+            previous = self.journal.rotated_filename
+        if not os.path.exists(previous):
+            return None
+        records, _ = Journal.read_from(previous, self.offset)
+        current, self.offset = Journal.read_from(self.journal.filename, 0, repair=True)
+        # El log que tenía abierto ya fue rotado: reabrir por nombre
+        self.journal.close()
+        self.generation = generation
+        return records + current
+
+    def save(self, changes, snapshot):
+        with self.locked():
+            super().save(changes, snapshot)
+            self.offset = self._journal_size()
+            self._publish()
+
+    def compact(self, snapshot):
+        with self.locked():
+            # Al cargar, el snapshot ya viene completo del disco
+            if self.on_compact is not None and not self._loading:
+                self.on_compact()
+            super().compact(snapshot)
+            self.generation = self.published()[0] + 1
+            self.offset = self._journal_size()
+            self._publish()
+
+    def close(self):
+        super().close()
+        self._header.close()
+        self._lockfile.close()
+
+    def after_fork(self):
+        super().after_fork()
+        # flock es por descripción de archivo abierto: con la heredada, el
+        # lock del padre y el del hijo serían el mismo
+        self._lockfile.close()
+        self._lockfile = open(self.filename + '.lock', 'a+b')
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+
+    def _finish_rotation(self):
+        if os.path.exists(self.journal.rotated_filename):
+            os.replace(self.journal.rotated_filename, self.previous_filename)
+        else:
+            # El journal estaba vacío: el anterior tampoco tiene nada que leer
+            open(self.previous_filename, 'wb').close()
+
+    def _journal_size(self):
+        try:
+            return os.path.getsize(self.journal.filename)
+        except FileNotFoundError:
+            return 0
+
+    def _publish(self):
+        self._header[:HEADER.size] = HEADER.pack(self.generation, self.offset)
@@ -0,0 +1,347 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from collections import namedtuple
+
+from .base import to_document
+from .journal import Journal
+
+MAGIC = b'TSNP'
+VERSION = 1
+
+# magic, versión, cantidad de tareas y usuarios, offsets de las dos tablas y
+# offset y largo del bloque de claves de índice
+HEADER = struct.Struct('<4sIQQQQQQ')
+# Por registro, en orden de archivo: offset y largo del JSON, del id y de la
+# fila de índice (solo tareas)
+ENTRY = struct.Struct('<QIQIQI')
+POSITION = struct.Struct('<I')
+
+# Lo mínimo de una tarea para armar los índices sin decodificar el registro
+IndexRow = namedtuple('IndexRow', 'id status users dependencies')
+IndexUser = namedtuple('IndexUser', 'usuario rol')
+
+# Registro copiado tal cual desde otro snapshot, sin decodificar
+RawRecord = namedtuple('RawRecord', 'id data key')
+
+
+class Section:
+    """
+    Tareas o usuarios de un snapshot. Los registros se leen del mmap solo
+    cuando se piden; ``position`` busca un id en la tabla ordenada.
+    """
+
+    def __init__(self, buffer, count, table):
+        self._buffer = buffer
+        self._count = count
+        self._entries = table
+        self._sorted = table + count * ENTRY.size
+
+    def __len__(self):
+        return self._count
+
+    def _entry(self, i):
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return ENTRY.unpack_from(self._buffer, self._entries + i * ENTRY.size)
+
+    def id_at(self, i):
+        _, _, id_off, id_len, _, _ = self._entry(i)
+        return self._buffer[id_off:id_off + id_len].decode('utf-8')
+
+    def record_at(self, i):
+        """Registro en la posición ``i`` como dict."""
+        rec_off, rec_len, _, _, _, _ = self._entry(i)
+        return json.loads(self._buffer[rec_off:rec_off + rec_len])
+
+    def raw_at(self, i):
+        rec_off, rec_len, id_off, id_len, key_off, key_len = self._entry(i)
+        buffer = self._buffer
+        return RawRecord(buffer[id_off:id_off + id_len].decode('utf-8'),
+                         buffer[rec_off:rec_off + rec_len],
+                         buffer[key_off:key_off + key_len] if key_len else None)
+
+    def position(self, record_id):
+        """Posición del id en la sección; KeyError si no está."""
+        key = record_id.encode('utf-8')
+        buffer = self._buffer
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i, = POSITION.unpack_from(buffer, self._sorted + mid * POSITION.size)
+            _, _, id_off, id_len, _, _ = self._entry(i)
+            current = buffer[id_off:id_off + id_len]
+            if current == key:
+                return i
+            if current < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        raise KeyError(record_id)
+
+
+class Snapshot:
+    """
+    Snapshot binario de solo lectura, mapeado en memoria.
+
+    Abrirlo solo lee el encabezado, así que cuesta lo mismo con mil o con un
+    millón de tareas. Cada registro es el JSON del formato de data.json y se
+    ubica por posición (orden original) o por id, con una tabla ordenada que
+    se recorre con búsqueda binaria sobre el mmap.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._buffer) < HEADER.size:
+            raise ValueError("Snapshot truncado: %s" % filename)
+        (magic, version, n_tasks, n_users, tasks_table, users_table,
+         self._keys_off, self._keys_len) = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s no es un snapshot de versión %d" % (filename, VERSION))
+        self.tasks = Section(self._buffer, n_tasks, tasks_table)
+        self.users = Section(self._buffer, n_users, users_table)
+
+    def task_rows(self):
+        """Filas de índice de todas las tareas, en orden de posición."""
+        rows = json.loads(self._buffer[self._keys_off:self._keys_off + self._keys_len])
+        intern = sys.intern
+        return [IndexRow(task_id, intern(status) if status is not None else None,
+                         tuple(IndexUser(intern(u) if u is not None else None,
+                                         intern(r) if r is not None else None)
+                               for u, r in users),
+                         tuple(deps))
+                for task_id, status, users, deps in rows]
+
+    def close(self):
+        self._buffer.close()
+
+
+def _index_row(document):
+    return [document['id'], document.get('status'),
+            [[u.get('usuario'), u.get('rol')] for u in document.get('users', ())],
+            document.get('dependencies', [])]
+
+
+def _encode(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class SnapshotWriter:
+    """
+    Escribe un snapshot registro a registro, sin tener todos en memoria: solo
+    se guardan los offsets y las filas de índice hasta ``close``. Escribe a
+    un temporal y lo renombra al cerrar, igual que los snapshots JSON.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._tmp_filename = filename + '.tmp'
+        self._file = open(self._tmp_filename, 'wb')
+        self._file.write(b'\0' * HEADER.size)
+        self._offset = HEADER.size
+        self._tasks = []
+        self._users = []
+        self._keys = []
+
+    def add_task(self, record):
+        """Agrega una tarea: dict, modelo o RawRecord de otro snapshot."""
+        if isinstance(record, RawRecord):
+            record_id, data, key = record
+        else:
+            document = to_document(record)
+            record_id, data, key = document['id'], _encode(document), _encode(_index_row(document))
+        self._tasks.append((record_id.encode('utf-8'), self._write(data), len(data)))
+        self._keys.append(key)
+
+    def add_user(self, record):
+        if isinstance(record, RawRecord):
+            record_id, data = record.id, record.data
+        else:
+            document = to_document(record)
+            record_id, data = document['id'], _encode(document)
+        self._users.append((record_id.encode('utf-8'), self._write(data), len(data)))
+
+    def _write(self, data):
+        offset = self._offset
+        self._file.write(data)
+        self._offset += len(data)
+        return offset
+
+    def _write_table(self, records, keys):
+        # Los ids van juntos después de los registros, luego la tabla y las
+        # posiciones ordenadas por id para la búsqueda binaria
+        id_offsets = [self._write(record_id) for record_id, _, _ in records]
+        table = self._offset
+        entries = []
+        for i, (record_id, rec_off, rec_len) in enumerate(records):
+            key_off, key_len = keys[i] if keys else (0, 0)
+            entries.append(ENTRY.pack(rec_off, rec_len, id_offsets[i], len(record_id),
+                                      key_off, key_len))
+        self._write(b''.join(entries))
+        order = sorted(range(len(records)), key=lambda i: records[i][0])
+        self._write(b''.join(POSITION.pack(i) for i in order))
+        return table
+
+    def close(self):
+        # Las filas de índice forman un único arreglo JSON para leerlas de una vez
+        keys_off = self._write(b'[')
+        key_positions = []
+        for i, key in enumerate(self._keys):
+            if i:
+                self._write(b',')
+            key_positions.append((self._write(key), len(key)))
+        self._write(b']')
+        keys_len = self._offset - keys_off
+        tasks_table = self._write_table(self._tasks, key_positions)
+        users_table = self._write_table(self._users, None)
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, len(self._tasks), len(self._users),
+                                     tasks_table, users_table, keys_off, keys_len))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_filename, self.filename)
+        return self._offset
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tmp_filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _entries(items):
+    # Las listas diferidas dan los registros no tocados sin decodificarlos
+    entries = getattr(items, 'entries', None)
+    return entries() if entries is not None else items
+
+
+def write_snapshot(filename, tasks, users):
+    """
+    Escribe ``tasks`` y ``users`` (dicts, modelos o RawRecord) como snapshot
+    y retorna su tamaño en bytes.
+    """
+    writer = SnapshotWriter(filename)
+    try:
+        for task in _entries(tasks):
+            writer.add_task(task)
+        for user in _entries(users):
+            writer.add_user(user)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.close()
+
+
+def iter_json_arrays(f, chunk_size=1 << 20):
+    """
+    Recorre un documento ``{"clave": [objeto, ...], ...}`` leyéndolo por
+    bloques y genera ``(clave, objeto)`` de a uno, sin cargar el archivo
+    completo. Los valores que no son listas se saltean.
+    """
+    decoder = json.JSONDecoder()
+    state = {'buffer': '', 'eof': False}
+
+    def fill():
+        data = f.read(chunk_size)
+        if not data:
+            state['eof'] = True
+        state['buffer'] += data
+        return bool(data)
+
+    def skip(pos):
+        while True:
+            buffer = state['buffer']
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return pos
+
+    def expect(pos, chars):
+        pos = skip(pos)
+        if pos >= len(state['buffer']) or state['buffer'][pos] not in chars:
+            raise ValueError("JSON inválido: se esperaba %r en la posición %d" % (chars, pos))
+        return pos + 1, state['buffer'][pos]
+
+    def decode(pos):
+        pos = skip(pos)
+        while True:
+            try:
+                value, end = decoder.raw_decode(state['buffer'], pos)
+            except json.JSONDecodeError:
+                if state['eof'] or not fill():
+                    raise
+                continue
+            # Un número al final del bloque podría seguir en el próximo
+            if end == len(state['buffer']) and not state['eof'] and fill():
+                continue
+            return value, end
+
+    def compact(pos):
+        if pos > chunk_size:
+            state['buffer'] = state['buffer'][pos:]
+            return 0
+        return pos
+
+    fill()
+    pos, _ = expect(0, '{')
+    pos = skip(pos)
+    if state['buffer'][pos:pos + 1] == '}':
+        return
+    while True:
+        key, pos = decode(pos)
+        pos, _ = expect(pos, ':')
+        pos = skip(pos)
+        if state['buffer'][pos:pos + 1] == '[':
+            pos = skip(pos + 1)
+            if state['buffer'][pos:pos + 1] == ']':
+                pos += 1
+            else:
+                while True:
+                    value, pos = decode(pos)
+                    yield key, value
+                    pos, sep = expect(pos, ',]')
+                    pos = compact(pos)
+                    if sep == ']':
+                        break
+        else:
+            _, pos = decode(pos)
+        pos, sep = expect(pos, ',}')
+        if sep == '}':
+            return
+
+
+def convert_json(source, target, chunk_size=1 << 20):
+    """
+    Convierte un data.json en snapshot leyendo de a un registro. El journal
+    del JSON, si existe, se copia como journal del snapshot: el formato de
+    sus registros es el mismo. Retorna ``(tareas, usuarios)`` convertidos.
+    """
+    tasks = users = 0
+    with open(source, 'r', encoding='utf-8') as f, SnapshotWriter(target) as writer:
+        for key, record in iter_json_arrays(f, chunk_size):
+            if key == 'tasks':
+                writer.add_task(record)
+                tasks += 1
+            elif key == 'users':
+                writer.add_user(record)
+                users += 1
+
+    # Un journal previo del destino correspondía a otro snapshot
+    journal = Journal(target + '.journal')
+    journal.rotate()
+    journal.discard_rotated()
+    journal.append(Journal(source + '.journal').replay(repair=False))
+    journal.close()
+    return tasks, users
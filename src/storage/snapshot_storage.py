@@ -0,0 +1,61 @@
+import os
+
+from .json_storage import JsonStorage
+from .snapshot import Snapshot, write_snapshot
+
+
+class SnapshotStorage(JsonStorage):
+    """
+    Snapshot binario (ver ``snapshot.Snapshot``) más journal.
+
+    Los cambios se anexan al journal como con JSON, y la compactación
+    reescribe el snapshot copiando los bytes de los registros que no se
+    tocaron. ``open`` mapea el archivo sin decodificar nada, para que
+    DataHandler arranque en tiempo constante y lea cada registro al usarlo.
+    """
+
+    lazy = True
+
+    def __init__(self, filename, compact_bytes=4 * 1024 * 1024):
+        super().__init__(filename, journal=True, compact_bytes=compact_bytes)
+
+    def open(self):
+        """Retorna ``(snapshot, registros del journal)`` sin decodificar el snapshot."""
+        if not os.path.exists(self.filename):
+            write_snapshot(self.filename, (), ())
+        return Snapshot(self.filename), self.journal.replay()
+
+    def recover(self, snapshot):
+        if os.path.exists(self.journal.rotated_filename):
+            # Una compactación quedó a medias: terminarla ahora
+            self.compact(snapshot)
+
+    def _read(self):
+        if not os.path.exists(self.filename):
+            return [], []
+        snapshot = Snapshot(self.filename)
+        try:
+            return ([snapshot.tasks.record_at(i) for i in range(len(snapshot.tasks))],
+                    [snapshot.users.record_at(i) for i in range(len(snapshot.users))])
+        finally:
+            snapshot.close()
+
+    def _iter_file(self):
+        if not os.path.exists(self.filename):
+            return
+        snapshot = Snapshot(self.filename)
+        try:
+            for kind, section in (('task', snapshot.tasks), ('user', snapshot.users)):
+                for i in range(len(section)):
+                    yield kind, section.record_at(i)
+        finally:
+            snapshot.close()
+
+    @staticmethod
+    def _dumps(snapshot):
+        # Las copias diferidas se escriben después, fuera del lock
+        return snapshot()
+
+    def _write_snapshot(self, snapshot):
+        tasks, users = snapshot
+        return write_snapshot(self.filename, tasks, users)
@@ -0,0 +1,192 @@
+import json
+import sqlite3
+import threading
+
+from .base import Storage, to_document
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    status TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status);
+
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    doc TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS assignments (
+    task_id TEXT NOT NULL REFERENCES tasks (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    usuario TEXT NOT NULL,
+    rol TEXT,
+    attrs TEXT,
+    PRIMARY KEY (task_id, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_assignments_usuario ON assignments (usuario, rol);
+CREATE INDEX IF NOT EXISTS idx_assignments_rol ON assignments (rol);
+
+CREATE TABLE IF NOT EXISTS dependencies (
+    task_id TEXT NOT NULL REFERENCES tasks (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    depends_on TEXT NOT NULL,
+    PRIMARY KEY (task_id, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_dependencies_depends_on ON dependencies (depends_on);
+"""
+
+
+class SqliteStorage(Storage):
+    """
+    Persistencia en SQLite en modo WAL.
+
+    Cada tarea ocupa una fila en ``tasks`` y sus asignaciones (Asignacion) y
+    dependencias van en tablas propias, de modo que un cambio solo reescribe
+    las filas de la tarea afectada. El documento original de cada registro se
+    guarda en ``doc``/``attrs`` para devolverlo sin cambios.
+
+    ``synchronous`` es el PRAGMA del mismo nombre. Con 'FULL' cada commit se
+    sincroniza a disco antes de retornar. Con 'NORMAL', en modo WAL, se
+    sincroniza solo en los checkpoints: un corte de luz puede perder los
+    últimos commits, aunque la base queda consistente.
+    """
+
+    def __init__(self, filename, synchronous='FULL'):
+        if synchronous not in ('FULL', 'NORMAL'):
+            raise ValueError("Modo synchronous no válido: %s" % synchronous)
+        self.filename = filename
+        self.synchronous = synchronous
+        self._lock = threading.Lock()
+        self._conn = self._connect(filename, synchronous)
+
+    def load(self):
+        with self._lock:
+            cursor = self._conn.cursor()
+            tasks = []
+            by_id = {}
+            for task_id, doc in cursor.execute('SELECT id, doc FROM tasks ORDER BY rowid'):
+                task = json.loads(doc)
+                task['users'] = []
+                task['dependencies'] = []
+                by_id[task_id] = task
+                tasks.append(task)
+            for task_id, usuario, rol, attrs in cursor.execute(
+                    'SELECT task_id, usuario, rol, attrs FROM assignments ORDER BY task_id, seq'):
+                by_id[task_id]['users'].append(self._assignment(usuario, rol, attrs))
+            for task_id, depends_on in cursor.execute(
+                    'SELECT task_id, depends_on FROM dependencies ORDER BY task_id, seq'):
+                by_id[task_id]['dependencies'].append(depends_on)
+            users = [json.loads(doc) for (doc,) in
+                     cursor.execute('SELECT doc FROM users ORDER BY rowid')]
+        return tasks, users
+
+    def save(self, changes, snapshot):
+        with self._lock, self._conn:
+            cursor = self._conn.cursor()
+            if changes is None:
+                tasks, users = snapshot()
+                cursor.execute('DELETE FROM tasks')
+                cursor.execute('DELETE FROM users')
+                changes = [{'op': 'put_task', 'record': t} for t in tasks]
+                changes += [{'op': 'put_user', 'record': u} for u in users]
+            for entry in changes:
+                op = entry['op']
+                if op == 'put_task':
+                    self.bytes_written += self._put_task(cursor, entry['record'])
+                elif op == 'put_user':
+                    self.bytes_written += self._put_user(cursor, entry['record'])
+                elif op == 'del_task':
+                    cursor.execute('DELETE FROM tasks WHERE id = ?', (entry['id'],))
+                elif op == 'del_user':
+                    cursor.execute('DELETE FROM users WHERE id = ?', (entry['id'],))
+
+    def iter_records(self):
+        """
+        Recorre las tablas con una conexión propia dentro de una transacción
+        de lectura: en modo WAL ve un estado fijo sin frenar a los saves. Las
+        asignaciones y dependencias de cada tarea se buscan por su clave
+        primaria, así que no se arma ningún diccionario con todas las tareas.
+        """
+        conn = sqlite3.connect(self.filename)
+        try:
+            conn.execute('BEGIN')
+            lookup = conn.cursor()
+            for task_id, doc in conn.execute('SELECT id, doc FROM tasks ORDER BY rowid'):
+                task = json.loads(doc)
+                task['users'] = [self._assignment(usuario, rol, attrs)
+                                 for usuario, rol, attrs in lookup.execute(
+                                     'SELECT usuario, rol, attrs FROM assignments '
+                                     'WHERE task_id = ? ORDER BY seq', (task_id,))]
+                task['dependencies'] = [depends_on for (depends_on,) in lookup.execute(
+                    'SELECT depends_on FROM dependencies WHERE task_id = ? ORDER BY seq',
+                    (task_id,))]
+                yield 'task', task
+            for (doc,) in conn.execute('SELECT doc FROM users ORDER BY rowid'):
+                yield 'user', json.loads(doc)
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def after_fork(self):
+        # SQLite no admite usar una conexión abierta antes del fork; la
+        # heredada se abandona sin cerrarla para no tocar el estado del padre
+        self._lock = threading.Lock()
+        self._conn = self._connect(self.filename, self.synchronous)
+
+    @staticmethod
+    def _connect(filename, synchronous):
+        conn = sqlite3.connect(filename, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=%s' % synchronous)
+        conn.execute('PRAGMA foreign_keys=ON')
+        conn.executescript(SCHEMA)
+        return conn
+
+    @staticmethod
+    def _assignment(usuario, rol, attrs):
+        user = {'usuario': usuario, 'rol': rol}
+        if attrs:
+            user.update(json.loads(attrs))
+        return user
+
+    @staticmethod
+    def _put_task(cursor, task):
+        """Guarda la tarea y retorna el tamaño aproximado de lo escrito."""
+        task = to_document(task)
+        doc = json.dumps({k: v for k, v in task.items() if k not in ('users', 'dependencies')})
+        cursor.execute(
+            'INSERT INTO tasks (id, status, doc) VALUES (?, ?, ?) '
+            'ON CONFLICT (id) DO UPDATE SET status = excluded.status, doc = excluded.doc',
+            (task['id'], task.get('status'), doc))
+        written = len(doc)
+        cursor.execute('DELETE FROM assignments WHERE task_id = ?', (task['id'],))
+        cursor.execute('DELETE FROM dependencies WHERE task_id = ?', (task['id'],))
+        assignments = []
+        for seq, user in enumerate(task.get('users', [])):
+            attrs = {k: v for k, v in user.items() if k not in ('usuario', 'rol')}
+            attrs = json.dumps(attrs) if attrs else None
+            assignments.append((task['id'], seq, user['usuario'], user.get('rol'), attrs))
+            written += len(user['usuario']) + len(user.get('rol') or '') + len(attrs or '')
+        cursor.executemany(
+            'INSERT INTO assignments (task_id, seq, usuario, rol, attrs) VALUES (?, ?, ?, ?, ?)',
+            assignments)
+        cursor.executemany(
+            'INSERT INTO dependencies (task_id, seq, depends_on) VALUES (?, ?, ?)',
+            [(task['id'], seq, dep) for seq, dep in enumerate(task.get('dependencies', []))])
+        return written + sum(len(dep) for dep in task.get('dependencies', []))
+
+    @staticmethod
+    def _put_user(cursor, user):
+        user = to_document(user)
+        doc = json.dumps(user)
+        cursor.execute(
+            'INSERT INTO users (id, name, doc) VALUES (?, ?, ?) '
+            'ON CONFLICT (id) DO UPDATE SET name = excluded.name, doc = excluded.doc',
+            (user['id'], user.get('name'), doc))
+        return len(doc)
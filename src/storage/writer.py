@@ -0,0 +1,123 @@
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Flushes fallidos que se recuerdan para quien espera un ticket ya escrito
+FAILURES_KEPT = 64
+
+
+class GroupCommitWriter:
+    """
+    Hilo escritor que agrupa en un solo flush los saves recibidos dentro de
+    una ventana de ``window_ms`` milisegundos.
+
+    ``flush`` recibe la lista combinada de cambios (o None si algún save
+    pidió una escritura completa). ``submit`` retorna un ticket y con
+    ``wait(ticket)`` (o ``submit(..., wait=True)``) el llamador espera a que
+    termine el flush que incluye esos cambios.
+
+    Si el flush falla, el error se guarda para todo su rango de tickets:
+    lo recibe cualquiera que espere uno de ellos, también si empieza a
+    esperar cuando el flush ya terminó.
+    """
+
+    def __init__(self, flush, window_ms=5):
+        self._flush = flush
+        self.window = window_ms / 1000.0
+        self._cond = threading.Condition()
+        self._batches = []
+        self._submitted = 0
+        self._flushed = 0
+        # (primer ticket, último ticket, error) de los flushes fallidos
+        self._failed = collections.deque(maxlen=FAILURES_KEPT)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='group-commit-writer',
+                                        daemon=True)
+        self._thread.start()
+
+    def submit(self, changes, wait=False):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("El escritor está cerrado")
+            self._batches.append(changes)
+            self._submitted += 1
+            ticket = self._submitted
+            self._cond.notify_all()
+        if wait:
+            self.wait(ticket)
+        return ticket
+
+    @property
+    def last_ticket(self):
+        """Ticket del último save enviado."""
+        return self._submitted
+
+    def wait(self, ticket, since=None):
+        """
+        Espera el flush que incluye ``ticket``; lanza su error si falló. Con
+        ``since`` también lanza el de un flush fallido de los tickets
+        posteriores a ``since``, para quien dejó cambios en varios saves.
+        """
+        first = ticket if since is None else since + 1
+        with self._cond:
+            while self._flushed < ticket:
+                self._cond.wait()
+            error = next((error for start, end, error in self._failed
+                          if start <= ticket and first <= end), None)
+        if error is not None:
+            raise error
+
+    def flush(self):
+        """Espera a que se persista todo lo enviado hasta ahora."""
+        with self._cond:
+            while self._flushed < self._submitted:
+                self._cond.wait()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._batches and not self._closed:
+                    self._cond.wait()
+                if not self._batches:
+                    return
+            # Dejar que lleguen más saves antes de escribir
+            if self.window:
+                time.sleep(self.window)
+            with self._cond:
+                batches, self._batches = self._batches, []
+                upto = self._submitted
+            error = None
+            try:
+                self._flush(self._merge(batches))
+            except Exception as e:
+                logger.exception("Falló el flush de %d saves agrupados", len(batches))
+                error = e
+            with self._cond:
+                if error is not None:
+                    self._failed.append((self._flushed + 1, upto, error))
+                self._flushed = upto
+                self._cond.notify_all()
+
+    @staticmethod
+    def _merge(batches):
+        """Combina los cambios; si un registro cambió varias veces queda el último."""
+        merged = {}
+        for changes in batches:
+            if changes is None:
+                return None
+            for entry in changes:
+                key = (entry['op'][4:], entry['id'])
+                merged.pop(key, None)
+                merged[key] = entry
+        return list(merged.values())
@@ -0,0 +1,339 @@
+import unittest
+import os
+import multiprocessing
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import controller
+from data_handler import DataHandler
+from utils.rwlock import RWLock
+
+
+class TestRWLock(unittest.TestCase):
+    """
+    Pruebas unitarias para el lock de lectores y escritor
+    """
+
+    def test_lectores_en_paralelo(self):
+        """
+        Caso de éxito: dos lectores pueden tener el lock al mismo tiempo
+        """
+        lock = RWLock()
+        barrera = threading.Barrier(2, timeout=2)
+        errores = []
+
+        def leer():
+            with lock.read():
+                try:
+                    barrera.wait()
+                except threading.BrokenBarrierError as e:
+                    errores.append(e)
+
+        hilos = [threading.Thread(target=leer) for _ in range(2)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+
+    def test_escritor_excluye_lectores(self):
+        """
+        Caso de éxito: un lector espera a que el escritor suelte el lock
+        """
+        lock = RWLock()
+        leyo = threading.Event()
+
+        def leer():
+            with lock.read():
+                leyo.set()
+
+        with lock:
+            with lock.read():
+                pass  # el escritor puede leer sin bloquearse
+            hilo = threading.Thread(target=leer)
+            hilo.start()
+            self.assertFalse(leyo.wait(0.1))
+        self.assertTrue(leyo.wait(2))
+        hilo.join()
+
+    def test_espera_se_informa(self):
+        """
+        Caso de éxito: on_wait recibe la espera solo cuando el lock estaba tomado
+        """
+        esperas = []
+        lock = RWLock(on_wait=lambda segundos, modo: esperas.append(modo))
+        with lock.read():
+            pass
+        self.assertEqual(esperas, [])
+
+        def leer():
+            with lock.read():
+                pass
+
+        hilo = threading.Thread(target=leer)
+        with lock:
+            hilo.start()
+            # Dar tiempo a que el lector quede esperando al escritor
+            time.sleep(0.05)
+        hilo.join()
+        self.assertEqual(esperas, ['read'])
+
+    def test_lectura_no_pasa_a_escritura(self):
+        """
+        Caso de error: tomar el lock en escritura mientras se lee se rechaza
+        """
+        lock = RWLock()
+        with lock.read():
+            with self.assertRaises(RuntimeError):
+                lock.acquire_write()
+
+
+class TestEstres(unittest.TestCase):
+    """
+    Prueba de estrés: muchos hilos contra la aplicación con persistencia real
+    """
+
+    HILOS = 16
+    OPERACIONES = 60
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'data.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def preparar(self, durability):
+        handler = DataHandler(self.filename, journal=True, compact_bytes=32 * 1024,
+                              durability=durability, flush_ms=1)
+        for i in range(5):
+            handler.add_user({'id': 'dev%d' % i, 'name': 'dev %d' % i})
+        for i in range(20):
+            handler.add_task({'id': 'task-%d' % i, 'status': 'pending',
+                              'users': [{'usuario': 'dev%d' % (i % 5), 'rol': 'programador'}],
+                              'dependencies': []})
+        handler.save_data()
+        controller.data_handler = handler
+        return handler
+
+    def operacion(self, client, rng, handler):
+        with handler.lock.read():
+            task_ids = list(handler.tasks_by_id)
+        task_id = rng.choice(task_ids)
+        alias = 'dev%d' % rng.randrange(5)
+        tipo = rng.randrange(9)
+        if tipo == 0:
+            return client.post('/tasks', json={'nombre': 'n', 'descripcion': 'd',
+                                               'usuario': alias, 'rol': 'pruebas'})
+        if tipo == 1:
+            return client.post('/tasks/%s' % task_id,
+                               json={'estado': rng.choice(['pending', 'Finalizado'])})
+        if tipo == 2:
+            return client.post('/tasks/%s/users' % task_id, json={
+                'usuario': alias, 'rol': 'infra',
+                'accion': rng.choice(['adicionar', 'remover'])})
+        if tipo == 3:
+            return client.post('/tasks/%s/dependencies' % task_id, json={
+                'dependencytaskid': rng.choice(task_ids),
+                'accion': rng.choice(['adicionar', 'remover'])})
+        if tipo == 4:
+            return client.get('/tasks?estado=pending&limit=5')
+        if tipo == 5:
+            return client.get('/usuarios/%s' % alias)
+        if tipo == 6:
+            return client.get('/usuarios/%s?formato=ndjson' % alias)
+        if tipo == 7:
+            return client.get('/tasks/ready')
+        return client.post('/batch', json={'operaciones': [
+            {'tipo': 'actualizar_estado', 'task_id': task_id, 'datos': {'estado': 'en_progreso'}},
+            {'tipo': 'crear_tarea', 'datos': {'nombre': 'b', 'descripcion': 'd',
+                                              'usuario': alias, 'rol': 'infra'}},
+        ]})
+
+    def verificar_indices(self, handler):
+        for task in handler.tasks:
+            self.assertIn(task.id, handler.tasks_by_status[task.status])
+            for u in task.users:
+                self.assertIn(task.id, handler.tasks_by_user[u.usuario])
+            self.assertIn(task.id, handler.graph)
+        self.assertEqual(sum(len(ids) for ids in handler.tasks_by_status.values()),
+                         len(handler.tasks))
+        self.assertEqual(len(handler.tasks_by_id), len(handler.tasks))
+
+    def test_muchos_hilos(self):
+        """
+        Caso de éxito: lecturas, escrituras y saves concurrentes no pierden
+        cambios ni dejan los índices inconsistentes
+        """
+        for durability in ('sync', 'group'):
+            with self.subTest(durability=durability):
+                handler = self.preparar(durability)
+                errores = []
+                estados = []
+
+                def trabajar(semilla):
+                    rng = random.Random(semilla)
+                    client = controller.app.test_client()
+                    try:
+                        for _ in range(self.OPERACIONES):
+                            response = self.operacion(client, rng, handler)
+                            response.get_data()
+                            estados.append(response.status_code)
+                    except Exception as e:
+                        errores.append(e)
+
+                hilos = [threading.Thread(target=trabajar, args=(i,)) for i in range(self.HILOS)]
+                for hilo in hilos:
+                    hilo.start()
+                for hilo in hilos:
+                    hilo.join()
+
+                self.assertEqual(errores, [])
+                self.assertEqual(len(estados), self.HILOS * self.OPERACIONES)
+                self.assertTrue(all(status < 500 for status in estados))
+                self.verificar_indices(handler)
+
+                # Lo persistido coincide con lo que quedó en memoria
+                handler.flush()
+                handler.compact()
+                handler.close()
+                recargado = DataHandler(self.filename, journal=True)
+                self.assertEqual(
+                    sorted((t.to_dict() for t in recargado.tasks), key=lambda t: t['id']),
+                    sorted((t.to_dict() for t in handler.tasks), key=lambda t: t['id']))
+                recargado.close()
+                shutil.rmtree(self.tmpdir)
+                os.mkdir(self.tmpdir)
+
+
+
+def _incrementar(filename, veces):
+    # Lectura-modificación-escritura del mismo registro desde otro proceso
+    handler = DataHandler(filename, shared=True, compact_bytes=2048)
+    for _ in range(veces):
+        with handler.transaction():
+            task = handler.get_task('contador')
+            task.title = str(int(task.title) + 1)
+            handler.mark_task(task)
+            handler.save_data()
+    handler.close()
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), "requiere fork y flock")
+class TestMultiproceso(unittest.TestCase):
+    """
+    Pruebas del modo multiproceso: varios DataHandler sobre el mismo archivo
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'data.json')
+        self.handlers = []
+
+    def tearDown(self):
+        for handler in self.handlers:
+            handler.close()
+        shutil.rmtree(self.tmpdir)
+
+    def abrir(self, **kwargs):
+        handler = DataHandler(self.filename, shared=True, **kwargs)
+        self.handlers.append(handler)
+        return handler
+
+    def escribir(self, handler, task_id, status='pending'):
+        with handler.transaction():
+            handler.add_task({'id': task_id, 'status': status, 'users': [],
+                              'dependencies': []})
+            handler.save_data()
+
+    def test_refresh_aplica_el_delta(self):
+        """
+        Caso de éxito: lo que escribe un proceso aparece en el otro tras refresh
+        sin recargar el archivo
+        """
+        a, b = self.abrir(), self.abrir()
+        self.escribir(a, 'task-1')
+        self.assertIsNone(b.get_task('task-1'))
+        self.assertTrue(b.storage.changed())
+
+        epoch = b.epoch
+        b.refresh()
+        self.assertEqual(b.get_task('task-1').status, 'pending')
+        self.assertIn('task-1', b.tasks_by_status['pending'])
+        self.assertEqual(b.epoch, epoch)  # no hubo recarga completa
+        self.assertFalse(b.storage.changed())
+
+        with b.transaction():
+            b.set_status(b.get_task('task-1'), 'Finalizado')
+            b.save_data()
+        a.refresh()
+        self.assertEqual(a.get_task('task-1').status, 'Finalizado')
+
+    def test_delta_despues_de_compactar(self):
+        """
+        Caso de éxito: un proceso una generación atrás termina de leer el log
+        rotado; uno más atrasado recarga completo
+        """
+        a, b = self.abrir(compact_bytes=512), self.abrir(compact_bytes=512)
+        self.escribir(a, 'task-0')
+        b.refresh()
+        for i in range(1, 10):
+            self.escribir(a, 'task-%d' % i)
+        self.assertEqual(a.storage.generation, 1)
+
+        epoch = b.epoch
+        b.refresh()
+        self.assertEqual(sorted(t.id for t in b.tasks), sorted(t.id for t in a.tasks))
+        self.assertEqual(b.epoch, epoch)
+
+        for i in range(10, 40):
+            self.escribir(a, 'task-%d' % i)
+        self.assertGreater(a.storage.generation, b.storage.generation + 1)
+        with self.assertLogs('data_handler', level='WARNING'):
+            b.refresh()
+        self.assertEqual(sorted(t.id for t in b.tasks), sorted(t.id for t in a.tasks))
+
+    def test_procesos_concurrentes_no_pierden_cambios(self):
+        """
+        Caso de éxito: incrementos concurrentes desde varios procesos, con
+        compactaciones en el medio, no se pisan
+        """
+        handler = self.abrir()
+        handler.add_task({'id': 'contador', 'title': '0', 'users': [], 'dependencies': []})
+        handler.save_data()
+
+        contexto = multiprocessing.get_context('fork')
+        procesos = [contexto.Process(target=_incrementar, args=(self.filename, 25))
+                    for _ in range(4)]
+        for proceso in procesos:
+            proceso.start()
+        for proceso in procesos:
+            proceso.join(30)
+            self.assertEqual(proceso.exitcode, 0)
+
+        handler.refresh()
+        self.assertEqual(handler.get_task('contador').title, '100')
+        recargado = DataHandler(self.filename, journal=True)
+        self.assertEqual(recargado.get_task('contador').title, '100')
+        recargado.close()
+
+    def test_configuracion_no_soportada(self):
+        """
+        Caso de error: el modo multiproceso solo admite el backend json y
+        durabilidad 'sync'
+        """
+        with self.assertRaises(ValueError):
+            DataHandler(self.filename, shared=True, durability='group')
+        with self.assertRaises(ValueError):
+            DataHandler(os.path.join(self.tmpdir, 'data.db'), backend='sqlite', shared=True)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,77 @@
+import unittest
+import os
+import random
+import sys
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contact_graph import ContactGraph
+
+
+class TestContactGraph(unittest.TestCase):
+    """
+    Pruebas unitarias para la red incremental de contactos
+    """
+
+    def setUp(self):
+        self.graph = ContactGraph()
+        self.graph.load([('ana', 'beto'), ('ana', 'beto', 'caro'), ('caro', 'dani')],
+                        [('dani', ['eva'])])
+
+    def test_vecinos_y_profundidad(self):
+        """
+        Caso de éxito: los vecinos cuentan las tareas en común y la BFS se
+        detiene en la profundidad y el límite pedidos
+        """
+        self.assertEqual(self.graph.neighbours('ana'), {'beto': 2, 'caro': 1})
+        # El contacto declarado por dani también es vecino de eva
+        self.assertEqual(self.graph.neighbours('eva'), {'dani': 0})
+        self.assertEqual(self.graph.reachable('ana', 1), [('beto', 1), ('caro', 1)])
+        self.assertEqual(self.graph.reachable('ana', 3),
+                         [('beto', 1), ('caro', 1), ('dani', 2), ('eva', 3)])
+        self.assertEqual(len(self.graph.reachable('ana', 3, limit=2)), 2)
+        self.assertEqual(self.graph.reachable('nadie', 2), [])
+
+    def test_quitar_tarea_conserva_vinculos_restantes(self):
+        """
+        Caso de éxito: un vínculo se corta solo al quitar la última tarea
+        compartida y si no hay un contacto declarado
+        """
+        self.graph.update_task(('ana', 'beto', 'caro'), ('ana',))
+        self.assertEqual(self.graph.neighbours('ana'), {'beto': 1})
+        self.assertEqual(self.graph.neighbours('caro'), {'dani': 1})
+        self.graph.set_contacts('ana', ['beto'])
+        self.graph.update_task(('ana', 'beto'), ())
+        self.assertEqual(self.graph.neighbours('beto'), {'ana': 0})
+        self.graph.set_contacts('ana', [])
+        self.assertNotIn('beto', self.graph)
+
+    def test_incremental_igual_a_reconstruir(self):
+        """
+        Caso de éxito: una secuencia aleatoria de cambios deja la misma red
+        que construirla desde cero con el estado final
+        """
+        rng = random.Random(7)
+        aliases = ['u%d' % i for i in range(12)]
+        tasks, contacts = {}, {}
+        graph = ContactGraph()
+        for _ in range(500):
+            if rng.random() < 0.7:
+                task_id = rng.randrange(30)
+                new = tuple(rng.sample(aliases, rng.randint(0, 4)))
+                graph.update_task(tasks.get(task_id, ()), new)
+                tasks[task_id] = new
+            else:
+                alias = rng.choice(aliases)
+                contacts[alias] = rng.sample(aliases, rng.randint(0, 3))
+                graph.set_contacts(alias, contacts[alias])
+
+        expected = ContactGraph()
+        expected.load(tasks.values(), contacts.items())
+        self.assertEqual(graph.shared, expected.shared)
+        self.assertEqual(graph.explicit, expected.explicit)
+
+
+if __name__ == '__main__':
+    unittest.main()
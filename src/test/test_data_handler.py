@@ -0,0 +1,1419 @@
+import unittest
+import json
+import os
+import shutil
+import sys
+import io
+import gc
+import tempfile
+import threading
+import time
+import weakref
+from unittest.mock import Mock, patch
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bulk
+from data_handler import DataHandler
+from migrate import migrate
+from reshard import main as reshard_main
+from models.tarea import Tarea
+from models.usuario import Usuario
+from storage import create_storage
+from storage.sharded_storage import ShardFile, ShardedStorage, shard_of
+from storage.snapshot import Snapshot, convert_json, iter_json_arrays
+from storage.writer import GroupCommitWriter
+from utils.change_feed import ChangeFeed
+from utils.metrics import Counter, Histogram, Registry
+from utils.response_cache import ResponseCache
+from utils.status_history import BUCKET_SECONDS, StatusCounters, StatusHistory
+from utils.text_index import TextIndex, tokenize
+
+
+class TestDataHandlerJournal(unittest.TestCase):
+    """
+    Pruebas unitarias para la persistencia por journal del DataHandler
+    """
+
+    def setUp(self):
+        """
+        Cada prueba trabaja sobre un directorio temporal propio
+        """
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'data.json')
+        with open(self.filename, 'w') as f:
+            json.dump({'tasks': [{'id': 't1', 'status': 'pending', 'users': []}],
+                       'users': []}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_cambios_se_anexan_y_se_recuperan(self):
+        """
+        Caso de éxito: los cambios van al journal y data.json no se reescribe
+        """
+        handler = DataHandler(self.filename, journal=True)
+        handler.tasks[0].status = 'Finalizado'
+        handler.mark_task(handler.tasks[0])
+        handler.add_user({'id': 'pepito', 'name': 'pepe'})
+        handler.save_data()
+        handler.close()
+
+        with open(self.filename) as f:
+            self.assertEqual(json.load(f)['tasks'][0]['status'], 'pending')
+
+        recovered = DataHandler(self.filename, journal=True)
+        self.assertEqual(recovered.tasks[0].status, 'Finalizado')
+        self.assertEqual(recovered.users[0].id, 'pepito')
+
+    def test_registro_final_cortado_se_descarta(self):
+        """
+        Caso de error: un registro final incompleto se ignora al recuperar
+        """
+        handler = DataHandler(self.filename, journal=True)
+        handler.tasks[0].status = 'en_progreso'
+        handler.mark_task(handler.tasks[0])
+        handler.save_data()
+        handler.close()
+
+        with open(handler.storage.journal.filename, 'ab') as f:
+            f.write(b'0000beef\t{"op": "put_task", "rec')
+
+        recovered = DataHandler(self.filename, journal=True)
+        self.assertEqual(recovered.tasks[0].status, 'en_progreso')
+
+        # El journal queda truncado y admite nuevos registros
+        recovered.tasks[0].status = 'Finalizado'
+        recovered.mark_task(recovered.tasks[0])
+        recovered.save_data()
+        recovered.close()
+        self.assertEqual(DataHandler(self.filename, journal=True).tasks[0].status,
+                         'Finalizado')
+
+    def test_exportar_no_corta_el_journal(self):
+        """
+        Caso de éxito: la exportación lee el journal sin repararlo, porque la
+        cola incompleta puede ser un registro que la aplicación está anexando
+        """
+        handler = DataHandler(self.filename, journal=True)
+        handler.add_user({'id': 'pepito', 'name': 'pepe'})
+        handler.save_data()
+        cola = b'0000beef\t{"op": "put_task", "rec'
+        with open(handler.storage.journal.filename, 'ab') as f:
+            f.write(cola)
+        size = os.path.getsize(handler.storage.journal.filename)
+
+        storage = create_storage('json', self.filename, journal=True)
+        salida = io.StringIO()
+        bulk.exportar(storage, 'usuarios', 'ndjson', salida)
+        storage.close()
+        self.assertEqual([json.loads(linea)['id'] for linea in salida.getvalue().splitlines()],
+                         ['pepito'])
+        self.assertEqual(os.path.getsize(handler.storage.journal.filename), size)
+        with open(handler.storage.journal.filename, 'rb') as f:
+            self.assertTrue(f.read().endswith(cola))
+        handler.close()
+
+    def test_checksum_invalido_se_descarta(self):
+        """
+        Caso de error: un registro con checksum incorrecto no se aplica
+        """
+        handler = DataHandler(self.filename, journal=True)
+        handler.close()
+        with open(handler.storage.journal.filename, 'wb') as f:
+            f.write(b'00000000\t{"op":"put_task","record":{"id":"t1","status":"x"}}\n')
+
+        recovered = DataHandler(self.filename, journal=True)
+        self.assertEqual(recovered.tasks[0].status, 'pending')
+
+    def test_compactacion_pliega_el_journal(self):
+        """
+        Caso de éxito: la compactación escribe un snapshot y vacía el journal
+        """
+        handler = DataHandler(self.filename, journal=True)
+        handler.tasks[0].status = 'Finalizado'
+        handler.mark_task(handler.tasks[0])
+        handler.save_data()
+        handler.compact()
+
+        with open(self.filename) as f:
+            self.assertEqual(json.load(f)['tasks'][0]['status'], 'Finalizado')
+        self.assertEqual(handler.storage.journal.size(), 0)
+        self.assertFalse(os.path.exists(handler.storage.journal.rotated_filename))
+
+
+class TestDataHandlerIndices(unittest.TestCase):
+    """
+    Pruebas unitarias para los índices por id del DataHandler
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'data.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_insertar_buscar_y_eliminar(self):
+        """
+        Caso de éxito: las búsquedas y eliminaciones usan el índice por id
+        """
+        handler = DataHandler(self.filename)
+        for i in range(3):
+            handler.add_task({'id': 't%d' % i, 'users': []})
+        handler.add_user({'id': 'pepito'})
+
+        self.assertEqual(handler.get_task('t1').id, 't1')
+        self.assertEqual(handler.get_user('pepito').id, 'pepito')
+        self.assertIsNone(handler.get_task('inexistente'))
+
+        removed = handler.remove_task('t0')
+        self.assertEqual(removed.id, 't0')
+        self.assertIsNone(handler.get_task('t0'))
+        self.assertEqual(sorted(t.id for t in handler.tasks), ['t1', 't2'])
+        self.assertIsNone(handler.remove_task('t0'))
+
+    def test_indices_se_reconstruyen_al_cargar(self):
+        """
+        Caso de éxito: load_data reconstruye los índices desde data.json
+        """
+        handler = DataHandler(self.filename)
+        handler.add_task({'id': 't1', 'users': []})
+        handler.add_user({'id': 'pepito'})
+        handler.save_data()
+
+        reloaded = DataHandler(self.filename)
+        self.assertIs(reloaded.get_task('t1'), reloaded.tasks[0])
+        self.assertIs(reloaded.get_user('pepito'), reloaded.users[0])
+
+    def test_eliminacion_se_registra_en_journal(self):
+        """
+        Caso de éxito: las eliminaciones se reproducen al recuperar el journal
+        """
+        handler = DataHandler(self.filename, journal=True)
+        handler.add_task({'id': 't1', 'users': []})
+        handler.add_task({'id': 't2', 'users': []})
+        handler.save_data()
+        handler.remove_task('t1')
+        handler.save_data()
+        handler.close()
+
+        recovered = DataHandler(self.filename, journal=True)
+        self.assertIsNone(recovered.get_task('t1'))
+        self.assertEqual([t.id for t in recovered.tasks], ['t2'])
+
+
+class TestIndiceTareasPorUsuario(unittest.TestCase):
+    """
+    Pruebas unitarias para el índice invertido alias -> tareas
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'data.json')
+        self.handler = DataHandler(self.filename)
+        self.handler.add_task({'id': 't1', 'users': [{'usuario': 'pepito', 'rol': 'programador'}]})
+        self.handler.add_task({'id': 't2', 'users': []})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_asignaciones_actualizan_el_indice(self):
+        """
+        Caso de éxito: adicionar y remover usuarios actualiza el índice
+        """
+        task = self.handler.get_task('t2')
+        self.assertTrue(self.handler.add_task_user(task, 'pepito', 'pruebas'))
+        self.assertFalse(self.handler.add_task_user(task, 'pepito', 'pruebas'))
+        self.handler.add_task_user(task, 'pepito', 'infra')
+        self.assertEqual([t.id for t in self.handler.tasks_for_user('pepito')], ['t1', 't2'])
+
+        # Mientras quede un rol asignado la tarea sigue en el índice
+        self.handler.remove_task_user(task, 'pepito', 'pruebas')
+        self.assertEqual(len(self.handler.tasks_for_user('pepito')), 2)
+        self.handler.remove_task_user(task, 'pepito', 'infra')
+        self.assertEqual([t.id for t in self.handler.tasks_for_user('pepito')], ['t1'])
+
+    def test_eliminar_tarea_la_quita_del_indice(self):
+        """
+        Caso de éxito: eliminar una tarea la retira del índice
+        """
+        self.handler.remove_task('t1')
+        self.assertEqual(self.handler.tasks_for_user('pepito'), [])
+        self.assertNotIn('pepito', self.handler.tasks_by_user)
+
+    def test_cursor_estable_tras_borrados(self):
+        """
+        Caso de éxito: un cursor sigue siendo válido aunque se borren tareas anteriores
+        """
+        for i in range(3, 103):
+            self.handler.add_task({'id': 't%d' % i, 'users': [{'usuario': 'pepito', 'rol': 'infra'}]})
+        pagina, cursor = self.handler.page_tasks_for_user('pepito', limit=50)
+        self.assertEqual(len(pagina), 50)
+
+        # Borrar suficientes tareas para forzar la compactación de la lista
+        for task in pagina:
+            self.handler.remove_task(task.id)
+        pagina, cursor = self.handler.page_tasks_for_user('pepito', cursor, limit=100)
+        self.assertEqual([t.id for t in pagina], ['t%d' % i for i in range(52, 103)])
+        self.assertIsNone(cursor)
+
+    def test_cursor_valido_tras_recargar(self):
+        """
+        Caso de éxito: un cursor tomado antes de recargar (o en otro worker)
+        retoma en la misma tarea, aunque un borrado cambie la numeración, con
+        el JSON completo, con el journal y con el snapshot binario
+        """
+        for nombre, opciones in ((None, {}), ('journal.json', {'journal': True}),
+                                 ('data.snap', {'backend': 'snapshot'})):
+            with self.subTest(**opciones):
+                filename = os.path.join(self.tmpdir, nombre) if nombre else self.filename
+                handler = DataHandler(filename, **opciones) if nombre else self.handler
+                if nombre:
+                    handler.add_task({'id': 't1', 'users': [{'usuario': 'pepito',
+                                                            'rol': 'programador'}]})
+                    handler.add_task({'id': 't2', 'users': []})
+                for i in range(3, 7):
+                    handler.add_task({'id': 't%d' % i, 'users': []})
+                for task_id in ('t6', 't5', 't4', 't3', 't2'):
+                    handler.add_task_user(handler.get_task(task_id), 'pepito', 'pruebas')
+                handler.save_data()
+                handler.compact()
+                pagina, cursor = handler.page_tasks_for_user('pepito', limit=3)
+                self.assertEqual([t.id for t in pagina], ['t1', 't2', 't3'])
+
+                # El borrado queda en el journal en los backends que lo tienen
+                handler.remove_task('t2')
+                handler.save_data()
+                handler.close()
+                reloaded = DataHandler(filename, **opciones)
+                pagina, cursor = reloaded.page_tasks_for_user('pepito', cursor, limit=3)
+                self.assertEqual([t.id for t in pagina], ['t4', 't5', 't6'])
+                self.assertIsNone(cursor)
+                self.assertEqual([t.id for t in reloaded.iter_tasks_for_user('pepito', [2, 't3'])],
+                                 ['t4', 't5', 't6'])
+                reloaded.close()
+
+    def test_indice_se_reconstruye_al_cargar(self):
+        """
+        Caso de éxito: load_data reconstruye el índice invertido
+        """
+        self.handler.save_data()
+        reloaded = DataHandler(self.filename)
+        self.assertEqual([t.id for t in reloaded.tasks_for_user('pepito')], ['t1'])
+        self.assertEqual(reloaded.tasks_for_user('nadie'), [])
+
+    def test_orden_de_creacion_igual_tras_recargar(self):
+        """
+        Caso de éxito: las tareas del alias salen en el orden de la lista de
+        tareas aunque se asignen en otro orden, antes y después de recargar
+        """
+        for i in range(3, 7):
+            self.handler.add_task({'id': 't%d' % i, 'users': []})
+        for task_id in ('t6', 't5', 't4', 't3', 't2'):
+            self.handler.add_task_user(self.handler.get_task(task_id), 'pepito', 'pruebas')
+        # Un borrado mueve la última tarea al hueco de la lista
+        self.handler.remove_task('t3')
+        esperado = ['t1', 't2', 't4', 't5', 't6']
+        self.assertEqual([t.id for t in self.handler.tasks_for_user('pepito')], esperado)
+
+        self.handler.save_data()
+        reloaded = DataHandler(self.filename)
+        self.assertEqual([t.id for t in reloaded.tasks_for_user('pepito')], esperado)
+        self.assertEqual([t.id for t in reloaded.tasks
+                          if any(u.usuario == 'pepito' for u in t.users)], esperado)
+
+    def test_orden_de_creacion_con_journal_y_snapshot(self):
+        """
+        Caso de éxito: los borrados que quedan en el journal y los que pasan
+        por la compactación no cambian el orden al recargar
+        """
+        for nombre, opciones in (('journal.json', {'journal': True}),
+                                 ('data.snap', {'backend': 'snapshot'})):
+            with self.subTest(**opciones):
+                filename = os.path.join(self.tmpdir, nombre)
+                handler = DataHandler(filename, **opciones)
+                for i in range(1, 6):
+                    handler.add_task({'id': 'n%d' % i,
+                                      'users': [{'usuario': 'pepito', 'rol': 'pruebas'}]})
+                handler.save_data()
+                handler.compact()
+                handler.remove_task('n2')
+                handler.add_task({'id': 'n6', 'users': [{'usuario': 'pepito', 'rol': 'pruebas'}]})
+                handler.save_data()
+                handler.close()
+
+                reloaded = DataHandler(filename, **opciones)
+                esperado = ['n1', 'n3', 'n4', 'n5', 'n6']
+                self.assertEqual([t.id for t in reloaded.tasks], esperado)
+                self.assertEqual([t.id for t in reloaded.tasks_for_user('pepito')], esperado)
+
+                # Con el borrado en memoria la lista cambia, pero no lo que se compacta
+                reloaded.remove_task('n3')
+                reloaded.compact()
+                reloaded.close()
+                reloaded = DataHandler(filename, **opciones)
+                esperado = ['n1', 'n4', 'n5', 'n6']
+                self.assertEqual([t.id for t in reloaded.tasks], esperado)
+                self.assertEqual([t.id for t in reloaded.tasks_for_user('pepito')], esperado)
+                reloaded.close()
+
+
+class TestSqliteStorage(unittest.TestCase):
+    """
+    Pruebas unitarias para el backend SQLite del DataHandler
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'data.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_persistencia_por_filas(self):
+        """
+        Caso de éxito: los cambios se guardan y se recuperan sin alterar los registros
+        """
+        handler = DataHandler(self.filename, backend='sqlite')
+        task = {'id': 't1', 'title': 'crear', 'description': 'descripción',
+                'status': 'pending', 'dependencies': ['t2'],
+                'users': [{'usuario': 'pedrito', 'rol': None, 'estado': 'activo'}]}
+        task = handler.add_task(task)
+        handler.add_task({'id': 't2', 'title': 'otra', 'description': '', 'status': 'pending',
+                          'users': [], 'dependencies': []})
+        handler.add_user({'id': 'pedrito', 'name': 'pedro', 'email': None,
+                          'contactos': [], 'tareas': []})
+        handler.save_data()
+
+        handler.add_task_user(task, 'pepito', 'programador')
+        task.status = 'Finalizado'
+        handler.mark_task(task)
+        handler.save_data()
+        handler.close()
+
+        reloaded = DataHandler(self.filename, backend='sqlite')
+        self.assertEqual(reloaded.get_task('t1').to_dict(), task.to_dict())
+        self.assertEqual([t.id for t in reloaded.tasks], ['t1', 't2'])
+        self.assertEqual(reloaded.get_user('pedrito').name, 'pedro')
+        self.assertEqual([t.id for t in reloaded.tasks_for_user('pepito')], ['t1'])
+
+        mode = reloaded.storage._conn.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode, 'wal')
+        reloaded.close()
+
+    def test_synchronous_segun_durabilidad(self):
+        """
+        Caso de éxito: en modo sync cada commit se sincroniza (FULL, 2); con
+        group basta NORMAL (1), también en la conexión que se abre tras un fork
+        """
+        for durability, expected in (('sync', 2), ('group', 1)):
+            handler = DataHandler(self.filename, backend='sqlite', durability=durability)
+            handler.storage.after_fork()
+            value = handler.storage._conn.execute('PRAGMA synchronous').fetchone()[0]
+            self.assertEqual(value, expected)
+            handler.close()
+
+    def test_eliminar_tarea_borra_sus_filas(self):
+        """
+        Caso de éxito: eliminar una tarea borra sus asignaciones y dependencias
+        """
+        handler = DataHandler(self.filename, backend='sqlite')
+        handler.add_task({'id': 't1', 'users': [{'usuario': 'pepito', 'rol': 'infra'}],
+                          'dependencies': ['t0']})
+        handler.save_data()
+        handler.remove_task('t1')
+        handler.save_data()
+
+        conn = handler.storage._conn
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM assignments').fetchone()[0], 0)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM dependencies').fetchone()[0], 0)
+        handler.close()
+
+    def test_migracion_desde_json(self):
+        """
+        Caso de éxito: migrate importa un data.json existente a SQLite
+        """
+        source = os.path.join(self.tmpdir, 'data.json')
+        original = DataHandler(source)
+        original.add_task({'id': 't1', 'title': 'crear', 'status': 'pending',
+                           'users': [{'usuario': 'pepito', 'rol': 'pruebas'}],
+                           'dependencies': []})
+        original.add_user({'id': 'pepito', 'name': 'pepe'})
+        original.save_data()
+
+        self.assertEqual(migrate(source, self.filename), (1, 1))
+        migrated = DataHandler(self.filename, backend='sqlite')
+        self.assertEqual([t.to_dict() for t in migrated.tasks],
+                         [t.to_dict() for t in original.tasks])
+        self.assertEqual([u.to_dict() for u in migrated.users],
+                         [u.to_dict() for u in original.users])
+        migrated.close()
+
+
+class TestSnapshotStorage(unittest.TestCase):
+    """
+    Pruebas unitarias para el snapshot binario con carga diferida
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tmpdir, 'data.json')
+        self.filename = os.path.join(self.tmpdir, 'data.snap')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def crear_json(self):
+        original = DataHandler(self.source, journal=True)
+        for i in range(30):
+            original.add_task({'id': 't%d' % i, 'title': 'tarea [%d], "ñ"' % i,
+                               'status': 'Finalizado' if i % 3 else 'pending',
+                               'users': [{'usuario': 'dev%d' % (i % 4), 'rol': 'programador'}],
+                               'dependencies': ['t%d' % (i - 1)] if i else []})
+        original.add_user({'id': 'dev0', 'name': 'pepe'})
+        original.save_data()
+        original.compact()
+        # Un cambio que queda solo en el journal del JSON
+        original.set_status(original.get_task('t4'), 'en_progreso')
+        original.save_data()
+        original.close()
+        return original
+
+    def test_conversion_y_carga_diferida(self):
+        """
+        Caso de éxito: el snapshot convertido carga sin decodificar registros
+        y responde lo mismo que el JSON original
+        """
+        original = self.crear_json()
+        self.assertEqual(convert_json(self.source, self.filename, chunk_size=64), (30, 1))
+
+        handler = DataHandler(self.filename, backend='snapshot')
+        self.assertEqual(handler.tasks.loaded, 1)  # la tarea del journal
+        self.assertNotIn('tasks_by_status', handler.__dict__)
+
+        self.assertEqual(handler.get_task('t7').to_dict(), original.get_task('t7').to_dict())
+        self.assertEqual(handler.get_task('t4').status, 'en_progreso')
+        self.assertIsNone(handler.get_task('t99'))
+        self.assertEqual(handler.tasks.loaded, 2)
+
+        # Los índices se arman con las filas de índice, sin decodificar tareas
+        self.assertEqual(sorted(handler.query_tasks(status='pending')),
+                         sorted(original.query_tasks(status='pending')))
+        self.assertEqual(handler.graph.ready(), original.graph.ready())
+        self.assertEqual(handler.tasks.loaded, 2)
+        self.assertEqual([t.id for t in handler.tasks_for_user('dev1')],
+                         [t.id for t in original.tasks_for_user('dev1')])
+        self.assertEqual([u.to_dict() for u in handler.users],
+                         [u.to_dict() for u in original.users])
+        handler.close()
+
+    def test_cambios_y_compactacion(self):
+        """
+        Caso de éxito: los cambios pasan por el journal y la compactación
+        copia sin decodificar los registros que no cambiaron
+        """
+        self.crear_json()
+        convert_json(self.source, self.filename)
+        handler = DataHandler(self.filename, backend='snapshot')
+        handler.remove_task('t0')
+        handler.add_task({'id': 'nueva', 'status': 'pending',
+                          'users': [{'usuario': 'dev9', 'rol': 'infra'}], 'dependencies': ['t5']})
+        handler.add_task_user(handler.get_task('t2'), 'dev9', 'pruebas')
+        handler.save_data()
+
+        reloaded = DataHandler(self.filename, backend='snapshot')
+        self.assertIsNone(reloaded.get_task('t0'))
+        self.assertEqual(reloaded.get_task('nueva').dependencies, ('t5',))
+        reloaded.close()
+
+        loaded = handler.tasks.loaded
+        handler.compact()
+        self.assertEqual(handler.tasks.loaded, loaded)
+        self.assertFalse(os.path.exists(self.filename + '.journal'))
+        esperado = sorted((t.to_dict() for t in handler.tasks), key=lambda t: t['id'])
+        handler.close()
+        reloaded = DataHandler(self.filename, backend='snapshot')
+        self.assertEqual(reloaded.tasks.loaded, 0)
+        self.assertEqual([t.id for t in reloaded.tasks_for_user('dev9')], ['t2', 'nueva'])
+        self.assertEqual(sorted((t.to_dict() for t in reloaded.tasks), key=lambda t: t['id']),
+                         esperado)
+        reloaded.close()
+
+    def test_lectura_json_por_bloques(self):
+        """
+        Caso de éxito: el lector por bloques respeta strings con corchetes,
+        números partidos entre bloques y claves que no son listas
+        """
+        documento = {'version': 12345, 'tasks': [{'id': 'a]', 'n': 1234567}, {'id': '{b'}],
+                     'meta': {'x': [1, 2]}, 'users': []}
+        texto = json.dumps(documento, indent=1)
+        for chunk_size in (1, 3, 7, 1 << 20):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(list(iter_json_arrays(io.StringIO(texto), chunk_size)),
+                                 [('tasks', {'id': 'a]', 'n': 1234567}), ('tasks', {'id': '{b'})])
+
+    def test_archivo_invalido(self):
+        """
+        Caso de error: un archivo que no es un snapshot se rechaza
+        """
+        with open(self.filename, 'wb') as f:
+            f.write(b'{"tasks": []}' + b' ' * 64)
+        with self.assertRaises(ValueError):
+            Snapshot(self.filename)
+
+
+
+class TestShardedStorage(unittest.TestCase):
+    """
+    Pruebas unitarias para el almacenamiento repartido en shards
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmpdir, 'data.shards')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def crear(self, journal=False, shards=4):
+        handler = DataHandler(self.directory, backend='sharded', journal=journal, shards=shards)
+        for i in range(40):
+            handler.add_task({'id': 't%d' % i, 'title': 'tarea %d' % i, 'status': 'pending',
+                              'users': [{'usuario': 'dev%d' % (i % 3), 'rol': 'programador'}],
+                              'dependencies': ['t%d' % (i - 1)] if i else []})
+        handler.add_user({'id': 'dev0', 'name': 'pepe'})
+        handler.save_data()
+        return handler
+
+    def contenido(self):
+        contenido = {}
+        for name in sorted(os.listdir(self.directory)):
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                contenido[name] = f.read()
+        return contenido
+
+    def test_save_reescribe_solo_el_shard_afectado(self):
+        """
+        Caso de éxito: un cambio reescribe solo el shard de su id y al
+        recargar se conserva el orden de creación
+        """
+        handler = self.crear()
+        antes = self.contenido()
+        self.assertEqual(len([n for n in antes if n.startswith('shard-0-')]), 4)
+
+        handler.set_status(handler.get_task('t7'), 'Finalizado')
+        handler.save_data()
+        despues = self.contenido()
+        cambiados = [name for name in antes if antes[name] != despues[name]]
+        self.assertEqual(cambiados, ['shard-0-%03d.json' % shard_of('t7', 4)])
+
+        handler.add_task({'id': 'nueva', 'status': 'pending'})
+        handler.remove_task('t3')
+        handler.save_data()
+        handler.close()
+
+        reloaded = DataHandler(self.directory, backend='sharded')
+        self.assertEqual([t.id for t in reloaded.tasks],
+                         ['t%d' % i for i in range(40) if i != 3] + ['nueva'])
+        self.assertEqual(reloaded.get_task('t7').status, 'Finalizado')
+        self.assertEqual(reloaded.get_user('dev0').name, 'pepe')
+        reloaded.close()
+
+    def test_carga_en_paralelo_con_journal(self):
+        """
+        Caso de éxito: la carga con un pool de procesos da lo mismo que la
+        secuencial, incluidos los cambios que siguen en los journals
+        """
+        handler = self.crear(journal=True)
+        handler.set_status(handler.get_task('t5'), 'en_progreso')
+        handler.save_data()
+        handler.compact()
+        handler.add_task({'id': 'ultima', 'status': 'pending'})
+        handler.save_data()
+        esperado = [t.to_dict() for t in handler.tasks]
+        handler.close()
+        self.assertTrue(os.path.exists(os.path.join(
+            self.directory, 'shard-0-%03d.json.journal' % shard_of('ultima', 4))))
+
+        for workers in (1, 3):
+            with self.subTest(workers=workers):
+                storage = ShardedStorage(self.directory, journal=True, workers=workers)
+                tasks, users = storage.load()
+                storage.close()
+                self.assertEqual(tasks, esperado)
+                self.assertEqual([u['id'] for u in users], ['dev0'])
+
+        # Desde un hilo, como al abrir un espacio de trabajo, no se usa fork
+        cargados = []
+
+        def cargar():
+            storage = ShardedStorage(self.directory, journal=True, workers=3)
+            cargados.append(storage.load())
+            storage.close()
+        with patch('storage.sharded_storage.ProcessPoolExecutor') as pool:
+            hilo = threading.Thread(target=cargar)
+            hilo.start()
+            hilo.join()
+        pool.assert_not_called()
+        self.assertEqual(cargados[0][0], esperado)
+
+    def test_reshard_con_saves_concurrentes(self):
+        """
+        Caso de éxito: un save que llega mientras se escriben los shards
+        nuevos no se pierde y los archivos anteriores se borran
+        """
+        handler = self.crear(journal=True)
+        original = ShardFile._write_snapshot
+        llamadas = []
+
+        def escribir_con_save(shard, data):
+            if not llamadas:
+                handler.set_status(handler.get_task('t11'), 'Finalizado')
+                handler.add_task({'id': 'durante', 'status': 'pending'})
+                handler.save_data()
+            llamadas.append(shard.filename)
+            return original(shard, data)
+
+        with patch.object(ShardFile, '_write_snapshot', escribir_con_save):
+            handler.reshard(7)
+        self.assertEqual(len(llamadas), 7)
+        handler.close()
+
+        shards = [n for n in os.listdir(self.directory) if n.endswith('.json') and n != 'manifest.json']
+        self.assertEqual(sorted(shards), ['shard-1-%03d.json' % i for i in range(7)])
+        self.assertFalse([n for n in os.listdir(self.directory) if n.startswith('shard-0-')])
+        # El save concurrente se volvió a aplicar en el journal del shard nuevo
+        self.assertTrue(os.path.exists(os.path.join(
+            self.directory, 'shard-1-%03d.json.journal' % shard_of('t11', 7))))
+        reloaded = DataHandler(self.directory, backend='sharded', journal=True)
+        self.assertEqual(reloaded.storage.shards, 7)
+        self.assertEqual(reloaded.get_task('t11').status, 'Finalizado')
+        self.assertEqual([t.id for t in reloaded.tasks][-2:], ['t39', 'durante'])
+        reloaded.close()
+
+    def test_herramienta_y_errores(self):
+        """
+        Caso de error: el backend json no admite reshard y la herramienta
+        rechaza un directorio sin manifiesto
+        """
+        self.crear(journal=True).close()
+        with patch('sys.stdout', new_callable=io.StringIO):
+            self.assertEqual(reshard_main([self.directory, '2']), 0)
+        with patch('sys.stderr', new_callable=io.StringIO):
+            self.assertEqual(reshard_main([self.tmpdir, '2']), 1)
+        reloaded = DataHandler(self.directory, backend='sharded', shards=9)
+        self.assertEqual(reloaded.storage.shards, 2)
+        self.assertEqual(len(reloaded.tasks), 40)
+        reloaded.close()
+
+        handler = DataHandler(os.path.join(self.tmpdir, 'data.json'))
+        with self.assertRaises(ValueError):
+            handler.reshard(2)
+        handler.close()
+
+class TestImportacionMasiva(unittest.TestCase):
+    """
+    Pruebas unitarias para la exportación e importación en NDJSON y CSV
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def crear(self, backend, nombre):
+        filename = os.path.join(self.tmpdir, nombre)
+        handler = DataHandler(filename, backend=backend, journal=True)
+        handler.add_task({'id': 't1', 'title': 'base', 'status': 'pending',
+                          'users': [{'usuario': 'ana', 'rol': 'pruebas'}]})
+        handler.add_task({'id': 't2', 'title': 'sigue', 'dependencies': ['t1'], 'duracion': 2})
+        handler.add_user({'id': 'ana', 'name': 'Ana', 'contactos': ['beto']})
+        handler.add_user({'id': 'beto', 'name': 'Beto'})
+        handler.save_data()
+        handler.compact()
+        # Cambios que quedan solo en el journal
+        handler.set_status(handler.get_task('t1'), 'Finalizado')
+        handler.add_task({'id': 't3', 'title': 'nueva', 'dependencies': ['t2']})
+        handler.save_data()
+        return handler
+
+    def test_exportar_e_importar_ndjson(self):
+        """
+        Caso de éxito: cada backend se exporta leyendo de a un registro, con
+        el journal aplicado, y la importación en otro orden deja los mismos datos
+        """
+        for backend, nombre in (('json', 'data.json'), ('sqlite', 'data.db'),
+                                ('snapshot', 'data.snap'), ('sharded', 'data.shards')):
+            with self.subTest(backend=backend):
+                handler = self.crear(backend, nombre)
+                storage = create_storage(backend, handler.filename, journal=True)
+                salidas = {}
+                for tipo in ('tareas', 'usuarios'):
+                    salidas[tipo] = io.StringIO()
+                    bulk.exportar(storage, tipo, 'ndjson', salidas[tipo])
+                storage.close()
+
+                destino = DataHandler(os.path.join(self.tmpdir, backend + '.json'))
+                for tipo in ('tareas', 'usuarios'):
+                    # Invertidas: las dependencias y los contactos llegan antes que su destino
+                    lineas = salidas[tipo].getvalue().splitlines()[::-1]
+                    importador = bulk.importar(destino, lineas, tipo, 'ndjson', lote=1)
+                    self.assertEqual((importador.importados, importador.errores),
+                                     (len(lineas), 0))
+                self.assertEqual(sorted(t.to_dict()['id'] for t in destino.tasks),
+                                 ['t1', 't2', 't3'])
+                for task in handler.tasks:
+                    self.assertEqual(destino.get_task(task.id).to_dict(), task.to_dict())
+                for user in handler.users:
+                    self.assertEqual(destino.get_user(user.id).to_dict(), user.to_dict())
+                self.assertEqual(destino.graph.deps['t3'], {'t2'})
+                destino.close()
+                handler.close()
+
+    def test_importar_valida_como_los_endpoints(self):
+        """
+        Caso de error: roles, ids y ciclos se validan como en los endpoints;
+        los errores se informan con su línea y el resto se importa
+        """
+        filename = os.path.join(self.tmpdir, 'data.json')
+        handler = DataHandler(filename)
+        errores = []
+        tareas = ['{"id": "a", "dependencies": ["c"]}',
+                  '{"id": "b", "dependencies": ["a", "falta"]}',
+                  'no es json',
+                  '{"id": "c", "dependencies": ["b"]}',
+                  '{"id": "d", "users": [{"usuario": "x", "rol": "jefe"}]}',
+                  '{"id": "a"}']
+        importador = bulk.importar(handler, tareas, 'tareas', 'ndjson', lote=2,
+                                   on_error=lambda linea, error: errores.append((linea, error)))
+        self.assertEqual(importador.importados, 3)
+        self.assertEqual(sorted(errores), [
+            (2, 'Tarea dependiente no encontrada: falta'), (3, 'Registro no válido'),
+            (4, 'La dependencia b crea un ciclo'), (5, 'Rol no válido'),
+            (6, 'La tarea ya existe')])
+        self.assertEqual(handler.get_task('b').dependencies, ('a',))
+        self.assertEqual(handler.get_task('c').dependencies, ())
+
+        errores.clear()
+        asignaciones = io.StringIO('task_id,usuario,rol\na,ana,pruebas\na,ana,jefe\nzz,ana,infra\nb,beto,\n')
+        importador = bulk.importar(handler, asignaciones, 'asignaciones', 'csv',
+                                   on_error=lambda linea, error: errores.append((linea, error)))
+        self.assertEqual(errores, [(3, 'Rol no válido'), (4, 'Tarea no encontrada'),
+                                   (5, 'Rol no válido')])
+        self.assertEqual(handler.get_task('b').users, ())
+
+        errores.clear()
+        dependencias = io.StringIO('task_id,depends_on\nb,c\na,b\nc,zz\n')
+        bulk.importar(handler, dependencias, 'dependencias', 'csv',
+                      on_error=lambda linea, error: errores.append((linea, error)))
+        self.assertEqual(errores, [(3, 'La dependencia crea un ciclo'),
+                                   (4, 'Tarea dependiente no encontrada')])
+        self.assertEqual(handler.get_task('b').dependencies, ('a', 'c'))
+        handler.close()
+
+        # La herramienta deja el archivo completo, sin journal, y sale con 1 si hubo errores
+        entrada = os.path.join(self.tmpdir, 'usuarios.csv')
+        with open(entrada, 'w') as f:
+            f.write('id,name,email\nana,Ana,ana@x.com\nana,Otra,\n')
+        with patch('sys.stdout', new_callable=io.StringIO), \
+                patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            self.assertEqual(bulk.main(['importar', filename, entrada, 'usuarios']), 1)
+        self.assertIn('línea 3: El alias ya está en uso', stderr.getvalue())
+        self.assertFalse(os.path.exists(filename + '.journal'))
+        with open(filename) as f:
+            self.assertEqual(json.load(f)['users'], [{'id': 'ana', 'name': 'Ana',
+                                                      'email': 'ana@x.com'}])
+
+
+class TestDurabilidad(unittest.TestCase):
+    """
+    Pruebas unitarias para el escritor con group commit y los modos de durabilidad
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'data.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read_statuses(self):
+        with open(self.filename) as f:
+            return {t['id']: t['status'] for t in json.load(f)['tasks']}
+
+    def test_modo_group_retorna_tras_el_flush(self):
+        """
+        Caso de éxito: en modo group el archivo está actualizado al retornar save_data
+        """
+        handler = DataHandler(self.filename, durability='group', flush_ms=1)
+        handler.add_task({'id': 't1', 'status': 'pending', 'users': []})
+        handler.save_data()
+        self.assertEqual(self.read_statuses(), {'t1': 'pending'})
+        handler.close()
+
+    def test_modo_async_escribe_en_segundo_plano(self):
+        """
+        Caso de éxito: en modo async el flush ocurre después y flush() lo espera
+        """
+        handler = DataHandler(self.filename, durability='async', flush_ms=1)
+        handler.add_task({'id': 't1', 'status': 'pending', 'users': []})
+        handler.save_data()
+        handler.flush()
+        self.assertEqual(self.read_statuses(), {'t1': 'pending'})
+        handler.close()
+
+    def test_saves_concurrentes_se_agrupan(self):
+        """
+        Caso de éxito: los saves que llegan en la misma ventana comparten un flush
+        """
+        handler = DataHandler(self.filename, journal=True, durability='group', flush_ms=50)
+        calls = []
+        save = handler.storage.save
+        handler.storage.save = lambda *args: (calls.append(args[0]), save(*args))
+
+        def crear(i):
+            handler.add_task({'id': 't%d' % i, 'status': 'pending', 'users': []})
+            handler.save_data()
+
+        threads = [threading.Thread(target=crear, args=(i,)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        handler.close()
+
+        self.assertLess(len(calls), 10)
+        self.assertEqual(sum(len(changes) for changes in calls), 10)
+        self.assertEqual(len(DataHandler(self.filename, journal=True).tasks), 10)
+
+    def test_error_en_flush_se_propaga_en_modo_group(self):
+        """
+        Caso de error: si el flush falla, save_data en modo group lanza la excepción
+        """
+        handler = DataHandler(self.filename, durability='group', flush_ms=1)
+        handler.storage.save = Mock(side_effect=OSError("disco lleno"))
+        handler.add_task({'id': 't1', 'status': 'pending', 'users': []})
+        with self.assertRaises(OSError):
+            handler.save_data()
+        handler.close()
+
+    def test_error_en_flush_llega_a_todo_el_lote(self):
+        """
+        Caso de error: el error de un flush llega a quien espera cualquier
+        ticket del lote, aunque empiece a esperar cuando ya terminó
+        """
+        writer = GroupCommitWriter(Mock(side_effect=OSError("disco lleno")), window_ms=1)
+        primero = writer.submit([])
+        segundo = writer.submit([])
+        writer.flush()
+        for ticket in (primero, segundo):
+            with self.assertRaises(OSError):
+                writer.wait(ticket)
+        writer.close()
+
+    def test_error_en_flush_llega_a_los_hilos_del_lote_en_modo_sync(self):
+        """
+        Caso de error: en modo sync, un hilo cuyos cambios escribió el save de
+        otro hilo recibe el error de ese flush en lugar de retornar con éxito
+        """
+        handler = DataHandler(self.filename)
+        marcado, escribiendo, soltar = threading.Event(), threading.Event(), threading.Event()
+
+        def save(changes, snapshot):
+            escribiendo.set()
+            soltar.wait(5)
+            raise OSError("disco lleno")
+        handler.storage.save = save
+        errores = {}
+
+        def guardar(task_id, antes, despues):
+            antes.wait(5)
+            handler.add_task({'id': task_id, 'status': 'pending', 'users': []})
+            despues.set()
+            if task_id == 't1':
+                escribiendo.wait(5)
+            try:
+                handler.save_data()
+            except OSError as e:
+                errores[task_id] = e
+
+        listo = threading.Event()
+        listo.set()
+        hilos = [threading.Thread(target=guardar, args=('t1', listo, marcado)),
+                 threading.Thread(target=guardar, args=('t2', marcado, threading.Event()))]
+        for hilo in hilos:
+            hilo.start()
+        # t1 espera el flush de t2, que también lleva su tarea
+        escribiendo.wait(5)
+        time.sleep(0.05)
+        soltar.set()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(sorted(errores), ['t1', 't2'])
+
+    def test_flush_fallido_reintenta_en_el_siguiente_save(self):
+        """
+        Caso de error: los cambios de un flush que falló se escriben en el siguiente save
+        """
+        handler = DataHandler(self.filename, journal=True)
+        handler.add_task({'id': 't1', 'status': 'pending', 'users': []})
+        with patch.object(handler.storage.journal, 'append', side_effect=OSError("disco lleno")):
+            with self.assertRaises(OSError):
+                handler.save_data()
+        handler.save_data()
+        handler.close()
+        self.assertEqual(DataHandler(self.filename, journal=True).get_task('t1').status, 'pending')
+
+    def test_escritura_interrumpida_no_corrompe_el_archivo(self):
+        """
+        Caso de error: un fallo durante la escritura deja intacto el archivo anterior
+        """
+        handler = DataHandler(self.filename)
+        handler.add_task({'id': 't1', 'status': 'pending', 'users': []})
+        handler.save_data()
+
+        handler.get_task('t1').status = 'Finalizado'
+        with patch('os.replace', side_effect=OSError("crash")):
+            with self.assertRaises(OSError):
+                handler.save_data()
+        self.assertEqual(self.read_statuses(), {'t1': 'pending'})
+
+    def test_modo_invalido(self):
+        """
+        Caso de error: un modo de durabilidad desconocido se rechaza
+        """
+        with self.assertRaises(ValueError):
+            DataHandler(self.filename, durability='nunca')
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "requiere fork")
+    def test_after_fork_en_el_hijo(self):
+        """
+        Caso de éxito: un handler cargado antes del fork guarda desde el hijo
+        después de after_fork, con epoch y registro de cambios propios
+        """
+        handler = DataHandler(self.filename, journal=True, durability='group', flush_ms=1)
+        handler.add_task({'id': 't1', 'status': 'pending', 'users': []})
+        handler.save_data()
+        epoch, last = handler.epoch, handler.changes.last
+        pid = os.fork()
+        if pid == 0:
+            ok = False
+            try:
+                handler.after_fork()
+                handler.add_task({'id': 't2', 'status': 'pending', 'users': []})
+                handler.save_data()
+                handler.close()
+                ok = handler.epoch != epoch and handler.changes.last > last
+            finally:
+                os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(status, 0)
+        handler.close()
+        reloaded = DataHandler(self.filename, journal=True)
+        self.assertEqual({t.id for t in reloaded.tasks}, {'t1', 't2'})
+        reloaded.close()
+
+    def test_close_libera_el_handler(self):
+        """
+        Caso de éxito: un handler cerrado en modo async no queda referenciado
+        desde atexit
+        """
+        handler = DataHandler(self.filename, durability='async', flush_ms=1)
+        handler.close()
+        ref = weakref.ref(handler)
+        del handler
+        gc.collect()
+        self.assertIsNone(ref())
+
+
+class TestModelos(unittest.TestCase):
+    """
+    Pruebas unitarias para los modelos que DataHandler guarda en memoria
+    """
+
+    def test_documentos_se_conservan(self):
+        """
+        Caso de éxito: from_dict/to_dict devuelven el mismo documento
+        """
+        task = {'id': 't1', 'title': 'crear', 'description': '', 'status': 'pending',
+                'users': [{'usuario': 'pepito', 'rol': 'pruebas'},
+                          {'task_id': 't1', 'user_id': 'pedrito', 'estado': 'activo',
+                           'fecha_asignacion': None, 'rol': None, 'usuario': 'pedrito'}],
+                'dependencies': ['t0'], 'prioridad': 3}
+        user = {'id': 'pepito', 'name': 'pepe', 'contactos': []}
+        self.assertEqual(Tarea.from_dict(task).to_dict(), task)
+        self.assertEqual(Usuario.from_dict(user).to_dict(), user)
+
+    def test_campo_llamado_extra_se_conserva(self):
+        """
+        Caso de éxito: un campo guardado que se llama "extra" no se confunde
+        con el atributo del modelo y sobrevive a guardar y recargar
+        """
+        task = {'id': 't1', 'users': [], 'dependencies': [], 'extra': {'origen': 'csv'}}
+        user = {'id': 'pepito', 'extra': 'nota'}
+        self.assertEqual(Tarea.from_dict(task).to_dict(), task)
+        self.assertEqual(Usuario.from_dict(user).to_dict(), user)
+
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        handler = DataHandler(os.path.join(tmpdir, 'data.json'))
+        handler.add_task(dict(task))
+        handler.add_user(dict(user))
+        handler.save_data()
+        reloaded = DataHandler(handler.filename)
+        self.assertEqual(reloaded.get_task('t1').to_dict(), task)
+        self.assertEqual(reloaded.get_user('pepito').to_dict(), user)
+
+    def test_estados_y_roles_compartidos(self):
+        """
+        Caso de éxito: estados y roles iguales comparten el mismo string
+        """
+        a = Tarea.from_dict(json.loads('{"id": "a", "status": "pending", '
+                                       '"users": [{"usuario": "x", "rol": "infra"}]}'))
+        b = Tarea.from_dict(json.loads('{"id": "b", "status": "pending", '
+                                       '"users": [{"usuario": "y", "rol": "infra"}]}'))
+        self.assertIs(a.status, b.status)
+        self.assertIs(a.users[0].rol, b.users[0].rol)
+        self.assertIsInstance(a.dependencies, tuple)
+
+
+class TestResponseCache(unittest.TestCase):
+    """
+    Pruebas unitarias para la caché LRU de respuestas codificadas
+    """
+
+    def test_lru_y_versiones(self):
+        """
+        Caso de éxito: se descarta la entrada menos usada y una versión nueva se recodifica
+        """
+        cache = ResponseCache(maxsize=2)
+        encode = Mock(side_effect=lambda: b'x')
+        cache.get('a', 1, encode)
+        cache.get('b', 1, encode)
+        cache.get('a', 1, encode)
+        cache.get('c', 1, encode)
+        self.assertEqual(encode.call_count, 3)
+        cache.get('b', 1, encode)
+        self.assertEqual(encode.call_count, 4)
+        cache.get('b', 2, encode)
+        self.assertEqual(encode.call_count, 5)
+        self.assertEqual(len(cache), 2)
+
+
+
+
+class TestBusquedaTexto(unittest.TestCase):
+    """
+    Pruebas unitarias para el índice de texto de títulos y descripciones
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.handler = DataHandler(os.path.join(self.tmpdir, 'data.json'))
+        for task_id, title, description in [
+                ('t1', 'Revisar la descripción', 'Corregir textos del informe'),
+                ('t2', 'Informe anual', 'Revisión de la DESCRIPCION del proyecto'),
+                ('t3', 'Migrar base de datos', 'Pasar a PostgreSQL'),
+                ('t4', 'Pingüino', None)]:
+            self.handler.add_task({'id': task_id, 'title': title, 'description': description})
+
+    def tearDown(self):
+        self.handler.close()
+        shutil.rmtree(self.tmpdir)
+
+    def ids(self, query):
+        return [task_id for task_id, _ in self.handler.search_tasks(query)]
+
+    def test_acentos_prefijos_y_ranking(self):
+        """
+        Caso de éxito: la búsqueda ignora acentos y mayúsculas, exige todas
+        las palabras, completa la última y pondera más el título
+        """
+        self.assertEqual(tokenize('La Descripción de la tarea'), ['descripcion', 'tarea'])
+        # Coincide en el título de t1 y en la descripción de t2
+        self.assertEqual(self.ids('descripcion'), ['t1', 't2'])
+        self.assertEqual(self.ids('DESCRIPCIÓN'), ['t1', 't2'])
+        self.assertEqual(self.ids('infor'), ['t2', 't1'])
+        self.assertEqual(sorted(self.ids('informe revis')), ['t1', 't2'])
+        self.assertEqual(self.ids('informe postgres'), [])
+        self.assertEqual(self.ids('pinguino'), ['t4'])
+        self.assertEqual(self.ids('de la'), [])
+        self.assertEqual(len(self.handler.search_tasks('descripcion', limit=1)), 1)
+
+    def test_actualizacion_incremental(self):
+        """
+        Caso de éxito: después de la primera búsqueda, crear, modificar y
+        borrar tareas se refleja sin reconstruir el índice
+        """
+        self.assertEqual(self.ids('migrar'), ['t3'])
+        index = self.handler.text_index
+        self.handler.add_task({'id': 't5', 'title': 'Migración de usuarios'})
+        self.handler.add_task({'id': 't3', 'title': 'Respaldar base de datos'})
+        self.handler.remove_task('t1')
+        self.handler.set_status(self.handler.get_task('t2'), 'Finalizado')
+
+        self.assertIs(self.handler.text_index, index)
+        self.assertEqual(self.ids('migr'), ['t5'])
+        self.assertEqual(self.ids('base'), ['t3'])
+        self.assertEqual(self.ids('descripcion'), ['t2'])
+        self.assertEqual(index.documents, 4)
+
+        self.handler.load_data()
+        self.assertNotIn('text_index', self.handler.__dict__)
+
+    def test_terminos_muy_frecuentes(self):
+        """
+        Caso de éxito: un término presente en todos los documentos puntúa
+        solo los más recientes y los prefijos se expanden a los más comunes
+        """
+        index = TextIndex(scan_limit=5, max_expansions=2)
+        index.extend(('d%d' % i, i, ('tarea numero%d' % (i % 4),)) for i in range(20))
+        index.add('d20', 20, ('tarea numeroX',))
+        self.assertEqual([d for d, _ in index.search('tarea', limit=3)], ['d20', 'd19', 'd18'])
+        self.assertEqual(len(index.search('tarea', limit=50)), 5)
+        self.assertEqual(len(index.search('numero', limit=50)), 5)
+        self.assertEqual(sorted(index._expand('numero')), ['numero0', 'numero1'])
+        index.remove('d20')
+        self.assertEqual(index.search('numerox'), [])
+
+class TestRedContactos(unittest.TestCase):
+    """
+    Pruebas unitarias para la red de contactos y las tareas compartidas
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.handler = DataHandler(os.path.join(self.tmpdir, 'data.json'))
+        for alias in ('ana', 'beto', 'caro'):
+            self.handler.add_user({'id': alias, 'name': alias})
+        for i in range(6):
+            users = [{'usuario': 'ana', 'rol': 'programador'}]
+            if i % 2 == 0:
+                users.append({'usuario': 'beto', 'rol': 'pruebas'})
+            self.handler.add_task({'id': 't%d' % i, 'title': 'Tarea', 'users': users})
+
+    def tearDown(self):
+        self.handler.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_tareas_compartidas(self):
+        """
+        Caso de éxito: la intersección recorre la lista más corta y respeta
+        el orden de asignación
+        """
+        self.assertEqual(self.handler.shared_tasks('ana', 'beto'), ['t0', 't2', 't4'])
+        self.assertEqual(self.handler.shared_tasks('beto', 'ana'), ['t0', 't2', 't4'])
+        self.assertEqual(self.handler.shared_tasks('ana', 'caro'), [])
+
+    def test_actualizacion_incremental(self):
+        """
+        Caso de éxito: después de la primera consulta, los cambios de tareas
+        y de contactos se reflejan igual que al reconstruir la red
+        """
+        contacts = self.handler.contacts
+        self.assertEqual(contacts.neighbours('ana'), {'beto': 3})
+        self.assertTrue(self.handler.add_contact(self.handler.get_user('caro'), 'ana'))
+        self.assertFalse(self.handler.add_contact(self.handler.get_user('caro'), 'ana'))
+        self.handler.remove_task('t0')
+        self.handler.remove_task_user(self.handler.get_task('t2'), 'beto', 'pruebas')
+        self.handler.add_task_user(self.handler.get_task('t1'), 'dani', 'infra')
+
+        self.assertIs(self.handler.contacts, contacts)
+        self.assertEqual(contacts.neighbours('ana'), {'beto': 1, 'caro': 0, 'dani': 1})
+        self.assertEqual(sorted(contacts.reachable('beto', 2)),
+                         [('ana', 1), ('caro', 2), ('dani', 2)])
+
+        self.handler.remove_user('caro')
+        self.assertNotIn('caro', contacts)
+        self.handler.load_data()
+        self.assertNotIn('contacts', self.handler.__dict__)
+
+class TestRegistroCambios(unittest.TestCase):
+    """
+    Pruebas unitarias para el registro de cambios y su buffer circular
+    """
+
+    def test_buffer_circular(self):
+        """
+        Caso de éxito: se piden los eventos posteriores a una secuencia;
+        caso de error: los que ya salieron del buffer lanzan LookupError
+        """
+        feed = ChangeFeed(capacity=3)
+        inicio = feed.last
+        seqs = [feed.publish({'id': i}) for i in range(5)]
+        self.assertEqual(seqs, list(range(inicio + 1, inicio + 6)))
+        self.assertEqual([e['id'] for e in feed.since(seqs[1])], [2, 3, 4])
+        self.assertEqual([e['id'] for e in feed.since(seqs[1], limit=1)], [2])
+        self.assertEqual(feed.since(seqs[4]), [])
+        with self.assertRaises(LookupError):
+            feed.since(seqs[0])
+        with self.assertRaises(LookupError):
+            feed.since(seqs[4] + 1)
+        # Después de clear, ni la última secuencia anterior sirve
+        feed.clear()
+        with self.assertRaises(LookupError):
+            feed.since(seqs[4])
+        self.assertEqual(feed.since(feed.last), [])
+
+    def test_espera_y_eventos_del_handler(self):
+        """
+        Caso de éxito: wait retorna al publicarse un evento y el handler
+        publica los cambios con los alias de antes y después
+        """
+        feed = ChangeFeed()
+        self.assertEqual(feed.wait(feed.last, timeout=0.01), [])
+        last = feed.last
+        threading.Timer(0.05, feed.publish, [{'id': 'x'}]).start()
+        self.assertEqual([e['id'] for e in feed.wait(last, timeout=5)], ['x'])
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            handler = DataHandler(os.path.join(tmpdir, 'data.json'))
+            last = handler.changes.last
+            task = handler.add_task({'id': 't1', 'status': 'pendiente',
+                                     'users': [{'usuario': 'ana', 'rol': 'programador'}]})
+            handler.remove_task_user(task, 'ana', 'programador')
+            handler.add_user({'id': 'ana'})
+            handler.remove_task('t1')
+            eventos = handler.changes.since(last)
+            self.assertEqual([(e['tipo'], e['accion'], e['usuarios']) for e in eventos], [
+                ('tarea', 'actualizar', ['ana']), ('tarea', 'actualizar', ['ana']),
+                ('usuario', 'actualizar', ['ana']), ('tarea', 'eliminar', [])])
+            self.assertEqual(eventos[0]['estado'], 'pendiente')
+            self.assertEqual(eventos[3]['version'], handler.task_version('t1'))
+            handler.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+class TestHistorialEstados(unittest.TestCase):
+    """
+    Pruebas unitarias para el historial de estados y los contadores
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'data.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_rangos_baldes_y_persistencia(self):
+        """
+        Caso de éxito: consultas por rango, por tarea y por balde, y el
+        historial se vuelve a leer del log después del flush
+        """
+        history = StatusHistory(self.filename + '.history')
+        base = 1000 * BUCKET_SECONDS
+        for i, (task_id, source, target) in enumerate([
+                ('a', None, 'pendiente'), ('b', None, 'pendiente'),
+                ('a', 'pendiente', 'en progreso'), ('a', 'en progreso', 'Finalizado'),
+                ('b', 'pendiente', None)]):
+            history.record(task_id, source, target, timestamp=base + i * 30)
+        # Un instante anterior al último se corrige para no romper el orden
+        history.record('c', None, 'pendiente', timestamp=base)
+        self.assertEqual(history.times[-1], base + 120)
+
+        self.assertEqual([e[1] for e in history.range(base + 30, base + 120)], ['b', 'a', 'a'])
+        self.assertEqual([e[3] for e in history.range(task_id='a', since=base + 30)],
+                         ['en progreso', 'Finalizado'])
+        self.assertEqual(len(history.range(limit=2)), 2)
+        self.assertEqual(history.histogram(None, None, 60), [
+            (base, {'pendiente': 2}), (base + 60, {'en progreso': 1, 'Finalizado': 1}),
+            (base + 120, {None: 1, 'pendiente': 1})])
+        self.assertEqual(history.rates(60, now=base + 130), {None: 1, 'pendiente': 1})
+        self.assertEqual(history.rates(180, now=base + 130)['pendiente'], 3)
+
+        history.close()
+        reloaded = StatusHistory(self.filename + '.history')
+        self.assertEqual(reloaded.range(), history.range())
+        reloaded.close()
+
+    def test_contadores_y_transiciones_del_handler(self):
+        """
+        Caso de éxito: los cambios de estado quedan en el historial y los
+        contadores incrementales coinciden con contarlos desde cero
+        """
+        handler = DataHandler(self.filename)
+        users = [{'usuario': 'ana', 'rol': 'programador'}]
+        handler.add_task({'id': 't1', 'status': 'pendiente', 'users': users})
+        counters = handler.status_counts
+        task = handler.add_task({'id': 't2', 'status': 'pendiente', 'users': users})
+        handler.set_status(task, 'Finalizado')
+        handler.set_status(task, 'Finalizado')
+        handler.add_task_user(task, 'beto', 'pruebas')
+        handler.remove_task('t1')
+
+        self.assertEqual([(e[1], e[2], e[3]) for e in handler.history.range()], [
+            ('t1', None, 'pendiente'), ('t2', None, 'pendiente'),
+            ('t2', 'pendiente', 'Finalizado'), ('t1', 'pendiente', None)])
+        self.assertEqual(counters.by_status, {'Finalizado': 1})
+        self.assertEqual(counters.by_user, {'ana': {'Finalizado': 1}, 'beto': {'Finalizado': 1}})
+        self.assertEqual(counters.by_role, {'programador': {'Finalizado': 1},
+                                            'pruebas': {'Finalizado': 1}})
+        expected = StatusCounters()
+        expected.load([('Finalizado', ('ana', 'beto'), frozenset(['programador', 'pruebas']))])
+        self.assertEqual(vars(counters), vars(expected))
+
+        handler.save_data()
+        handler.close()
+        self.assertEqual(len(StatusHistory(self.filename + '.history')), 4)
+
+    def test_log_diferido_y_recortado(self):
+        """
+        Caso de éxito: el log se lee en la primera consulta y, cuando la
+        mitad de las transiciones venció, el flush lo reescribe sin ellas
+        """
+        history = StatusHistory(self.filename + '.history')
+        for i in range(4):
+            history.record('viejo', None, 'pendiente', timestamp=1000 + i)
+        history.close()
+
+        history = StatusHistory(self.filename + '.history', max_age=3600)
+        history.record('t1', None, 'pendiente')
+        self.assertNotIn('times', history.__dict__)
+        self.assertEqual([e[1] for e in history.range()], ['t1'])
+        history.record('t1', 'pendiente', 'Finalizado')
+        history.close()
+        self.assertEqual([e[3] for e in StatusHistory(self.filename + '.history').range()],
+                         ['pendiente', 'Finalizado'])
+
+class TestMetricas(unittest.TestCase):
+    """
+    Pruebas unitarias para el registro de métricas en formato Prometheus
+    """
+
+    def test_histograma_contador_y_colectores(self):
+        """
+        Caso de éxito: los buckets son acumulativos y los colectores se
+        consultan al momento del render
+        """
+        registry = Registry()
+        latencia = Histogram(registry, 'latencia_seconds', 'Latencia', ('ruta',), (0.1, 1))
+        errores = Counter(registry, 'errores_total', 'Errores', ('tipo',))
+        latencia.observe(0.05, '/a')
+        latencia.observe(0.5, '/a')
+        latencia.observe(3, '/a')
+        errores.inc(2, 'con "comillas"')
+        tamaños = {'tareas': 1}
+        registry.add_collector(lambda: [('tareas', 'gauge', 'Tareas',
+                                         [({'kind': 'tasks'}, tamaños['tareas'])])])
+        tamaños['tareas'] = 7
+
+        texto = registry.render()
+        self.assertIn('latencia_seconds_bucket{ruta="/a",le="0.1"} 1\n', texto)
+        self.assertIn('latencia_seconds_bucket{ruta="/a",le="1"} 2\n', texto)
+        self.assertIn('latencia_seconds_bucket{ruta="/a",le="+Inf"} 3\n', texto)
+        self.assertIn('latencia_seconds_count{ruta="/a"} 3\n', texto)
+        self.assertIn('errores_total{tipo="con \\"comillas\\""} 2\n', texto)
+        self.assertIn('tareas{kind="tasks"} 7\n', texto)
+
+        registry.enabled = False
+        latencia.observe(0.05, '/a')
+        self.assertEqual(latencia.count('/a'), 3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,88 @@
+import unittest
+import os
+import random
+import sys
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dependency_graph import CycleError, DependencyGraph
+
+
+class TestDependencyGraph(unittest.TestCase):
+    """
+    Pruebas unitarias para el grafo incremental de dependencias
+    """
+
+    def setUp(self):
+        self.graph = DependencyGraph()
+        for task_id in 'abcd':
+            self.graph.add_task(task_id)
+
+    def assert_orden_valido(self, graph):
+        position = {t: i for i, t in enumerate(graph.topological_order())}
+        for task_id, deps in graph.deps.items():
+            for dep_id in deps:
+                self.assertLess(position[dep_id], position[task_id])
+
+    def test_rechaza_ciclos(self):
+        """
+        Caso de error: una dependencia que cierra un ciclo se rechaza sin modificar el grafo
+        """
+        self.graph.add_dependency('b', 'a')
+        self.graph.add_dependency('c', 'b')
+        with self.assertRaises(CycleError):
+            self.graph.add_dependency('a', 'c')
+        with self.assertRaises(CycleError):
+            self.graph.add_dependency('d', 'd')
+        self.assertEqual(self.graph.deps['a'], set())
+        self.assertTrue(self.graph.would_cycle('a', 'b'))
+        self.assertFalse(self.graph.would_cycle('d', 'c'))
+
+    def test_orden_topologico_incremental(self):
+        """
+        Caso de éxito: el orden se mantiene válido con inserciones aleatorias
+        """
+        rng = random.Random(7)
+        graph = DependencyGraph()
+        for i in range(200):
+            graph.add_task(i)
+        for _ in range(1000):
+            a, b = rng.randrange(200), rng.randrange(200)
+            try:
+                graph.add_dependency(a, b)
+            except CycleError:
+                self.assertIn(a, graph.transitive_dependencies(b) + [b])
+        self.assert_orden_valido(graph)
+
+    def test_listas_y_bloqueos(self):
+        """
+        Caso de éxito: las tareas listas y los bloqueos siguen a los cambios de estado
+        """
+        self.graph.add_dependency('b', 'a')
+        self.graph.add_dependency('c', 'b')
+        self.assertEqual(self.graph.ready(), ['a', 'd'])
+        self.assertEqual(self.graph.blocked_by('c'), ['b'])
+        self.assertEqual(self.graph.blocked_by('c', transitive=True), ['a', 'b'])
+
+        self.graph.set_finished('a', True)
+        self.assertEqual(sorted(self.graph.ready()), ['b', 'd'])
+        self.graph.remove_dependency('c', 'b')
+        self.assertEqual(sorted(self.graph.ready()), ['b', 'c', 'd'])
+        self.assertEqual(self.graph.transitive_dependents('a'), ['b'])
+
+    def test_carga_descarta_ciclos_existentes(self):
+        """
+        Caso de éxito: al cargar, las aristas que forman ciclos se descartan
+        """
+        graph = DependencyGraph()
+        graph.load([('a', False, ['a']), ('b', False, ['c']), ('c', True, ['b']),
+                    ('d', False, ['b', 'inexistente'])])
+        self.assertIn(('a', 'a'), graph.rejected)
+        self.assertEqual(len(graph.rejected), 2)
+        self.assert_orden_valido(graph)
+        self.assertIn('a', graph.ready())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,100 @@
+import unittest
+import os
+import random
+import sys
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dependency_graph import CycleError, DependencyGraph
+from schedule import Schedule
+
+
+class TestSchedule(unittest.TestCase):
+    """
+    Pruebas unitarias para el plan incremental sobre el grafo de dependencias
+    """
+
+    def setUp(self):
+        # a(2) -> b(3) -> d(1); a -> c(1) -> d; e(5) suelta
+        self.graph = DependencyGraph()
+        self.graph.load([('a', False, ()), ('b', False, ('a',)), ('c', False, ('a',)),
+                         ('d', False, ('b', 'c')), ('e', False, ())])
+        self.schedule = Schedule(self.graph)
+        self.schedule.load_tasks([('a', 2, ('ana',)), ('b', 3, ('beto',)), ('c', 1, ('ana',)),
+                                  ('d', 1, ('ana', 'beto')), ('e', 5, ())])
+
+    def test_camino_critico_y_carga(self):
+        """
+        Caso de éxito: inicio y fin más tempranos, camino crítico y carga por alias
+        """
+        self.assertEqual(self.schedule.start['d'], 5)
+        self.assertEqual(self.schedule.critical_path('d'), ['a', 'b', 'd'])
+        self.assertEqual(self.schedule.end(), (6, 'd'))
+        self.assertEqual(self.schedule.load, {'ana': [3, 4], 'beto': [2, 4]})
+
+    def test_cambios_recalculan_solo_dependientes(self):
+        """
+        Caso de éxito: terminar una tarea o cambiar una duración recalcula
+        solo las tareas que dependen de ella
+        """
+        self.graph.set_finished('b', True)
+        self.schedule.update('b', 3, ('beto',))
+        self.assertEqual(self.schedule.recomputed, 2)
+        self.assertEqual(self.schedule.critical_path('d'), ['a', 'c', 'd'])
+        self.assertEqual(self.schedule.end(), (5, 'e'))
+        self.assertEqual(self.schedule.load['beto'], [1, 1])
+
+        # c no cambia de fin: d no se recalcula
+        self.schedule.update('c', 1, ('caro',))
+        self.assertEqual(self.schedule.recomputed, 1)
+        self.assertEqual(self.schedule.load, {'ana': [2, 3], 'beto': [1, 1], 'caro': [1, 1]})
+
+        dependents = tuple(self.graph.dependents['a'])
+        self.graph.remove_task('a')
+        self.schedule.remove('a', dependents)
+        self.assertEqual(self.schedule.start['c'], 0)
+        self.assertEqual(self.schedule.critical_path('d'), ['c', 'd'])
+
+    def test_incremental_igual_a_reconstruir(self):
+        """
+        Caso de éxito: una secuencia aleatoria de cambios deja el mismo plan
+        que armarlo desde cero con el estado final
+        """
+        rng = random.Random(3)
+        graph = DependencyGraph()
+        schedule = Schedule(graph)
+        tasks = {}
+        for _ in range(400):
+            op = rng.random()
+            task_id = 't%d' % rng.randrange(40)
+            if task_id not in tasks or op < 0.3:
+                graph.add_task(task_id)
+                graph.set_finished(task_id, rng.random() < 0.2)
+                tasks[task_id] = (rng.randint(0, 5), tuple(rng.sample('abcd', rng.randint(0, 2))))
+            elif op < 0.8:
+                try:
+                    graph.add_dependency(task_id, rng.choice(list(tasks)))
+                except CycleError:
+                    pass
+            elif op < 0.9:
+                dependents = tuple(graph.dependents[task_id])
+                graph.remove_task(task_id)
+                del tasks[task_id]
+                schedule.remove(task_id, dependents)
+                continue
+            else:
+                for dep_id in list(graph.deps[task_id]):
+                    graph.remove_dependency(task_id, dep_id)
+            schedule.update(task_id, *tasks[task_id])
+
+        expected = Schedule(graph)
+        expected.load_tasks((t, duration, aliases) for t, (duration, aliases) in tasks.items())
+        self.assertEqual(schedule.finish, expected.finish)
+        self.assertEqual(schedule.critical, expected.critical)
+        self.assertEqual(schedule.load, expected.load)
+        self.assertEqual(schedule.end(), expected.end())
+
+
+if __name__ == '__main__':
+    unittest.main()
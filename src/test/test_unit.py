@@ -3,11 +3,14 @@ from unittest.mock import Mock, patch, MagicMock
 import json
 import sys
 import os
+import shutil
+import tempfile
 
 # Agregar el directorio padre al path para importar los módulos
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from controller import app, data_handler
+from data_handler import DataHandler
 from models.tarea import Tarea
 from models.usuario import Usuario
 from models.asignacion import Asignacion
@@ -25,10 +28,10 @@ class TestControllerEndpoints(unittest.TestCase):
         self.app = app.test_client()
         self.app.testing = True
         
-        # Mock del data_handler para evitar operaciones reales de archivo
-        self.mock_data_handler = Mock()
-        self.mock_data_handler.tasks = []
-        self.mock_data_handler.users = []
+        # DataHandler sobre un archivo temporal con save_data simulado,
+        # para evitar operaciones reales sobre data.json
+        self.tmpdir = tempfile.mkdtemp()
+        self.mock_data_handler = DataHandler(os.path.join(self.tmpdir, 'data.json'))
         self.mock_data_handler.save_data = Mock()
         
         # Reemplazar el data_handler global
@@ -39,8 +42,7 @@ class TestControllerEndpoints(unittest.TestCase):
         """
         Limpieza después de cada prueba
         """
-        self.mock_data_handler.tasks.clear()
-        self.mock_data_handler.users.clear()
+        shutil.rmtree(self.tmpdir)
 
     # ========== PRUEBAS PARA CREAR TAREA ==========
     
@@ -73,10 +75,13 @@ class TestControllerEndpoints(unittest.TestCase):
         self.mock_data_handler.save_data.assert_called_once()
         
         # Verificar estructura de la tarea creada
-        created_task = self.mock_data_handler.tasks[0]
+        created_task = self.mock_data_handler.tasks[0].to_dict()
         self.assertEqual(created_task['title'], task_data['nombre'])  # Cambiar 'nombre' por 'title'
         self.assertEqual(created_task['description'], task_data['descripcion'])  # Cambiar 'descripcion' por 'description'
         self.assertIn('users', created_task)
+        self.assertEqual(created_task['users'][0]['rol'], task_data['rol'])
+        self.assertEqual(self.mock_data_handler.query_tasks(role='programador'),
+                         [response_data['id']])
 
     def test_crear_tarea_datos_faltantes(self):
         """
@@ -102,6 +107,71 @@ class TestControllerEndpoints(unittest.TestCase):
         self.assertEqual(len(self.mock_data_handler.tasks), 0)
         self.mock_data_handler.save_data.assert_not_called()
 
+    # ========== PRUEBAS PARA LISTAR TAREAS ==========
+
+    def _crear_tareas_para_listado(self):
+        tareas = [
+            ("task-1", "Zeta", "pending", [("dev001", "programador")], []),
+            ("task-2", "Alfa", "Finalizado", [("dev001", "pruebas")], ["task-1"]),
+            ("task-3", "Beta", "pending", [("dev002", "programador")], ["task-1"]),
+            ("task-4", "Gama", "pending", [("dev002", "infra")], []),
+        ]
+        for task_id, titulo, estado, usuarios, dependencias in tareas:
+            self.mock_data_handler.add_task({
+                "id": task_id, "title": titulo, "status": estado,
+                "users": [{"usuario": u, "rol": r} for u, r in usuarios],
+                "dependencies": dependencias
+            })
+
+    def test_listar_tareas_con_filtros(self):
+        """
+        Caso de éxito: los filtros de estado, rol, usuario y dependencias se combinan
+        """
+        self._crear_tareas_para_listado()
+
+        def ids(query):
+            response = self.app.get('/tasks' + query)
+            self.assertEqual(response.status_code, 200)
+            return [t['id'] for t in json.loads(response.data)['tareas']]
+
+        self.assertEqual(ids(''), ["task-1", "task-2", "task-3", "task-4"])
+        self.assertEqual(ids('?estado=pending'), ["task-1", "task-3", "task-4"])
+        self.assertEqual(ids('?rol=programador&estado=pending'), ["task-1", "task-3"])
+        self.assertEqual(ids('?usuario=dev001&rol=pruebas'), ["task-2"])
+        self.assertEqual(ids('?usuario=dev002&rol=pruebas'), [])
+        self.assertEqual(ids('?dependencias=si'), ["task-2", "task-3"])
+        self.assertEqual(ids('?dependencias=no&usuario=dev002'), ["task-4"])
+
+        # Los índices siguen a los cambios de estado
+        self.app.post('/tasks/task-1', data=json.dumps({"estado": "Finalizado"}),
+                      content_type='application/json')
+        self.assertEqual(ids('?estado=Finalizado'), ["task-1", "task-2"])
+
+    def test_listar_tareas_orden_y_paginacion(self):
+        """
+        Caso de éxito: el orden se respeta al recorrer las páginas con cursor
+        """
+        self._crear_tareas_para_listado()
+
+        vistos = []
+        url = '/tasks?orden=-titulo&limit=3'
+        while url:
+            response_data = json.loads(self.app.get(url).data)
+            self.assertEqual(response_data['total'], 4)
+            vistos.extend(t['title'] for t in response_data['tareas'])
+            cursor = response_data['siguiente_cursor']
+            url = '/tasks?orden=-titulo&limit=3&cursor=%s' % cursor if cursor else None
+
+        self.assertEqual(vistos, ["Zeta", "Gama", "Beta", "Alfa"])
+
+    def test_listar_tareas_parametros_invalidos(self):
+        """
+        Caso de error: orden, filtro o cursor no válidos retornan 400
+        """
+        self.assertEqual(self.app.get('/tasks?orden=prioridad').status_code, 400)
+        self.assertEqual(self.app.get('/tasks?dependencias=tal_vez').status_code, 400)
+        self.assertEqual(self.app.get('/tasks?cursor=basura').status_code, 400)
+
     # ========== PRUEBAS PARA ACTUALIZAR ESTADO TAREA ==========
     
     def test_actualizar_estado_tarea_exitoso(self):
@@ -117,7 +187,7 @@ class TestControllerEndpoints(unittest.TestCase):
             "descripcion": "Descripción de prueba",
             "status": "pendiente"
         }
-        self.mock_data_handler.tasks.append(existing_task)
+        self.mock_data_handler.add_task(existing_task)
         
         # Datos para actualizar
         update_data = {"estado": "en_progreso"}
@@ -133,6 +203,7 @@ class TestControllerEndpoints(unittest.TestCase):
         self.assertEqual(response_data['mensaje'], "Estado actualizado exitosamente")
         
         # Verificar que el estado se actualizó
+        existing_task = self.mock_data_handler.get_task(task_id).to_dict()
         self.assertEqual(existing_task['status'], "en_progreso")
         self.mock_data_handler.save_data.assert_called_once()
 
@@ -170,7 +241,7 @@ class TestControllerEndpoints(unittest.TestCase):
             "nombre": "Tarea de prueba",
             "status": "pendiente"
         }
-        self.mock_data_handler.tasks.append(existing_task)
+        self.mock_data_handler.add_task(existing_task)
         
         # Datos sin campo estado
         update_data = {"otro_campo": "valor"}
@@ -186,9 +257,25 @@ class TestControllerEndpoints(unittest.TestCase):
         self.assertEqual(response_data['error'], "Falta el campo estado")
         
         # Verificar que el estado no cambió
+        existing_task = self.mock_data_handler.get_task(task_id).to_dict()
         self.assertEqual(existing_task['status'], "pendiente")
         self.mock_data_handler.save_data.assert_not_called()
 
+    def test_actualizar_estado_tarea_estado_no_valido(self):
+        """
+        Caso de error: un estado que no es string retorna 400 y no cambia la tarea
+        """
+        self.mock_data_handler.add_task({"id": "task-123", "status": "pendiente"})
+
+        response = self.app.post('/tasks/task-123',
+                                 data=json.dumps({"estado": ["pendiente"]}),
+                                 content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['error'], "Estado no válido")
+        self.assertEqual(self.mock_data_handler.get_task('task-123').status, "pendiente")
+        self.mock_data_handler.save_data.assert_not_called()
+
     # ========== PRUEBAS PARA GESTIONAR USUARIOS EN TAREA ==========
     
     def test_gestionar_usuarios_tarea_adicionar_exitoso(self):
@@ -203,7 +290,7 @@ class TestControllerEndpoints(unittest.TestCase):
             "nombre": "Tarea de prueba",
             "users": []
         }
-        self.mock_data_handler.tasks.append(existing_task)
+        self.mock_data_handler.add_task(existing_task)
         
         # Datos para adicionar usuario
         user_data = {
@@ -223,6 +310,7 @@ class TestControllerEndpoints(unittest.TestCase):
         self.assertEqual(response_data['mensaje'], "Usuarios actualizados exitosamente")
         
         # Verificar que el usuario se agregó
+        existing_task = self.mock_data_handler.get_task(task_id).to_dict()
         self.assertEqual(len(existing_task['users']), 1)
         self.assertEqual(existing_task['users'][0]['usuario'], "dev002")
         self.assertEqual(existing_task['users'][0]['rol'], "programador")
@@ -240,7 +328,7 @@ class TestControllerEndpoints(unittest.TestCase):
             "nombre": "Tarea de prueba",
             "users": []
         }
-        self.mock_data_handler.tasks.append(existing_task)
+        self.mock_data_handler.add_task(existing_task)
         
         # Datos con rol inválido
         user_data = {
@@ -260,6 +348,7 @@ class TestControllerEndpoints(unittest.TestCase):
         self.assertEqual(response_data['error'], "Rol no válido")
         
         # Verificar que no se agregó el usuario
+        existing_task = self.mock_data_handler.get_task(task_id).to_dict()
         self.assertEqual(len(existing_task['users']), 0)
         self.mock_data_handler.save_data.assert_not_called()
 
@@ -285,7 +374,8 @@ class TestControllerEndpoints(unittest.TestCase):
             "nombre": "Tarea dependiente"
         }
         
-        self.mock_data_handler.tasks.extend([main_task, dependency_task])
+        self.mock_data_handler.add_task(main_task)
+        self.mock_data_handler.add_task(dependency_task)
         
         # Datos para adicionar dependencia
         dependency_data = {
@@ -304,6 +394,7 @@ class TestControllerEndpoints(unittest.TestCase):
         self.assertEqual(response_data['mensaje'], "Dependencias actualizadas exitosamente")
         
         # Verificar que la dependencia se agregó
+        main_task = self.mock_data_handler.get_task(task_id).to_dict()
         self.assertIn(dependency_id, main_task['dependencies'])
         self.mock_data_handler.save_data.assert_called_once()
 
@@ -319,7 +410,7 @@ class TestControllerEndpoints(unittest.TestCase):
             "nombre": "Tarea principal",
             "dependencies": []
         }
-        self.mock_data_handler.tasks.append(main_task)
+        self.mock_data_handler.add_task(main_task)
         
         # Datos con tarea dependiente inexistente
         dependency_data = {
@@ -338,9 +429,47 @@ class TestControllerEndpoints(unittest.TestCase):
         self.assertEqual(response_data['error'], "Tarea dependiente no encontrada")
         
         # Verificar que no se agregó la dependencia
+        main_task = self.mock_data_handler.get_task(task_id).to_dict()
         self.assertEqual(len(main_task['dependencies']), 0)
         self.mock_data_handler.save_data.assert_not_called()
 
+    def test_gestionar_dependencias_tarea_ciclo(self):
+        """
+        Caso de error: una dependencia que cierra un ciclo se rechaza con 400
+        """
+        self.mock_data_handler.add_task({"id": "task-1", "users": [], "dependencies": ["task-2"]})
+        self.mock_data_handler.add_task({"id": "task-2", "users": [], "dependencies": []})
+
+        dependency_data = {"dependencytaskid": "task-1", "accion": "adicionar"}
+        response = self.app.post('/tasks/task-2/dependencies',
+                                 data=json.dumps(dependency_data),
+                                 content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['error'], "La dependencia crea un ciclo")
+        self.assertEqual(self.mock_data_handler.get_task('task-2').to_dict()['dependencies'], [])
+        self.mock_data_handler.save_data.assert_not_called()
+
+    def test_tareas_listas_y_bloqueos(self):
+        """
+        Caso de éxito: /tasks/ready y /tasks/<id>/blocked-by reflejan las dependencias
+        """
+        self.mock_data_handler.add_task({"id": "task-1", "status": "pending", "users": []})
+        self.mock_data_handler.add_task({"id": "task-2", "status": "pending", "users": [],
+                                         "dependencies": ["task-1"]})
+
+        response = self.app.get('/tasks/ready')
+        self.assertEqual([t['id'] for t in json.loads(response.data)['tareas']], ["task-1"])
+        response = self.app.get('/tasks/task-2/blocked-by')
+        self.assertEqual([t['id'] for t in json.loads(response.data)['bloqueada_por']], ["task-1"])
+
+        # Al finalizar la dependencia la tarea queda desbloqueada
+        self.app.post('/tasks/task-1', data=json.dumps({"estado": "Finalizado"}),
+                      content_type='application/json')
+        response = self.app.get('/tasks/ready')
+        self.assertEqual([t['id'] for t in json.loads(response.data)['tareas']], ["task-2"])
+        self.assertEqual(self.app.get('/tasks/task-9/blocked-by').status_code, 404)
+
     # ========== PRUEBAS PARA CREAR USUARIO ==========
     
     def test_crear_usuario_exitoso(self):
@@ -379,7 +508,7 @@ class TestControllerEndpoints(unittest.TestCase):
             "id": "dev003",
             "nombre": "Usuario Existente"
         }
-        self.mock_data_handler.users.append(existing_user)
+        self.mock_data_handler.add_user(existing_user)
         
         # Datos con alias duplicado
         user_data = {
@@ -415,7 +544,7 @@ class TestControllerEndpoints(unittest.TestCase):
             "nombre": "Desarrollador Uno",
             "contacto": "dev001@empresa.com"
         }
-        self.mock_data_handler.users.append(existing_user)
+        self.mock_data_handler.add_user(existing_user)
         
         # Configurar tarea asignada al usuario
         task_with_user = {
@@ -423,7 +552,7 @@ class TestControllerEndpoints(unittest.TestCase):
             "nombre": "Tarea asignada",
             "users": [{"usuario": user_alias, "rol": "programador"}]
         }
-        self.mock_data_handler.tasks.append(task_with_user)
+        self.mock_data_handler.add_task(task_with_user)
         
         # Realizar petición GET
         response = self.app.get(f'/usuarios/{user_alias}')
@@ -437,6 +566,118 @@ class TestControllerEndpoints(unittest.TestCase):
         self.assertEqual(len(response_data['tareas']), 1)
         self.assertEqual(response_data['tareas'][0]['id'], "task-123")
 
+    def test_get_usuario_paginado(self):
+        """
+        Caso de éxito: las tareas del usuario se recorren por páginas con cursor
+        """
+        self.mock_data_handler.add_user({"id": "dev001", "nombre": "Uno"})
+        for i in range(5):
+            self.mock_data_handler.add_task({
+                "id": "task-%d" % i,
+                "users": [{"usuario": "dev001", "rol": "programador"}]
+            })
+
+        vistos = []
+        url = '/usuarios/dev001?limit=2'
+        while True:
+            response = self.app.get(url)
+            self.assertEqual(response.status_code, 200)
+            response_data = json.loads(response.data)
+            self.assertLessEqual(len(response_data['tareas']), 2)
+            vistos.extend(t['id'] for t in response_data['tareas'])
+            if response_data['siguiente_cursor'] is None:
+                break
+            url = '/usuarios/dev001?limit=2&cursor=%s' % response_data['siguiente_cursor']
+
+        self.assertEqual(vistos, ["task-%d" % i for i in range(5)])
+        self.assertEqual(self.app.get('/usuarios/dev001?limit=0').status_code, 400)
+        self.assertEqual(self.app.get('/usuarios/dev001?cursor=3').status_code, 400)
+
+    def test_respuestas_armadas_iguales_a_jsonify(self):
+        """
+        Caso de éxito: las respuestas que se arman con el JSON en caché son
+        idénticas byte a byte a las que arma jsonify con el mismo documento
+        """
+        from flask import jsonify
+        self.mock_data_handler.add_user({"id": "dev001", "nombre": "Uno", "zona": "ñandú"})
+        self.mock_data_handler.add_user({"id": "dev002", "nombre": "Dos"})
+        for i in range(3):
+            self.mock_data_handler.add_task({
+                "id": "task-%d" % i, "title": "Diseño %d" % i, "status": "pending",
+                "users": [{"usuario": "dev001", "rol": "programador"},
+                          {"usuario": "dev002", "rol": "pruebas"}],
+                "dependencies": ["task-%d" % (i - 1)] if i else []
+            })
+
+        for url in ('/tasks?limit=2', '/tasks/search?q=diseno', '/tasks/ready',
+                    '/tasks/task-2/blocked-by?transitivo=1', '/usuarios/dev001',
+                    '/usuarios/dev001?limit=2', '/usuarios/dev002?limit=2'):
+            with self.subTest(url=url):
+                response = self.app.get(url)
+                self.assertEqual(response.status_code, 200)
+                with app.test_request_context():
+                    esperado = jsonify(json.loads(response.data)).get_data()
+                self.assertEqual(response.data, esperado)
+
+    def test_get_usuario_ndjson(self):
+        """
+        Caso de éxito: el formato ndjson envía el usuario y luego una tarea por línea
+        """
+        self.mock_data_handler.add_user({"id": "dev001", "nombre": "Uno"})
+        for i in range(3):
+            self.mock_data_handler.add_task({
+                "id": "task-%d" % i,
+                "users": [{"usuario": "dev001", "rol": "pruebas"}]
+            })
+
+        response = self.app.get('/usuarios/dev001?formato=ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lineas = [json.loads(l) for l in response.data.decode().splitlines()]
+        self.assertEqual(lineas[0]['id'], "dev001")
+        self.assertEqual([t['id'] for t in lineas[1:]], ["task-0", "task-1", "task-2"])
+
+    def test_get_usuario_etag(self):
+        """
+        Caso de éxito: una lectura sin cambios responde 304 y una modificación cambia el ETag
+        """
+        self.mock_data_handler.add_user({"id": "dev001", "nombre": "Uno", "tareas": []})
+        self.mock_data_handler.add_task({
+            "id": "task-1", "status": "pending",
+            "users": [{"usuario": "dev001", "rol": "programador"}]
+        })
+
+        response = self.app.get('/usuarios/dev001')
+        etag = response.headers['ETag']
+        self.assertEqual(json.loads(response.data)['tareas'][0]['status'], "pending")
+
+        response = self.app.get('/usuarios/dev001', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+
+        response = self.app.post('/tasks/task-1', json={"estado": "en_progreso"})
+        self.assertEqual(response.status_code, 200)
+        response = self.app.get('/usuarios/dev001', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(json.loads(response.data)['tareas'][0]['status'], "en_progreso")
+
+    def test_lecturas_usan_cache(self):
+        """
+        Caso de éxito: las lecturas repetidas reutilizan el JSON ya codificado
+        """
+        for i in range(3):
+            self.mock_data_handler.add_task({"id": "task-%d" % i, "status": "pending"})
+
+        primera = self.app.get('/tasks')
+        hits = self.mock_data_handler.cache.hits
+        segunda = self.app.get('/tasks')
+
+        self.assertEqual(primera.data, segunda.data)
+        self.assertEqual(self.mock_data_handler.cache.hits, hits + 3)
+        self.assertEqual(len(self.mock_data_handler.cache), 3)
+
     def test_get_usuario_no_encontrado(self):
         """
         Caso de error: Intentar obtener información de usuario inexistente
@@ -450,6 +691,80 @@ class TestControllerEndpoints(unittest.TestCase):
         response_data = json.loads(response.data)
         self.assertEqual(response_data['error'], "Usuario no encontrado")
 
+    # ========== PRUEBAS PARA OPERACIONES EN LOTE ==========
+
+    def test_batch_exitoso_con_referencias(self):
+        """
+        Caso de éxito: un lote crea tareas, las relaciona por referencia y guarda una vez
+        """
+        batch_data = {"operaciones": [
+            {"tipo": "crear_usuario", "datos": {"contacto": "dev001", "nombre": "Uno"}},
+            {"tipo": "crear_tarea", "ref": "a", "datos": {
+                "nombre": "A", "descripcion": "a", "usuario": "dev001", "rol": "programador"}},
+            {"tipo": "crear_tarea", "ref": "b", "datos": {
+                "nombre": "B", "descripcion": "b", "usuario": "dev001", "rol": "pruebas"}},
+            {"tipo": "gestionar_dependencias", "task_id": "$a",
+             "datos": {"dependencytaskid": "$b", "accion": "adicionar"}},
+            {"tipo": "gestionar_usuarios", "task_id": "$b",
+             "datos": {"usuario": "dev002", "rol": "infra", "accion": "adicionar"}},
+            {"tipo": "actualizar_estado", "task_id": "$b", "datos": {"estado": "Finalizado"}}
+        ]}
+
+        response = self.app.post('/batch',
+                                 data=json.dumps(batch_data),
+                                 content_type='application/json')
+
+        # Verificaciones
+        self.assertEqual(response.status_code, 200)
+        resultados = json.loads(response.data)['resultados']
+        self.assertEqual([r['status'] for r in resultados], [201, 201, 201, 200, 200, 200])
+        id_a = resultados[1]['respuesta']['id']
+        id_b = resultados[2]['respuesta']['id']
+        self.assertEqual(self.mock_data_handler.get_task(id_a).to_dict()['dependencies'], [id_b])
+        self.assertEqual(self.mock_data_handler.get_task(id_b).status, "Finalizado")
+        self.mock_data_handler.save_data.assert_called_once()
+
+    def test_batch_resultado_por_operacion(self):
+        """
+        Caso de error: una operación fallida no impide las demás y reporta su error
+        """
+        batch_data = {"operaciones": [
+            {"tipo": "actualizar_estado", "task_id": "task-inexistente",
+             "datos": {"estado": "Finalizado"}},
+            {"tipo": "crear_usuario", "datos": {"contacto": "dev003", "nombre": "Tres"}}
+        ]}
+
+        response = self.app.post('/batch',
+                                 data=json.dumps(batch_data),
+                                 content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        resultados = json.loads(response.data)['resultados']
+        self.assertEqual(resultados[0]['status'], 404)
+        self.assertEqual(resultados[0]['respuesta']['error'], "Tarea no encontrada")
+        self.assertEqual(resultados[1]['status'], 201)
+        self.mock_data_handler.save_data.assert_called_once()
+
+    def test_batch_invalido_no_aplica_nada(self):
+        """
+        Caso de error: si una operación no es válida no se aplica ninguna
+        """
+        batch_data = {"operaciones": [
+            {"tipo": "crear_usuario", "datos": {"contacto": "dev003", "nombre": "Tres"}},
+            {"tipo": "gestionar_usuarios", "task_id": "$noexiste",
+             "datos": {"usuario": "dev003", "rol": "jefe", "accion": "adicionar"}}
+        ]}
+
+        response = self.app.post('/batch',
+                                 data=json.dumps(batch_data),
+                                 content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        errores = json.loads(response.data)['errores']
+        self.assertEqual(errores[0]['indice'], 1)
+        self.assertEqual(len(self.mock_data_handler.users), 0)
+        self.mock_data_handler.save_data.assert_not_called()
+
     # ========== PRUEBA PARA ENDPOINT DUMMY ==========
     
     def test_dummy_endpoint(self):
@@ -466,6 +781,358 @@ class TestControllerEndpoints(unittest.TestCase):
         self.assertEqual(response_data['message'], "This is a dummy endpoint!")
 
 
+    # ========== PRUEBAS PARA BÚSQUEDA ==========
+
+    def test_buscar_tareas(self):
+        """
+        Caso de éxito: una tarea recién creada aparece en la búsqueda, sin
+        importar acentos, y la última palabra puede estar incompleta
+        """
+        self.app.post('/tasks', json={"nombre": "Diseño de la API",
+                                      "descripcion": "Definir la autenticación",
+                                      "usuario": "dev001", "rol": "programador"})
+        self.app.post('/tasks', json={"nombre": "Documentar",
+                                      "descripcion": "Guía de diseno",
+                                      "usuario": "dev001", "rol": "programador"})
+
+        response = self.app.get('/tasks/search?q=diseno')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual([t['title'] for t in data['tareas']], ['Diseño de la API', 'Documentar'])
+        self.assertEqual(len(data['puntajes']), 2)
+
+        data = json.loads(self.app.get('/tasks/search?q=autentica').data)
+        self.assertEqual([t['title'] for t in data['tareas']], ['Diseño de la API'])
+
+    def test_buscar_tareas_parametros_invalidos(self):
+        """
+        Caso de error: una consulta vacía o un límite inválido responden 400
+        """
+        self.assertEqual(self.app.get('/tasks/search').status_code, 400)
+        self.assertEqual(self.app.get('/tasks/search?q=%20').status_code, 400)
+        self.assertEqual(self.app.get('/tasks/search?q=api&limit=0').status_code, 400)
+
+    # ========== PRUEBAS PARA CONTACTOS ==========
+
+    def test_gestionar_contactos(self):
+        """
+        Caso de éxito: un contacto agregado y un colaborador de una tarea
+        aparecen en la red del usuario, con sus colaboradores a distancia 2
+        """
+        for alias in ('ana', 'beto', 'caro'):
+            self.app.post('/usuarios', json={"contacto": alias, "nombre": alias})
+        response = self.app.post('/usuarios/ana/contactos',
+                                 json={"contacto": "beto", "accion": "adicionar"})
+        self.assertEqual(response.status_code, 200)
+        task_id = json.loads(self.app.post('/tasks', json={
+            "nombre": "API", "descripcion": "REST", "usuario": "beto", "rol": "programador"}).data)['id']
+        self.app.post('/tasks/%s/users' % task_id,
+                      json={"usuario": "caro", "rol": "pruebas", "accion": "adicionar"})
+
+        data = json.loads(self.app.get('/usuarios/ana/contactos').data)
+        self.assertEqual(data['contactos'], [{"alias": "beto", "distancia": 1,
+                                              "tareas_compartidas": 0}])
+        data = json.loads(self.app.get('/usuarios/ana/contactos?profundidad=2').data)
+        self.assertEqual([c['alias'] for c in data['contactos']], ['beto', 'caro'])
+        self.assertFalse(data['truncado'])
+        data = json.loads(self.app.get('/usuarios/ana/contactos?profundidad=2&limit=1').data)
+        self.assertTrue(data['truncado'])
+
+        data = json.loads(self.app.get('/usuarios/caro/tareas-compartidas/beto').data)
+        self.assertEqual([t['id'] for t in data['tareas']], [task_id])
+        self.assertEqual(data['total'], 1)
+
+    def test_gestionar_contactos_errores(self):
+        """
+        Caso de error: usuario o contacto inexistente, contacto propio y
+        parámetros inválidos
+        """
+        self.app.post('/usuarios', json={"contacto": "ana", "nombre": "Ana"})
+        agregar = {"contacto": "nadie", "accion": "adicionar"}
+        self.assertEqual(self.app.post('/usuarios/ana/contactos', json=agregar).status_code, 404)
+        self.assertEqual(self.app.post('/usuarios/nadie/contactos', json=agregar).status_code, 404)
+        self.assertEqual(self.app.post('/usuarios/ana/contactos', json={
+            "contacto": "ana", "accion": "adicionar"}).status_code, 400)
+        self.assertEqual(self.app.post('/usuarios/ana/contactos', json={
+            "contacto": "ana"}).status_code, 400)
+        self.assertEqual(self.app.get('/usuarios/nadie/contactos').status_code, 404)
+        self.assertEqual(self.app.get('/usuarios/ana/contactos?profundidad=9').status_code, 400)
+
+    # ========== PRUEBAS PARA REGISTRO DE CAMBIOS ==========
+
+    def test_listar_cambios(self):
+        """
+        Caso de éxito: después de "ultimo" llegan solo los cambios del
+        usuario pedido; caso de error: una secuencia descartada responde 410
+        """
+        ultimo = json.loads(self.app.get('/changes').data)['ultimo']
+        task_id = json.loads(self.app.post('/tasks', json={
+            "nombre": "API", "descripcion": "REST", "usuario": "dev001", "rol": "programador"}).data)['id']
+        self.app.post('/tasks', json={
+            "nombre": "Otra", "descripcion": "REST", "usuario": "dev002", "rol": "programador"})
+        self.app.post('/tasks/%s' % task_id, json={"estado": "Finalizado"})
+
+        data = json.loads(self.app.get('/changes?since=%d&usuario=dev001' % ultimo).data)
+        self.assertEqual([(c['id'], c['estado']) for c in data['cambios']],
+                         [(task_id, 'pending'), (task_id, 'Finalizado')])
+        self.assertEqual(data['ultimo'], ultimo + 3)
+        data = json.loads(self.app.get('/changes?since=%d' % data['ultimo']).data)
+        self.assertEqual(data['cambios'], [])
+
+        self.assertEqual(self.app.get('/changes?since=%d' % (ultimo - 1)).status_code, 410)
+        self.assertEqual(self.app.get('/changes?since=abc').status_code, 400)
+
+    def test_stream_cambios(self):
+        """
+        Caso de éxito: el stream SSE envía los cambios filtrados por tarea
+        desde Last-Event-ID
+        """
+        ultimo = json.loads(self.app.get('/changes').data)['ultimo']
+        task_id = json.loads(self.app.post('/tasks', json={
+            "nombre": "API", "descripcion": "REST", "usuario": "dev001", "rol": "programador"}).data)['id']
+        self.app.post('/usuarios', json={"contacto": "dev001", "nombre": "Dev"})
+
+        response = self.app.get('/changes/stream?tarea=%s' % task_id,
+                                headers={'Last-Event-ID': str(ultimo)}, buffered=False)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        chunks = iter(response.response)
+        self.assertEqual(next(chunks), b'retry: 3000\n\n')
+        evento = next(chunks).decode()
+        response.close()
+        self.assertTrue(evento.startswith('id: %d\nevent: cambio\n' % (ultimo + 1)))
+        self.assertEqual(json.loads(evento.split('data: ')[1])['id'], task_id)
+
+    # ========== PRUEBAS PARA PLANIFICACIÓN ==========
+
+    def test_plan_y_camino_critico(self):
+        """
+        Caso de éxito: el plan combina dependencias, estimaciones y
+        asignaciones, y se actualiza al cambiar un estado o una duración
+        """
+        def crear(nombre, usuario, duracion):
+            return json.loads(self.app.post('/tasks', json={
+                "nombre": nombre, "descripcion": "", "usuario": usuario,
+                "rol": "programador", "duracion": duracion}).data)['id']
+        diseno = crear("Diseño", "ana", 3)
+        api = crear("API", "beto", 5)
+        pruebas = crear("Pruebas", "ana", 2)
+        for tarea, dependencia in ((api, diseno), (pruebas, api)):
+            self.app.post('/tasks/%s/dependencies' % tarea,
+                          json={"dependencytaskid": dependencia, "accion": "adicionar"})
+
+        data = json.loads(self.app.get('/schedule?usuario=ana').data)
+        self.assertEqual(data['duracion_total'], 10)
+        self.assertEqual([t['id'] for t in data['camino_critico']], [diseno, api, pruebas])
+        self.assertEqual(data['carga'][0], {"usuario": "ana", "tareas": 2, "duracion": 5})
+        self.assertEqual([(t['id'], t['inicio']) for t in data['tareas']],
+                         [(diseno, 0), (pruebas, 8)])
+
+        self.app.post('/tasks/%s' % diseno, json={"estado": "Finalizado"})
+        response = self.app.post('/tasks/%s/duracion' % api, json={"duracion": 1})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(self.app.get('/tasks/%s/critical-path' % pruebas).data)
+        self.assertEqual(data['fin'], 3)
+        self.assertEqual([(t['id'], t['inicio'], t['fin']) for t in data['camino']],
+                         [(api, 0, 1), (pruebas, 1, 3)])
+
+    def test_plan_errores(self):
+        """
+        Caso de error: tarea inexistente, duración inválida y límite inválido
+        """
+        self.assertEqual(self.app.get('/tasks/nada/critical-path').status_code, 404)
+        self.assertEqual(self.app.post('/tasks/nada/duracion',
+                                       json={"duracion": 1}).status_code, 404)
+        self.assertEqual(self.app.post('/tasks', json={
+            "nombre": "x", "descripcion": "", "usuario": "ana", "rol": "programador",
+            "duracion": -1}).status_code, 400)
+        self.assertEqual(self.app.get('/schedule?limit=0').status_code, 400)
+        data = json.loads(self.app.get('/schedule').data)
+        self.assertEqual(data, {"duracion_total": 0, "camino_critico": [], "carga": []})
+
+    # ========== PRUEBAS PARA ESTADÍSTICAS ==========
+
+    def test_estadisticas_e_historial(self):
+        """
+        Caso de éxito: /stats cuenta por estado, rol y usuario y
+        /stats/history devuelve los cambios de estado de una tarea
+        """
+        ids = [json.loads(self.app.post('/tasks', json={
+            "nombre": "Tarea", "descripcion": "", "usuario": usuario, "rol": "programador"}).data)['id']
+            for usuario in ('ana', 'ana', 'beto')]
+        self.app.post('/tasks/%s' % ids[0], json={"estado": "Finalizado"})
+
+        data = json.loads(self.app.get('/stats?usuario=ana').data)
+        self.assertEqual(data['tareas'], 3)
+        self.assertEqual(data['por_estado'], {"pending": 2, "Finalizado": 1})
+        self.assertEqual(data['usuario'], {"pending": 1, "Finalizado": 1})
+        self.assertEqual(data['transiciones']['ultima_hora'], {"pending": 3, "Finalizado": 1})
+        self.assertEqual(data['historial'], 4)
+
+        data = json.loads(self.app.get('/stats/history?tarea=%s' % ids[0]).data)
+        self.assertEqual([(t['desde'], t['hacia']) for t in data['transiciones']],
+                         [(None, "pending"), ("pending", "Finalizado")])
+        data = json.loads(self.app.get('/stats/history?intervalo=86400').data)
+        self.assertEqual(sum(sum(b['transiciones'].values()) for b in data['baldes']), 4)
+        self.assertEqual(self.app.get('/stats/history?desde=ayer').status_code, 400)
+
+    # ========== PRUEBAS PARA MÉTRICAS Y PROFILER ==========
+
+    def test_metricas_prometheus(self):
+        """
+        Caso de éxito: /metrics expone latencias por ruta, tamaños y caché
+        """
+        self.app.post('/tasks', json={"nombre": "a", "descripcion": "b",
+                                      "usuario": "dev001", "rol": "programador"})
+        self.app.get('/tasks?estado=pending')
+
+        response = self.app.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        texto = response.get_data(as_text=True)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', texto)
+        self.assertIn('http_request_duration_seconds_count{route="/tasks",method="POST",'
+                      'status="201"}', texto)
+        self.assertIn('data_records{kind="tasks"} 1', texto)
+        self.assertIn('data_tasks_by_status{status="pending"} 1', texto)
+        self.assertIn('response_cache_misses_total', texto)
+        self.assertIn('query_scanned_records_bucket', texto)
+
+    def test_profiler_en_caliente(self):
+        """
+        Caso de éxito: el profiler se prende, muestrea y se apaga por la API
+        """
+        import controller
+        response = self.app.post('/profiler', json={"accion": "iniciar", "intervalo_ms": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.data)['activo'])
+        try:
+            for _ in range(50):
+                self.app.get('/tasks')
+                if controller.profiler.samples:
+                    break
+        finally:
+            response = self.app.post('/profiler', json={"accion": "detener"})
+        self.assertFalse(json.loads(response.data)['activo'])
+        self.assertGreater(controller.profiler.samples, 0)
+        self.assertEqual(self.app.get('/profiler').status_code, 200)
+
+        response = self.app.post('/profiler', json={"accion": "iniciar", "intervalo_ms": 0})
+        self.assertEqual(response.status_code, 400)
+
+    # ========== PRUEBAS PARA RESHARD ==========
+
+    def test_cambiar_shards(self):
+        """
+        Caso de éxito: con el backend sharded se reparte en otra cantidad de
+        shards; con json o una cantidad inválida se responde 400
+        """
+        response = self.app.post('/shards', json={"cantidad": 4})
+        self.assertEqual(response.status_code, 400)
+
+        import controller
+        handler = DataHandler(os.path.join(self.tmpdir, 'data.shards'), backend='sharded')
+        controller.data_handler = handler
+        self.app.post('/tasks', json={"nombre": "a", "descripcion": "b",
+                                      "usuario": "dev001", "rol": "programador"})
+        response = self.app.post('/shards', json={"cantidad": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {"shards": 3, "generacion": 1})
+        self.assertEqual(self.app.post('/shards', json={"cantidad": 0}).status_code, 400)
+        handler.close()
+        self.assertFalse(controller.profiler.running)
+
+
+
+class TestFabricaAplicacion(unittest.TestCase):
+    """
+    Pruebas unitarias para create_app y la creación diferida del DataHandler
+    """
+
+    def setUp(self):
+        import controller
+        self.controller = controller
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'otro.json')
+        with open(self.filename, 'w') as f:
+            json.dump({'tasks': [{'id': 't1', 'status': 'pending', 'users': []}],
+                       'users': []}, f)
+        self.previo = controller.data_handler, controller.workspaces
+        controller.data_handler = controller.workspaces = None
+
+    def tearDown(self):
+        if self.controller.data_handler is not None:
+            self.controller.data_handler.close()
+        if self.controller.workspaces is not None:
+            self.controller.workspaces.close()
+        self.controller.data_handler, self.controller.workspaces = self.previo
+        shutil.rmtree(self.tmpdir)
+
+    def test_datos_se_cargan_en_la_primera_peticion(self):
+        """
+        Caso de éxito: create_app no lee los datos; la primera petición crea
+        el DataHandler con la ruta de la configuración
+        """
+        aplicacion = self.controller.create_app({'DATA_PATH': self.filename})
+        self.assertIsNone(self.controller.data_handler)
+        response = aplicacion.test_client().get('/tasks')
+        self.assertEqual(json.loads(response.data)['total'], 1)
+        self.assertEqual(self.controller.data_handler.filename, self.filename)
+
+    def test_preload(self):
+        """
+        Caso de éxito: con DATA_PRELOAD los datos y los índices pedidos se
+        arman al crear la aplicación
+        """
+        self.controller.create_app({'DATA_PATH': self.filename, 'DATA_PRELOAD': True,
+                                    'DATA_PRELOAD_INDICES': ['text_index']})
+        self.assertIn('text_index', self.controller.data_handler.__dict__)
+
+    def test_rutas_por_espacio_de_trabajo(self):
+        """
+        Caso de éxito: las rutas bajo /w/<espacio> usan los datos de ese
+        espacio; un espacio que no existe responde 404
+        """
+        client = self.controller.create_app({
+            'DATA_PATH': self.filename,
+            'WORKSPACES_DIR': os.path.join(self.tmpdir, 'espacios')}).test_client()
+        self.assertEqual(client.get('/workspaces').status_code, 200)
+        self.assertEqual(client.put('/workspaces/equipo').status_code, 201)
+        self.assertEqual(client.put('/workspaces/equipo').status_code, 200)
+        response = client.post('/w/equipo/tasks', json={
+            "nombre": "a", "descripcion": "b", "usuario": "dev001", "rol": "programador"})
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(json.loads(client.get('/w/equipo/tasks').data)['total'], 1)
+        # Ni /workspaces ni las rutas de un espacio cargan los datos por defecto
+        self.assertIsNone(self.controller.data_handler)
+        self.assertEqual(json.loads(client.get('/tasks').data)['total'], 1)
+        self.assertEqual(json.loads(client.get('/workspaces').data)['espacios'],
+                         [{"id": "equipo", "cargado": True, "bytes": 2700}])
+        self.assertEqual(client.get('/w/otro/tasks').status_code, 404)
+        self.assertEqual(client.put('/workspaces/a.b').status_code, 400)
+
+    def test_rutas_de_operacion(self):
+        """
+        Caso de error: /metrics, /profiler y /shards no existen bajo
+        /w/<espacio>, piden el token configurado y se pueden desactivar
+        """
+        client = self.controller.create_app({
+            'DATA_PATH': self.filename, 'ADMIN_TOKEN': 'secreto',
+            'WORKSPACES_DIR': os.path.join(self.tmpdir, 'espacios')}).test_client()
+        client.put('/workspaces/equipo')
+        self.assertEqual(client.get('/w/equipo/metrics').status_code, 404)
+        self.assertEqual(client.post('/w/equipo/shards', json={"cantidad": 2}).status_code, 404)
+        self.assertEqual(client.get('/metrics').status_code, 401)
+        self.assertEqual(client.get('/profiler', headers={
+            'Authorization': 'Bearer otro'}).status_code, 401)
+        self.assertEqual(client.get('/metrics', headers={
+            'Authorization': 'Bearer secreto'}).status_code, 200)
+
+        client = self.controller.create_app({'DATA_PATH': self.filename,
+                                             'ADMIN_ROUTES': False}).test_client()
+        self.assertEqual(client.get('/metrics').status_code, 404)
+
+
 if __name__ == '__main__':
     # Configurar el runner de pruebas
     unittest.main(verbosity=2)
\ No newline at end of file
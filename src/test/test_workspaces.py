@@ -0,0 +1,92 @@
+import unittest
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import weakref
+
+# Agregar el directorio padre al path para importar los módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workspaces
+from workspaces import BYTES_POR_REGISTRO, WorkspaceManager
+
+
+class TestWorkspaceManager(unittest.TestCase):
+    """
+    Pruebas unitarias para los espacios de trabajo y su descarga por LRU
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        # Presupuesto para dos espacios de una tarea cada uno
+        self.manager = WorkspaceManager(self.tmpdir, 2 * BYTES_POR_REGISTRO)
+        for workspace_id in ('a', 'b', 'c'):
+            self.manager.create(workspace_id)
+            handler = self.manager.acquire(workspace_id)
+            handler.add_task({'id': workspace_id + '1', 'status': 'pending', 'users': []})
+            handler.save_data()
+            self.manager.release(workspace_id)
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_descarga_el_menos_usado_y_recarga(self):
+        """
+        Caso de éxito: al pasar el presupuesto se descarga el espacio usado
+        hace más tiempo, y el próximo acceso lo recarga con sus datos
+        """
+        self.assertEqual([w for w, size in self.manager.list() if size is not None], ['b', 'c'])
+
+        loads = workspaces.LOADS.value()
+        handler = self.manager.acquire('a')
+        self.assertEqual([t.id for t in handler.tasks], ['a1'])
+        self.manager.release('a')
+        self.assertEqual(workspaces.LOADS.value(), loads + 1)
+        self.assertEqual([w for w, size in self.manager.list() if size is not None], ['a', 'c'])
+
+    def test_no_descarga_espacios_en_uso(self):
+        """
+        Caso de éxito: un espacio con una petición en curso no se descarga
+        aunque sea el menos usado
+        """
+        self.manager.acquire('b')
+        self.manager.acquire('c')
+        self.manager.acquire('a')
+        self.assertEqual(len([w for w, size in self.manager.list() if size is not None]), 3)
+        for workspace_id in ('b', 'c', 'a'):
+            self.manager.release(workspace_id)
+        self.assertEqual([w for w, size in self.manager.list() if size is not None], ['a', 'c'])
+
+    def test_espacio_descargado_se_libera(self):
+        """
+        Caso de éxito: en modo async el DataHandler de un espacio descargado
+        no queda referenciado y se libera
+        """
+        manager = WorkspaceManager(self.tmpdir, 1, durability='async', flush_ms=1)
+        refs = []
+        for workspace_id in ('a', 'b', 'c'):
+            refs.append(weakref.ref(manager.acquire(workspace_id)))
+            manager.release(workspace_id)
+        gc.collect()
+        self.assertEqual([ref() is None for ref in refs], [True, True, False])
+        manager.close()
+
+    def test_espacio_inexistente_o_invalido(self):
+        """
+        Caso de error: un espacio que no existe no se carga y un id con
+        separadores de ruta no se crea
+        """
+        with self.assertRaises(KeyError):
+            self.manager.acquire('nada')
+        with self.assertRaises(KeyError):
+            self.manager.acquire('..')
+        with self.assertRaises(ValueError):
+            self.manager.create('../afuera')
+        self.assertFalse(self.manager.create('a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
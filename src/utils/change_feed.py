@@ -0,0 +1,80 @@
+import itertools
+import threading
+import time
+from collections import deque
+
+
+class ChangeFeed:
+    """
+    Registro de cambios con secuencia creciente, guardado en un buffer
+    circular de ``capacity`` eventos.
+
+    La secuencia arranca en el reloj en microsegundos, así que sigue
+    creciendo después de reiniciar el proceso: un cliente que vuelve con una
+    secuencia anterior al reinicio cae fuera del buffer y sabe que tiene que
+    releer todo, en lugar de recibir eventos que no corresponden.
+
+    Los lectores esperan eventos nuevos con ``wait`` sobre una condición
+    propia, sin tomar el lock de los datos.
+    """
+
+    def __init__(self, capacity=10000):
+        if capacity < 1:
+            raise ValueError("El registro de cambios necesita al menos un lugar")
+        self.capacity = capacity
+        self._events = deque(maxlen=capacity)
+        self._seq = itertools.count(time.time_ns() // 1000)
+        # Última secuencia emitida y la del evento guardado más viejo
+        self.last = next(self._seq)
+        self.first = self.last + 1
+        self.published = 0
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._events)
+
+    def publish(self, event):
+        """Agrega ``event`` (un dict) con su secuencia en ``seq``; la retorna."""
+        with self._cond:
+            seq = next(self._seq)
+            event['seq'] = seq
+            if len(self._events) == self.capacity:
+                self.first = self._events[0]['seq'] + 1
+            self._events.append(event)
+            self.last = seq
+            self.published += 1
+            self._cond.notify_all()
+        return seq
+
+    def clear(self):
+        """Descarta los eventos guardados: los clientes deben releer todo."""
+        with self._cond:
+            self._events.clear()
+            # Una secuencia sin evento: quien venía de antes queda fuera del buffer
+            self.last = next(self._seq)
+            self.first = self.last + 1
+            self._cond.notify_all()
+
+    def since(self, seq, limit=None):
+        """
+        Eventos posteriores a ``seq``, hasta ``limit``. Lanza LookupError si
+        ya se descartaron eventos posteriores a ``seq`` o si ``seq`` es de
+        una secuencia que este registro no emitió.
+        """
+        with self._cond:
+            return self._since(seq, limit)
+
+    def wait(self, seq, timeout=None, limit=None):
+        """Como ``since``, pero espera hasta ``timeout`` segundos a que haya algo."""
+        with self._cond:
+            if self.last <= seq:
+                self._cond.wait_for(lambda: self.last > seq or self.first > seq + 1, timeout)
+            return self._since(seq, limit)
+
+    def _since(self, seq, limit):
+        if seq < self.first - 1 or seq > self.last:
+            raise LookupError(seq)
+        # Los eventos guardados tienen secuencias consecutivas
+        start = len(self._events) - (self.last - seq)
+        stop = len(self._events) if limit is None else min(len(self._events), start + limit)
+        return [self._events[i] for i in range(start, stop)]
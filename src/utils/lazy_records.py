@@ -0,0 +1,189 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+
+
+class LazyList:
+    """
+    Lista de modelos respaldada por una sección de un snapshot.
+
+    Un elemento se decodifica la primera vez que se pide y desde entonces
+    vive en ``_overlay``, junto con los que se reemplazan o agregan; los que
+    nunca se tocan siguen solo en el mmap. Soporta lo que DataHandler hace
+    con sus listas: índice, asignación, append, pop del último y len.
+
+    ``removed`` son posiciones de la sección que no forman parte de la lista
+    (registros que el journal borró); el resto conserva su orden y
+    ``_order`` traduce cada posición de la lista a la de la sección.
+    """
+
+    def __init__(self, section, decode, removed=()):
+        self._section = section
+        self._decode = decode
+        self._overlay = {}
+        if removed:
+            self._order = array('I', (i for i in range(len(section)) if i not in removed))
+            self._length = len(self._order)
+        else:
+            self._order = None
+            self._length = len(section)
+
+    def section_index(self, i):
+        """Posición en la sección del elemento ``i``, que no fue agregado después."""
+        return i if self._order is None else self._order[i]
+
+    def index(self, record_id):
+        """Posición en la lista del id de la sección; KeyError si no está."""
+        i = self._section.position(record_id)
+        if self._order is None:
+            return i
+        j = bisect_left(self._order, i)
+        if j == len(self._order) or self._order[j] != i:
+            raise KeyError(record_id)
+        return j
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._length
+        record = self._overlay.get(i)
+        if record is None:
+            if not 0 <= i < self._length:
+                raise IndexError(i)
+            record = self._overlay[i] = self._decode(
+                self._section.record_at(self.section_index(i)))
+        return record
+
+    def __setitem__(self, i, record):
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError(i)
+        self._overlay[i] = record
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self[i]
+
+    def append(self, record):
+        self._overlay[self._length] = record
+        self._length += 1
+
+    def pop(self):
+        record = self[self._length - 1]
+        self._length -= 1
+        del self._overlay[self._length]
+        return record
+
+    def peek(self, i):
+        """El modelo en ``i`` si ya está decodificado; si no, None."""
+        return self._overlay.get(i)
+
+    def id_at(self, i):
+        record = self._overlay.get(i)
+        return record.id if record is not None else self._section.id_at(self.section_index(i))
+
+    def ids(self):
+        return (self.id_at(i) for i in range(self._length))
+
+    def copy(self):
+        """Copia que comparte el mmap y los modelos, en O(elementos tocados)."""
+        other = LazyList.__new__(LazyList)
+        other._section = self._section
+        other._decode = self._decode
+        other._overlay = dict(self._overlay)
+        other._order = self._order
+        other._length = self._length
+        return other
+
+    def entries(self):
+        """
+        Los modelos tocados y, para el resto, el registro crudo del snapshot,
+        para reescribirlo sin decodificar lo que no cambió.
+        """
+        return (self.entry(i) for i in range(self._length))
+
+    def entry(self, i):
+        record = self._overlay.get(i)
+        return record if record is not None else self._section.raw_at(self.section_index(i))
+
+    @property
+    def loaded(self):
+        """Cantidad de elementos decodificados o modificados."""
+        return len(self._overlay)
+
+
+class Reordered:
+    """
+    Vista de solo lectura de una lista en el orden de ``positions``, para
+    escribirla con ``entries`` como si fuera una LazyList.
+    """
+
+    def __init__(self, items, positions):
+        self._items = items
+        self._positions = positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __iter__(self):
+        return (self._items[i] for i in self._positions)
+
+    def entries(self):
+        return (self._items.entry(i) for i in self._positions)
+
+
+class LazyDict(MutableMapping):
+    """
+    Diccionario cuyas claves no modificadas se resuelven con ``lookup`` (que
+    lanza KeyError si no existe) y se guardan al primer acceso. Las claves
+    borradas se recuerdan para no volver a buscarlas en el respaldo.
+    """
+
+    def __init__(self, lookup, keys, contains=None):
+        self._lookup = lookup
+        self._keys = keys
+        self._contains = contains
+        self._overlay = {}
+        self._deleted = set()
+
+    def __getitem__(self, key):
+        try:
+            return self._overlay[key]
+        except KeyError:
+            pass
+        if key in self._deleted:
+            raise KeyError(key)
+        value = self._overlay[key] = self._lookup(key)
+        return value
+
+    def __contains__(self, key):
+        if key in self._overlay:
+            return True
+        if key in self._deleted:
+            return False
+        if self._contains is not None:
+            return self._contains(key)
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __setitem__(self, key, value):
+        self._overlay[key] = value
+        self._deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._overlay.pop(key, None)
+        self._deleted.add(key)
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return sum(1 for _ in self._keys())
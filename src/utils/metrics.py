@@ -0,0 +1,163 @@
+import threading
+from bisect import bisect_left
+
+# Latencias típicas de una petición o un save, en segundos
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(pairs):
+    pairs = list(pairs)
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(value)) for name, value in pairs)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class Registry:
+    """
+    Conjunto de métricas expuestas en formato de texto de Prometheus.
+
+    Además de las métricas propias acepta colectores: funciones que al
+    momento del scrape retornan ``[(nombre, tipo, ayuda, [(labels, valor)])]``,
+    para valores que ya se llevan en otro lado (tamaños, contadores de la
+    caché) y no conviene duplicar en cada operación. Con ``enabled`` en
+    False las observaciones retornan sin hacer nada.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+        return collector
+
+    def remove_collector(self, collector):
+        with self._lock:
+            self._collectors.remove(collector)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append('# HELP %s %s' % (name, help_text))
+                lines.append('# TYPE %s %s' % (name, kind))
+                for labels, value in samples:
+                    lines.append('%s%s %s' % (name, _format_labels(labels.items()),
+                                              _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help_text, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        registry.register(self)
+
+    def _header(self):
+        return ['# HELP %s %s' % (self.name, self.help), '# TYPE %s %s' % (self.name, self.kind)]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, *labels):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append('%s%s %s' % (self.name, _format_labels(zip(self.labelnames, labels)),
+                                      _format_value(value)))
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        if not self.registry.enabled:
+            return
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._values.get(labels)
+            if child is None:
+                # Un contador por bucket (el último es +Inf) y la suma
+                child = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            child[i] += 1
+            child[-1] += value
+
+    def count(self, *labels):
+        child = self._values.get(labels)
+        return sum(child[:-1]) if child else 0
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = sorted((labels, list(child)) for labels, child in self._values.items())
+        for labels, child in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), child):
+                cumulative += count
+                lines.append('%s_bucket%s %d' % (
+                    self.name,
+                    _format_labels(list(zip(self.labelnames, labels)) + [('le', _format_value(bound))]),
+                    cumulative))
+            suffix = _format_labels(zip(self.labelnames, labels))
+            lines.append('%s_sum%s %s' % (self.name, suffix, _format_value(child[-1])))
+            lines.append('%s_count%s %d' % (self.name, suffix, cumulative))
+        return lines
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help_text, labelnames=(), registry=REGISTRY):
+    return Counter(registry, name, help_text, labelnames)
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+    return Histogram(registry, name, help_text, labelnames, buckets)
@@ -0,0 +1,93 @@
+from bisect import bisect_left, bisect_right
+
+
+class PostingList:
+    """
+    Lista de ids ordenada por una clave con cursores estables.
+
+    Cada id se guarda con una clave numérica única que provee quien inserta
+    (el orden de creación de la tarea); un cursor es la clave del último id
+    entregado, de modo que retomar una página es una búsqueda binaria y no
+    depende de cuántos ids se hayan borrado entre tanto. Los borrados dejan
+    un hueco que se compacta cuando los huecos superan a los ids vivos.
+    """
+
+    __slots__ = ('_seqs', '_ids', '_index', '_dead')
+
+    def __init__(self):
+        self._seqs = []
+        self._ids = []
+        self._index = {}    # id -> clave
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, item):
+        return item in self._index
+
+    def __iter__(self):
+        for item in self._ids:
+            if item is not None:
+                yield item
+
+    def add(self, item, seq):
+        if item in self._index:
+            return
+        self._index[item] = seq
+        seqs = self._seqs
+        if not seqs or seq > seqs[-1]:
+            seqs.append(seq)
+            self._ids.append(item)
+            return
+        position = bisect_left(seqs, seq)
+        if position < len(seqs) and seqs[position] == seq and self._ids[position] is None:
+            # Hueco que dejó el mismo id al desasignarse
+            self._ids[position] = item
+            self._dead -= 1
+            return
+        seqs.insert(position, seq)
+        self._ids.insert(position, item)
+
+    def discard(self, item):
+        seq = self._index.pop(item, None)
+        if seq is None:
+            return
+        self._ids[bisect_left(self._seqs, seq)] = None
+        self._dead += 1
+        if self._dead > 32 and self._dead * 2 > len(self._ids):
+            self._compact()
+
+    def page(self, cursor=None, limit=None):
+        """
+        Retorna ``(ids, siguiente_cursor)`` con hasta ``limit`` ids posteriores
+        a ``cursor``. ``siguiente_cursor`` es None si no quedan más.
+        """
+        ids, seqs = self._ids, self._seqs
+        position = 0 if cursor is None else bisect_right(seqs, cursor)
+        items = []
+        while position < len(ids):
+            item = ids[position]
+            if item is not None:
+                if limit is not None and len(items) >= limit:
+                    return items, seqs[last] if items else cursor
+                items.append(item)
+                last = position
+            position += 1
+        return items, None
+
+    def iter_from(self, cursor=None):
+        """Itera de forma perezosa los ids posteriores a ``cursor``."""
+        ids = self._ids
+        position = 0 if cursor is None else bisect_right(self._seqs, cursor)
+        while position < len(ids):
+            item = ids[position]
+            if item is not None:
+                yield item
+            position += 1
+
+    def _compact(self):
+        live = [(seq, item) for seq, item in zip(self._seqs, self._ids) if item is not None]
+        self._seqs = [seq for seq, _ in live]
+        self._ids = [item for _, item in live]
+        self._dead = 0
@@ -0,0 +1,49 @@
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Caché LRU de documentos JSON ya codificados.
+
+    Cada entrada guarda la versión del registro con la que se codificó; una
+    consulta con otra versión cuenta como fallo y se vuelve a codificar, así
+    que una invalidación perdida nunca entrega datos viejos. Con ``maxsize``
+    igual a 0 no se guarda nada.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, version, encode):
+        """Bytes guardados para ``key`` en ``version``; si no están, llama a ``encode()``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        data = encode()
+        if self.maxsize:
+            with self._lock:
+                self._entries[key] = (version, data)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return data
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
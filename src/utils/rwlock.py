@@ -0,0 +1,148 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class RWLock:
+    """
+    Lock de lectores y escritor.
+
+    Varios hilos pueden leer a la vez; un escritor espera a que salgan los
+    lectores y, mientras espera, no entran lectores nuevos para que no quede
+    postergado indefinidamente. El escritor puede volver a tomar el lock (en
+    lectura o escritura) sin bloquearse, igual que un RLock. Pasar de lectura
+    a escritura no está permitido porque dos hilos haciéndolo se bloquearían
+    mutuamente.
+
+    Usado con ``with`` toma el lock en escritura. ``on_wait(segundos, modo)``
+    se llama solo cuando una adquisición tuvo que esperar, así que sin
+    contención no agrega costo.
+    """
+
+    def __init__(self, on_wait=None):
+        self.on_wait = on_wait
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        held = getattr(self._local, 'reads', 0)
+        with self._cond:
+            if self._writer != me and not held and (self._writer is not None
+                                                    or self._waiting_writers):
+                start = time.perf_counter()
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+                self._waited(start, 'read')
+            self._readers += 1
+        self._local.reads = held + 1
+
+    def release_read(self):
+        self._local.reads -= 1
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._depth += 1
+                return
+            if getattr(self._local, 'reads', 0):
+                raise RuntimeError("No se puede tomar el lock en escritura mientras se lee")
+            self._waiting_writers += 1
+            try:
+                if self._writer is not None or self._readers:
+                    start = time.perf_counter()
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                    self._waited(start, 'write')
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._depth = 1
+
+    def release_write(self):
+        with self._cond:
+            self._depth -= 1
+            if not self._depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    def _waited(self, start, mode):
+        if self.on_wait is not None:
+            self.on_wait(time.perf_counter() - start, mode)
+
+    def is_writer(self):
+        """True si el hilo actual tiene el lock en escritura."""
+        return self._writer == threading.get_ident()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+    def __enter__(self):
+        self.acquire_write()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release_write()
+
+
+class LockStripes:
+    """
+    Conjunto fijo de locks repartidos por hash de la clave, para serializar
+    operaciones sobre una misma clave sin un lock por registro. Con
+    ``on_wait`` se informa, como en RWLock, cuánto se esperó por uno tomado.
+    """
+
+    def __init__(self, stripes=64, on_wait=None):
+        if on_wait is None:
+            self._locks = [threading.Lock() for _ in range(stripes)]
+        else:
+            self._locks = [_TimedLock(on_wait) for _ in range(stripes)]
+
+    def __call__(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+
+
+class _TimedLock:
+    __slots__ = ('_lock', '_on_wait')
+
+    def __init__(self, on_wait):
+        self._lock = threading.Lock()
+        self._on_wait = on_wait
+
+    def acquire(self):
+        if not self._lock.acquire(False):
+            start = time.perf_counter()
+            self._lock.acquire()
+            self._on_wait(time.perf_counter() - start, 'task')
+        return True
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
@@ -0,0 +1,288 @@
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, deque
+
+from storage.journal import Journal
+
+# Segundos por balde de los contadores de ritmo y cantidad de baldes guardados (un día)
+BUCKET_SECONDS = 60
+BUCKETS = 24 * 60
+# Estado que se arma al leer el log, en el primer uso
+LOADED = ('times', 'tasks', 'sources', 'targets', '_task_ids', '_task_codes', '_statuses',
+          '_status_codes', '_by_task', '_buckets')
+
+
+class StatusHistory:
+    """
+    Historial de solo-anexado de las transiciones de estado de las tareas.
+
+    Cada transición ocupa una posición en cuatro arrays paralelos: instante
+    (``d``), tarea, estado anterior y estado nuevo (``I``, índices en tablas
+    de ids y de estados), más 4 bytes en el array de posiciones de su tarea.
+    Los instantes no decrecen, así que un rango de tiempo se encuentra con
+    búsqueda binaria.
+    El estado anterior de una tarea nueva y el nuevo de una borrada es None.
+
+    Además de los arrays, cuenta las transiciones por estado nuevo en baldes
+    de ``BUCKET_SECONDS`` del último día, para dar ritmos recientes sin
+    recorrer el historial.
+
+    Con ``filename`` las transiciones se anexan a un log con el formato del
+    journal al llamar a ``flush``. El log se lee recién con la primera
+    consulta; las transiciones registradas antes se agregan al final.
+
+    Con ``max_age`` (segundos) las transiciones más viejas se descartan: en
+    cada ``flush``, cuando las vencidas son al menos la mitad, se sacan de
+    memoria y el log se reescribe solo con las vigentes.
+    """
+
+    def __init__(self, filename=None, max_age=None):
+        self.filename = filename
+        self.max_age = max_age
+        self._unflushed = []
+        # Transiciones registradas por este proceso, sin leer el log
+        self.recorded = 0
+        # Transiciones vencidas que siguen en el log pero no en memoria
+        self._stale = 0
+        self._lock = threading.Lock()
+        self._journal = None
+        if filename is None:
+            self._reset()
+        else:
+            self._journal = Journal(filename, fsync=False)
+
+    def __getattr__(self, name):
+        # Solo se llama si el atributo no existe: el log se lee al primer uso
+        if name not in LOADED:
+            raise AttributeError(name)
+        self._load()
+        return self.__dict__[name]
+
+    def __len__(self):
+        return len(self.times)
+
+    def record(self, task_id, source, target, timestamp=None):
+        """Anexa la transición de ``task_id`` de ``source`` a ``target``."""
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            self.recorded += 1
+            # Sin leer el log: la transición se agrega al cargarlo
+            if 'times' in self.__dict__:
+                timestamp = self._append(timestamp, task_id, source, target)
+            if self._journal is not None:
+                self._unflushed.append((timestamp, task_id, source, target))
+
+    def flush(self):
+        """Escribe en el log las transiciones registradas desde el último flush."""
+        if self._journal is None:
+            return
+        with self._lock:
+            records, self._unflushed = self._unflushed, []
+            self._journal.append(records)
+            if self.max_age is not None and 'times' in self.__dict__:
+                cutoff = time.time() - self.max_age
+                expired = bisect_left(self.times, cutoff) + self._stale
+                if expired and expired * 2 >= len(self.times) + self._stale:
+                    self._compact(expired - self._stale)
+
+    def close(self):
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+
+    def after_fork(self):
+        self._lock = threading.Lock()
+        if self._journal is not None:
+            # Se vuelve a abrir en el próximo flush
+            self._journal.close()
+
+    def range(self, since=None, until=None, task_id=None, limit=None):
+        """
+        Transiciones con ``since <= instante < until`` como tuplas
+        ``(instante, tarea, anterior, nuevo)``, en orden. Con ``task_id`` usa
+        las posiciones de esa tarea en lugar de recorrer el rango.
+        """
+        self._load()
+        with self._lock:
+            start, stop = self._bounds(since, until)
+            if task_id is None:
+                positions = range(start, stop)
+            else:
+                own = self._by_task.get(self._task_codes.get(task_id), ())
+                positions = own[bisect_left(own, start):bisect_left(own, stop)]
+            if limit is not None:
+                positions = positions[:limit]
+            return [self._entry(i) for i in positions]
+
+    def histogram(self, since, until, interval):
+        """
+        Transiciones por balde de ``interval`` segundos y por estado nuevo,
+        como ``[(inicio_del_balde, {estado: cantidad})]`` sin baldes vacíos.
+        """
+        self._load()
+        with self._lock:
+            start, stop = self._bounds(since, until)
+            buckets = {}
+            times, targets, statuses = self.times, self.targets, self._statuses
+            for i in range(start, stop):
+                key = times[i] // interval * interval
+                counts = buckets.get(key)
+                if counts is None:
+                    counts = buckets[key] = Counter()
+                counts[statuses[targets[i]]] += 1
+        return [(key, dict(counts)) for key, counts in buckets.items()]
+
+    def rates(self, seconds, now=None):
+        """Transiciones por estado nuevo en los últimos ``seconds`` (de a baldes enteros)."""
+        now = time.time() if now is None else now
+        first = int(now // BUCKET_SECONDS) - (seconds // BUCKET_SECONDS) + 1
+        total = Counter()
+        self._load()
+        with self._lock:
+            for bucket, counts in reversed(self._buckets):
+                if bucket < first:
+                    break
+                total.update(counts)
+        return dict(total)
+
+    def _load(self):
+        """Lee el log y publica el estado completo, como los índices diferidos."""
+        if 'times' in self.__dict__:
+            return
+        with self._lock:
+            if 'times' in self.__dict__:
+                return
+            loaded = StatusHistory()
+            records, _ = Journal.read_from(self.filename, 0, repair=True)
+            if self.max_age is not None:
+                cutoff = time.time() - self.max_age
+                current = [record for record in records if record[0] >= cutoff]
+                self._stale, records = len(records) - len(current), current
+            for record in records + self._unflushed:
+                loaded._append(*record)
+            for name in LOADED:
+                self.__dict__[name] = loaded.__dict__[name]
+
+    def _reset(self):
+        self.times = array('d')
+        self.tasks = array('I')
+        self.sources = array('I')
+        self.targets = array('I')
+        self._task_ids = []
+        self._task_codes = {}
+        self._statuses = [None]
+        self._status_codes = {None: 0}
+        self._by_task = {}      # código de tarea -> posiciones en el historial
+        self._buckets = deque(maxlen=BUCKETS)   # (balde, Counter de estados nuevos)
+
+    def _compact(self, expired):
+        """
+        Se llama con ``_lock`` tomado y el log al día: deja en memoria y en
+        el log solo las transiciones desde la posición ``expired``.
+        """
+        kept = [self._entry(i) for i in range(expired, len(self.times))]
+        self._reset()
+        for record in kept:
+            self._append(*record)
+        self._journal.close()
+        tmp_filename = self.filename + '.tmp'
+        rewritten = Journal(tmp_filename, fsync=False)
+        try:
+            rewritten.append(kept)
+        finally:
+            rewritten.close()
+        os.replace(tmp_filename, self.filename)
+        self._stale = 0
+
+    def _append(self, timestamp, task_id, source, target):
+        """Agrega la transición y retorna su instante, corregido si hace falta."""
+        # Un reloj que retrocede no debe romper el orden de los instantes
+        if self.times and timestamp < self.times[-1]:
+            timestamp = self.times[-1]
+        code = self._task_codes.get(task_id)
+        if code is None:
+            code = self._task_codes[task_id] = len(self._task_ids)
+            self._task_ids.append(task_id)
+        position = len(self.times)
+        self.times.append(timestamp)
+        self.tasks.append(code)
+        self.sources.append(self._status_code(source))
+        self.targets.append(self._status_code(target))
+        positions = self._by_task.get(code)
+        if positions is None:
+            positions = self._by_task[code] = array('I')
+        positions.append(position)
+        bucket = int(timestamp // BUCKET_SECONDS)
+        if not self._buckets or self._buckets[-1][0] != bucket:
+            self._buckets.append((bucket, Counter()))
+        self._buckets[-1][1][target] += 1
+        return timestamp
+
+    def _status_code(self, status):
+        code = self._status_codes.get(status)
+        if code is None:
+            code = self._status_codes[status] = len(self._statuses)
+            self._statuses.append(status)
+        return code
+
+    def _bounds(self, since, until):
+        start = 0 if since is None else bisect_left(self.times, since)
+        stop = len(self.times) if until is None else bisect_left(self.times, until)
+        return start, max(start, stop)
+
+    def _entry(self, i):
+        statuses = self._statuses
+        return (self.times[i], self._task_ids[self.tasks[i]],
+                statuses[self.sources[i]], statuses[self.targets[i]])
+
+
+class StatusCounters:
+    """
+    Cantidad de tareas por estado, por alias y estado y por rol y estado,
+    actualizadas con cada cambio de una tarea en lugar de contarlas.
+
+    Cada tarea se describe con ``(estado, alias, roles)``; ``move`` resta la
+    descripción anterior y suma la nueva, así que las consultas son lecturas
+    de diccionarios.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.by_status = {}
+        self.by_user = {}       # alias -> {estado: tareas}
+        self.by_role = {}       # rol -> {estado: tareas}
+
+    def load(self, keys):
+        self.__init__()
+        for key in keys:
+            self.move(None, key)
+
+    def move(self, old, new):
+        if old == new:
+            return
+        for key, delta in ((old, -1), (new, 1)):
+            if key is None:
+                continue
+            status, aliases, roles = key
+            self.total += delta
+            self._add(self.by_status, status, delta)
+            for alias in aliases:
+                self._add(self.by_user.setdefault(alias, {}), status, delta)
+                if not self.by_user[alias]:
+                    del self.by_user[alias]
+            for role in roles:
+                self._add(self.by_role.setdefault(role, {}), status, delta)
+                if not self.by_role[role]:
+                    del self.by_role[role]
+
+    @staticmethod
+    def _add(counts, status, delta):
+        count = counts.get(status, 0) + delta
+        if count:
+            counts[status] = count
+        else:
+            del counts[status]
@@ -0,0 +1,233 @@
+import heapq
+import itertools
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+
+TOKEN = re.compile(r'\w+')
+COMBINING = re.compile('[\u0300-\u036f]')
+
+# Palabras que aparecen en casi cualquier texto en español y no ayudan a
+# distinguir una tarea de otra
+STOPWORDS = frozenset("""
+    a al ante con de del e el en entre es la las lo los o para pero por que se
+    sin sobre su sus un una unas uno unos y
+""".split())
+
+
+def fold(text):
+    """Minúsculas y sin acentos ni diéresis: "Descripción" -> "descripcion"."""
+    text = text.casefold()
+    if text.isascii():
+        return text
+    return COMBINING.sub('', unicodedata.normalize('NFKD', text))
+
+
+def tokenize(text):
+    """Términos normalizados del texto, sin stopwords."""
+    return [term for term in TOKEN.findall(fold(text)) if term not in STOPWORDS]
+
+
+class TextIndex:
+    """
+    Índice invertido en memoria para buscar documentos por palabras.
+
+    ``add`` indexa los campos de texto de un documento, cada uno con su peso
+    (el título cuenta más que la descripción). Para cada término se guarda
+    ``{documento: peso}``; un término con un solo documento se guarda como
+    tupla, que ocupa la cuarta parte. Para actualizar o borrar se vuelven a
+    tokenizar los textos anteriores, de los que solo se guarda la referencia.
+
+    ``search`` exige todos los términos y trata el último como prefijo, para
+    buscar mientras se escribe. Ordena por BM25 sin normalizar por largo
+    (los campos son cortos) y desempata por el documento más nuevo. Para
+    que un término que está en casi todos los documentos no obligue a
+    recorrerlos todos, se puntúan solo sus ``scan_limit`` documentos más
+    recientes.
+    """
+
+    K1 = 1.2
+
+    def __init__(self, weights=(1,), scan_limit=10000, max_expansions=16):
+        self.weights = weights
+        self.scan_limit = scan_limit
+        self.max_expansions = max_expansions
+        self._postings = {}
+        self._docs = {}
+        # Vocabulario ordenado para los prefijos: los términos nuevos van a
+        # una lista chica que se une con la grande cuando crece
+        self._terms = []
+        self._new_terms = []
+        self._bulk = False
+
+    def __len__(self):
+        """Cantidad de términos distintos."""
+        return len(self._postings)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._docs
+
+    @property
+    def documents(self):
+        return len(self._docs)
+
+    def extend(self, documents):
+        """
+        Indexa ``(doc_id, seq, textos)`` en bloque: el vocabulario se ordena
+        una sola vez al final en lugar de insertar cada término nuevo.
+        """
+        self._bulk = True
+        try:
+            for doc_id, seq, texts in documents:
+                self.add(doc_id, seq, texts)
+        finally:
+            self._bulk = False
+        self._terms = sorted(self._postings)
+        self._new_terms = []
+
+    def add(self, doc_id, seq, texts):
+        """Indexa o reindexa ``doc_id`` con los textos dados, uno por peso."""
+        previous = self._docs.get(doc_id)
+        if previous is not None:
+            if previous[1] == texts:
+                self._docs[doc_id] = (seq, texts)
+                return
+            self._unlink(doc_id, previous[1])
+        self._docs[doc_id] = (seq, texts)
+        for term, weight in self._weigh(texts).items():
+            posting = self._postings.get(term)
+            if posting is None:
+                self._postings[term] = (doc_id, weight)
+                self._add_term(term)
+            elif type(posting) is tuple:
+                self._postings[term] = {posting[0]: posting[1], doc_id: weight}
+            else:
+                posting[doc_id] = weight
+
+    def remove(self, doc_id):
+        previous = self._docs.pop(doc_id, None)
+        if previous is not None:
+            self._unlink(doc_id, previous[1])
+
+    def search(self, query, limit=20):
+        """
+        Retorna hasta ``limit`` pares ``(doc_id, puntaje)`` de mayor a menor
+        puntaje con los documentos que contienen todos los términos.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        groups = []
+        for i, term in enumerate(terms):
+            expansions = self._expand(term) if i == len(terms) - 1 else (
+                [term] if term in self._postings else [])
+            if not expansions:
+                return []
+            groups.append([(self._idf(t), self._postings[t]) for t in expansions])
+        groups.sort(key=lambda group: sum(self._size(p) for _, p in group))
+
+        scores = {}
+        driver = itertools.chain.from_iterable(
+            ((idf, doc_id, weight) for doc_id, weight in self._items(posting))
+            for idf, posting in groups[0])
+        for idf, doc_id, weight in itertools.islice(driver, self.scan_limit):
+            score = idf * self._saturate(weight)
+            if score > scores.get(doc_id, 0):
+                scores[doc_id] = score
+        for group in groups[1:]:
+            for doc_id in list(scores):
+                best = 0
+                for idf, posting in group:
+                    weight = self._weight(posting, doc_id)
+                    if weight:
+                        best = max(best, idf * self._saturate(weight))
+                if best:
+                    scores[doc_id] += best
+                else:
+                    del scores[doc_id]
+
+        docs = self._docs
+        best = heapq.nlargest(limit, scores.items(),
+                              key=lambda item: (item[1], docs[item[0]][0]))
+        return [(doc_id, round(score, 4)) for doc_id, score in best]
+
+    def _weigh(self, texts):
+        weights = {}
+        for text, weight in zip(texts, self.weights):
+            if isinstance(text, str):
+                for term in tokenize(text):
+                    weights[term] = weights.get(term, 0) + weight
+        return weights
+
+    def _unlink(self, doc_id, texts):
+        for term in self._weigh(texts):
+            posting = self._postings.get(term)
+            if type(posting) is tuple:
+                if posting[0] == doc_id:
+                    # El término queda en el vocabulario hasta la próxima unión
+                    del self._postings[term]
+            elif posting is not None:
+                posting.pop(doc_id, None)
+                if len(posting) == 1:
+                    self._postings[term] = next(iter(posting.items()))
+
+    def _add_term(self, term):
+        if self._bulk or self._contains(self._new_terms, term) or self._contains(self._terms, term):
+            return
+        insort(self._new_terms, term)
+        if len(self._new_terms) > max(1024, math.isqrt(len(self._terms))):
+            # Dos tramos ordenados: sorted los une en tiempo lineal
+            terms = sorted(self._terms + self._new_terms)
+            self._terms = [t for t in terms if t in self._postings]
+            self._new_terms = []
+
+    @staticmethod
+    def _contains(terms, term):
+        i = bisect_left(terms, term)
+        return i < len(terms) and terms[i] == term
+
+    def _expand(self, prefix):
+        """
+        Términos que empiezan con ``prefix``; si son más de ``max_expansions``,
+        los que están en más documentos.
+        """
+        matches = []
+        for terms in (self._terms, self._new_terms):
+            i = bisect_left(terms, prefix)
+            # Cortar la búsqueda en prefijos muy cortos con miles de términos
+            while (i < len(terms) and terms[i].startswith(prefix)
+                   and len(matches) < self.max_expansions * 32):
+                if terms[i] in self._postings:
+                    matches.append(terms[i])
+                i += 1
+        matches = list(dict.fromkeys(matches))
+        if len(matches) > self.max_expansions:
+            matches = heapq.nlargest(self.max_expansions, matches,
+                                     key=lambda t: self._size(self._postings[t]))
+        return matches
+
+    def _idf(self, term):
+        n = len(self._docs)
+        df = self._size(self._postings[term])
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _saturate(self, weight):
+        return weight * (self.K1 + 1) / (weight + self.K1)
+
+    @staticmethod
+    def _size(posting):
+        return 1 if type(posting) is tuple else len(posting)
+
+    @staticmethod
+    def _items(posting):
+        if type(posting) is tuple:
+            return (posting,)
+        # Los más recientes primero
+        return ((doc_id, posting[doc_id]) for doc_id in reversed(posting))
+
+    @staticmethod
+    def _weight(posting, doc_id):
+        if type(posting) is tuple:
+            return posting[1] if posting[0] == doc_id else 0
+        return posting.get(doc_id, 0)
@@ -0,0 +1,202 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from data_handler import DataHandler
+from utils import metrics
+
+# Memoria estimada por registro cargado, con los índices derivados armados
+# (medida con tracemalloc sobre los datos sintéticos de los benchmarks)
+BYTES_POR_REGISTRO = 2700
+
+WORKSPACE_ID = re.compile(r'[A-Za-z0-9_-]{1,64}\Z')
+
+HITS = metrics.counter(
+    'workspace_hits_total', 'Accesos a un espacio de trabajo que ya estaba cargado')
+LOADS = metrics.counter(
+    'workspace_loads_total', 'Espacios de trabajo cargados desde el storage')
+EVICTIONS = metrics.counter(
+    'workspace_evictions_total', 'Espacios de trabajo descargados para respetar el presupuesto')
+LOAD_SECONDS = metrics.histogram(
+    'workspace_load_seconds', 'Carga de un espacio de trabajo')
+
+
+class _Entry:
+    __slots__ = ('handler', 'pins', 'bytes')
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.pins = 0
+        self.bytes = estimated_bytes(handler)
+
+
+def estimated_bytes(handler):
+    """Memoria estimada de los datos de ``handler``, a partir de sus registros."""
+    return (len(handler.tasks) + len(handler.users)) * BYTES_POR_REGISTRO
+
+
+class WorkspaceManager:
+    """
+    Espacios de trabajo del proceso: cada uno es un directorio dentro de
+    ``directory`` con su propio archivo de datos (``data_file``) y se sirve
+    con su propio DataHandler, creado con ``options``.
+
+    Los espacios se cargan en el primer acceso y quedan en memoria en orden
+    de uso. Cuando la memoria estimada de los cargados supera
+    ``budget_bytes``, se descargan los usados hace más tiempo, salvo los que
+    tienen peticiones en curso (entre ``acquire`` y ``release``) y el último
+    usado; el próximo acceso a un espacio descargado lo vuelve a cargar.
+
+    Cada espacio tiene un lock de carga: dos peticiones al mismo espacio sin
+    cargar lo cargan una sola vez, y un espacio que se está descargando no
+    se vuelve a cargar hasta que terminó de cerrarse.
+    """
+
+    def __init__(self, directory, budget_bytes, data_file='data.json', **options):
+        self.directory = directory
+        self.budget_bytes = budget_bytes
+        self.data_file = data_file
+        self.options = options
+        self._loaded = OrderedDict()    # id -> _Entry, del menos al más usado
+        self._load_locks = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, workspace_id):
+        return (WORKSPACE_ID.match(workspace_id) is not None
+                and os.path.isdir(os.path.join(self.directory, workspace_id)))
+
+    def create(self, workspace_id):
+        """Crea el espacio vacío; retorna False si ya existía. ValueError si el id no es válido."""
+        if WORKSPACE_ID.match(workspace_id) is None:
+            raise ValueError("Id de espacio de trabajo no válido: %r" % workspace_id)
+        try:
+            os.makedirs(os.path.join(self.directory, workspace_id))
+        except FileExistsError:
+            return False
+        return True
+
+    def list(self):
+        """``(id, bytes estimados o None si no está cargado)`` de cada espacio."""
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            names = []
+        with self._lock:
+            return [(name, self._loaded[name].bytes if name in self._loaded else None)
+                    for name in names if name in self]
+
+    def acquire(self, workspace_id):
+        """
+        DataHandler del espacio, cargándolo si hace falta. Queda marcado en
+        uso hasta ``release``. KeyError si el espacio no existe.
+        """
+        handler = self._pin(workspace_id)
+        if handler is not None:
+            HITS.inc()
+            return handler
+        if workspace_id not in self:
+            raise KeyError(workspace_id)
+        with self._load_lock(workspace_id):
+            # Otro hilo pudo cargarlo mientras se esperaba el lock
+            handler = self._pin(workspace_id)
+            if handler is not None:
+                HITS.inc()
+                return handler
+            start = time.perf_counter()
+            handler = DataHandler(
+                os.path.join(self.directory, workspace_id, self.data_file), **self.options)
+            LOAD_SECONDS.observe(time.perf_counter() - start)
+            LOADS.inc()
+            entry = _Entry(handler)
+            entry.pins = 1
+            with self._lock:
+                self._loaded[workspace_id] = entry
+                victims = self._select_victims()
+        self._close(victims)
+        return handler
+
+    def release(self, workspace_id):
+        """Termina un uso del espacio y descarga los que excedan el presupuesto."""
+        with self._lock:
+            entry = self._loaded[workspace_id]
+            entry.pins -= 1
+            # El espacio pudo crecer durante la petición
+            entry.bytes = estimated_bytes(entry.handler)
+            victims = self._select_victims()
+        self._close(victims)
+
+    def close(self):
+        with self._lock:
+            victims = [(workspace_id, entry.handler, self._load_lock(workspace_id))
+                       for workspace_id, entry in self._loaded.items()]
+            self._loaded.clear()
+        for _, _, lock in victims:
+            lock.acquire()
+        self._close(victims)
+
+    def after_fork(self):
+        """Como ``DataHandler.after_fork``, para los espacios cargados antes del fork."""
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        for entry in self._loaded.values():
+            entry.pins = 0
+            entry.handler.after_fork()
+
+    def metric_families(self):
+        """Espacios cargados y su memoria estimada, como colector de ``utils.metrics``."""
+        with self._lock:
+            loaded = len(self._loaded)
+            used = sum(entry.bytes for entry in self._loaded.values())
+        return [
+            ('workspaces_loaded', 'gauge', 'Espacios de trabajo en memoria', [({}, loaded)]),
+            ('workspaces_memory_bytes', 'gauge',
+             'Memoria estimada de los espacios de trabajo en memoria', [({}, used)]),
+            ('workspaces_memory_budget_bytes', 'gauge',
+             'Presupuesto de memoria de los espacios de trabajo', [({}, self.budget_bytes)]),
+        ]
+
+    def _pin(self, workspace_id):
+        with self._lock:
+            entry = self._loaded.get(workspace_id)
+            if entry is None:
+                return None
+            self._loaded.move_to_end(workspace_id)
+            entry.pins += 1
+            return entry.handler
+
+    def _load_lock(self, workspace_id):
+        lock = self._load_locks.get(workspace_id)
+        if lock is None:
+            lock = self._load_locks.setdefault(workspace_id, threading.Lock())
+        return lock
+
+    def _select_victims(self):
+        """
+        Saca de ``_loaded`` los menos usados hasta entrar en el presupuesto.
+        Se llama con ``_lock`` tomado; retorna ``(id, handler, lock de
+        carga)`` con el lock de carga tomado, para cerrarlos afuera.
+        """
+        used = sum(entry.bytes for entry in self._loaded.values())
+        victims = []
+        # El último usado queda aunque solo él supere el presupuesto
+        for workspace_id in list(self._loaded)[:-1]:
+            if used <= self.budget_bytes:
+                break
+            entry = self._loaded[workspace_id]
+            lock = self._load_lock(workspace_id)
+            if entry.pins or not lock.acquire(blocking=False):
+                continue
+            del self._loaded[workspace_id]
+            used -= entry.bytes
+            victims.append((workspace_id, entry.handler, lock))
+            EVICTIONS.inc()
+        return victims
+
+    def _close(self, victims):
+        for _, handler, lock in victims:
+            try:
+                handler.close()
+            finally:
+                lock.release()